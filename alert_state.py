@@ -0,0 +1,185 @@
+"""
+增量报警：与上一次扫描的信号对比，只通知变化
+- 状态文件保存上次扫描的信号（symbol -> signal_type / 评分 / 交叉）
+- 以 symbol + signal_type 为键做哈希对比，复杂度与股票池大小线性、与变化数量成正比输出
+- 输出: 新信号、同侧信号变化、评分等级提升、新出现的金叉/死叉、退出超卖/超买
+- 只对本次实际扫描到的股票判断退出（获取失败、被市值过滤的股票不算退出）
+"""
+
+import json
+import os
+import uuid
+
+ALERT_STATE_PATH = os.path.join("data", "alert_state.json")
+
+# 参与对比的信号类型（中性不记录）
+SIGNAL_KEYS = ('oversold', 'overbought', 'approaching_os', 'approaching_ob')
+
+# 同一侧的信号（超卖 ↔ 接近超卖）之间的变化报告为一次转换，而不是退出 + 新信号
+SIGNAL_SIDE = {
+    'oversold': 'bullish',
+    'approaching_os': 'bullish',
+    'overbought': 'bearish',
+    'approaching_ob': 'bearish',
+}
+
+GRADE_RANK = {'A': 3, 'B': 2, 'C': 1, 'D': 0}
+
+SIGNAL_LABELS = {
+    'oversold': '🟢 超卖',
+    'overbought': '🔴 超买',
+    'approaching_os': '🟡 接近超卖',
+    'approaching_ob': '🟡 接近超买',
+}
+
+# ============================================================================
+# 1. 状态读写
+# ============================================================================
+
+def extract_signals(scan_results):
+    """从扫描结果提取信号状态: {'SYMBOL|signal_type': {...}}"""
+    signals = {}
+    for signal_type in SIGNAL_KEYS:
+        for r in scan_results.get(signal_type, []):
+            signals[f"{r['symbol']}|{signal_type}"] = {
+                'symbol': r['symbol'],
+                'signal_type': signal_type,
+                'grade': r.get('grade', 'D'),
+                'score': r.get('score', 0),
+                'cross': r.get('cross', ''),
+                'wt1': r.get('wt1'),
+                'price': r.get('price'),
+            }
+    return signals
+
+def scanned_symbols(scan_results):
+    """本次实际扫描到的股票（含中性）；旧格式没有 all 时用各分类列表代替"""
+    rows = scan_results.get('all')
+    if rows is None:
+        rows = [r for key in SIGNAL_KEYS + ('neutral',) for r in scan_results.get(key, [])]
+    return {r['symbol'] for r in rows}
+
+def load_state(path=ALERT_STATE_PATH):
+    """读取上次扫描的信号状态；没有状态文件时返回 None"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_state(scan_results, path=ALERT_STATE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    state = {
+        'scan_time': scan_results.get('scan_time'),
+        'signals': extract_signals(scan_results),
+    }
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+# ============================================================================
+# 2. 对比
+# ============================================================================
+
+def diff_signals(prev_signals, curr_signals, scanned):
+    """
+    对比两次扫描的信号
+    scanned: 本次实际扫描到的股票集合（scanned_symbols），不在其中的股票不判断退出
+    返回 dict:
+        new:      本次新出现的 symbol + signal_type
+        moved:    同一侧信号之间的变化（如 超卖 → 接近超卖）[(prev, curr)]
+        upgraded: 同一信号评分等级提升 [(prev, curr)]
+        crosses:  新出现的金叉/死叉（上次同一股票没有该交叉）
+        exits:    上次处于超卖/超买，本次已扫描且不再处于同一侧
+    """
+    diff = {'new': [], 'moved': [], 'upgraded': [], 'crosses': [], 'exits': []}
+
+    prev_by_symbol = {}
+    for prev in prev_signals.values():
+        prev_by_symbol.setdefault(prev['symbol'], []).append(prev)
+
+    def same_side(symbol, signal_type, signals):
+        side = SIGNAL_SIDE[signal_type]
+        return next((s for s in signals.get(symbol, ()) if SIGNAL_SIDE[s['signal_type']] == side), None)
+
+    curr_by_symbol = {}
+    for curr in curr_signals.values():
+        curr_by_symbol.setdefault(curr['symbol'], []).append(curr)
+
+    for key, curr in curr_signals.items():
+        prev = prev_signals.get(key)
+        if prev is None:
+            prev = same_side(curr['symbol'], curr['signal_type'], prev_by_symbol)
+            if prev is None:
+                diff['new'].append(curr)
+            else:
+                diff['moved'].append((prev, curr))
+        elif GRADE_RANK.get(curr['grade'], 0) > GRADE_RANK.get(prev['grade'], 0):
+            diff['upgraded'].append((prev, curr))
+
+        if curr['cross'] and (prev is None or prev.get('cross') != curr['cross']):
+            diff['crosses'].append(curr)
+
+    for key, prev in prev_signals.items():
+        if (prev['signal_type'] in ('oversold', 'overbought') and key not in curr_signals
+                and prev['symbol'] in scanned
+                and same_side(prev['symbol'], prev['signal_type'], curr_by_symbol) is None):
+            diff['exits'].append(prev)
+
+    for items in diff.values():
+        items.sort(key=lambda x: (x[1] if isinstance(x, tuple) else x)['symbol'])
+    return diff
+
+def has_changes(diff):
+    return any(diff.values())
+
+# ============================================================================
+# 3. 消息格式
+# ============================================================================
+
+def _line(s):
+    cross_info = f" {s['cross']}" if s.get('cross') else ""
+    return (f"  • <code>{s['symbol']}</code> {SIGNAL_LABELS[s['signal_type']]} "
+            f"${s['price']} | WT1: {s['wt1']} | {s['grade']}级{cross_info}")
+
+def format_diff_message(diff, scan_time, prev_scan_time=None):
+    """格式化增量报警消息（Telegram HTML）"""
+    lines = [
+        "📊 <b>WaveTrend 信号变化</b>",
+        f"⏰ {scan_time}" + (f"（对比 {prev_scan_time}）" if prev_scan_time else ""),
+        ""
+    ]
+
+    if diff['new']:
+        lines.append(f"🆕 <b>新信号</b> [{len(diff['new'])}只]")
+        lines.extend(_line(s) for s in diff['new'])
+        lines.append("")
+
+    if diff['moved']:
+        lines.append(f"🔄 <b>信号变化</b> [{len(diff['moved'])}只]")
+        for prev, curr in diff['moved']:
+            lines.append(_line(curr) + f"（{SIGNAL_LABELS[prev['signal_type']]}→{SIGNAL_LABELS[curr['signal_type']]}）")
+        lines.append("")
+
+    if diff['upgraded']:
+        lines.append(f"⬆️ <b>评分升级</b> [{len(diff['upgraded'])}只]")
+        for prev, curr in diff['upgraded']:
+            lines.append(_line(curr) + f"（{prev['grade']}→{curr['grade']}）")
+        lines.append("")
+
+    if diff['crosses']:
+        lines.append(f"✂️ <b>新交叉</b> [{len(diff['crosses'])}只]")
+        lines.extend(_line(s) for s in diff['crosses'])
+        lines.append("")
+
+    if diff['exits']:
+        lines.append(f"🚪 <b>退出超卖/超买</b> [{len(diff['exits'])}只]")
+        for s in diff['exits']:
+            lines.append(f"  • <code>{s['symbol']}</code> 已退出 {SIGNAL_LABELS[s['signal_type']]}")
+        lines.append("")
+
+    lines.append("📈 <b>统计</b>")
+    lines.append(f"  新信号: {len(diff['new'])} | 变化: {len(diff['moved'])} | 升级: {len(diff['upgraded'])} | "
+                 f"交叉: {len(diff['crosses'])} | 退出: {len(diff['exits'])}")
+    return "\n".join(lines)
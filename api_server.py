@@ -0,0 +1,243 @@
+"""
+本地只读 HTTP API：从内存提供最新扫描结果
+- latest_scan.json 的 mtime 变化时重新加载（最多每秒检查一次）
+- 每个 (路径, 参数) 的响应体、gzip 体和 ETag 只计算一次，之后的请求直接返回缓存字节
+- 支持 If-None-Match，轮询方大部分请求得到 304
+
+接口（均为 GET，返回 JSON）:
+    /                     扫描时间和各类信号数量
+    /all                  全部结果
+    /oversold             超卖
+    /overbought           超买
+    /approaching          接近超卖 + 接近超买（{"approaching_os": [...], "approaching_ob": [...]}）
+    /approaching_os       接近超卖
+    /approaching_ob       接近超买
+    /symbol/<SYM>         单只股票详情
+列表接口参数:
+    min_score=N           评分 ≥ N
+    min_market_cap=X      市值 ≥ X 美元（如 50e9）
+
+用法:
+    python api_server.py --data-dir data --port 8765
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+LIST_ENDPOINTS = ('all', 'oversold', 'overbought', 'approaching_os', 'approaching_ob')
+RELOAD_CHECK_INTERVAL = 1.0
+RESPONSE_CACHE_SIZE = 512
+GZIP_MIN_SIZE = 512
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class Response:
+    """预先编码好的响应"""
+
+    __slots__ = ('status', 'body', 'gzip_body', 'etag')
+
+    def __init__(self, status, payload):
+        self.status = status
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, 6) if len(self.body) >= GZIP_MIN_SIZE else None
+        # 弱 ETag：identity 与 gzip 两种编码共用
+        self.etag = f'W/"{hashlib.sha1(self.body).hexdigest()[:20]}"'
+
+class ScanStore:
+    """latest_scan.json 的内存视图和响应缓存"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._scan = None
+        self._by_symbol = {}
+        self._generation = 0
+        self._responses = OrderedDict()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_INTERVAL and self._scan is not None:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                return
+            if mtime == self._mtime:
+                return
+            with open(self.path) as f:
+                scan = json.load(f)
+            self._scan = scan
+            self._by_symbol = {r['symbol']: r for r in scan['all']}
+            self._mtime = mtime
+            self._generation += 1
+            self._responses.clear()
+
+    def get(self, path, query):
+        """(路径, 参数) -> Response；异常以 ApiError 抛出"""
+        self._maybe_reload()
+        key = (path, tuple(sorted((k, v[-1]) for k, v in query.items())))
+        with self._lock:
+            # 在锁内取同一代的扫描结果；锁外构建响应
+            scan, by_symbol, generation = self._scan, self._by_symbol, self._generation
+            if scan is None:
+                raise ApiError(503, f"尚无扫描结果: {self.path}")
+            response = self._responses.get(key)
+            if response is not None:
+                self._responses.move_to_end(key)
+                return response
+
+        response = Response(200, self._build(path, query, scan, by_symbol))
+        with self._lock:
+            # 构建期间重新加载过时不缓存旧结果的响应（本次请求仍返回构建时的一致快照）
+            if generation == self._generation:
+                self._responses[key] = response
+                if len(self._responses) > RESPONSE_CACHE_SIZE:
+                    self._responses.popitem(last=False)
+        return response
+
+    # ------------------------------------------------------------------
+    # 路由
+    # ------------------------------------------------------------------
+
+    def _build(self, path, query, scan, by_symbol):
+        parts = [p for p in path.split('/') if p]
+
+        if not parts:
+            return {
+                'scan_time': scan['scan_time'],
+                'counts': {name: len(scan[name]) for name in LIST_ENDPOINTS},
+            }
+
+        if parts[0] == 'symbol' and len(parts) == 2:
+            result = by_symbol.get(parts[1].upper())
+            if result is None:
+                raise ApiError(404, f"没有 {parts[1].upper()} 的结果")
+            return {'scan_time': scan['scan_time'], 'result': result}
+
+        if len(parts) == 1:
+            keep = _make_filter(query)
+            if parts[0] == 'approaching':
+                return {
+                    'scan_time': scan['scan_time'],
+                    'approaching_os': [r for r in scan['approaching_os'] if keep(r)],
+                    'approaching_ob': [r for r in scan['approaching_ob'] if keep(r)],
+                }
+            if parts[0] in LIST_ENDPOINTS:
+                results = [r for r in scan[parts[0]] if keep(r)]
+                return {'scan_time': scan['scan_time'], 'count': len(results), 'results': results}
+
+        raise ApiError(404, f"未知接口: {path}")
+
+def _make_filter(query):
+    try:
+        min_score = float(query['min_score'][-1]) if 'min_score' in query else None
+        min_cap = float(query['min_market_cap'][-1]) if 'min_market_cap' in query else None
+    except ValueError as e:
+        raise ApiError(400, f"参数错误: {e}")
+
+    def keep(r):
+        if min_score is not None and r.get('score', 0) < min_score:
+            return False
+        if min_cap is not None and (r.get('market_cap') or 0) < min_cap:
+            return False
+        return True
+    return keep
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+class ScanRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'WaveTrendAPI/1.0'
+    # 响应头和响应体合并为一次写出，避免 keep-alive 连接上 Nagle + 延迟 ACK 造成的 40ms 停顿
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+    store = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            response = self.store.get(url.path.rstrip('/') or '/', parse_qs(url.query))
+        except ApiError as e:
+            self._send_error(e.status, str(e))
+            return
+
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match and (if_none_match.strip() == '*' or
+                              response.etag in [t.strip() for t in if_none_match.split(',')]):
+            self.send_response(304)
+            self.send_header('ETag', response.etag)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = response.body
+        use_gzip = response.gzip_body is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+        if use_gzip:
+            body = response.gzip_body
+
+        self.send_response(response.status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', response.etag)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Cache-Control', 'no-cache')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        body = json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 高频轮询下不逐条打印访问日志
+        pass
+
+def make_server(data_dir="data", host="127.0.0.1", port=8765):
+    handler = type('Handler', (ScanRequestHandler,),
+                   {'store': ScanStore(os.path.join(data_dir, "latest_scan.json"))})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WaveTrend 扫描结果只读 HTTP API")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    server = make_server(args.data_dir, args.host, args.port)
+    print(f"🌐 API 已启动: http://{args.host}:{args.port}/  (数据: {args.data_dir}/latest_scan.json)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,27 @@ WaveTrend 扫描器 V3.0 - Streamlit 网页界面
 import streamlit as st
 import pandas as pd
 import numpy as np
-import yfinance as yf
+import os
+import pyarrow as pa
+import time
 from datetime import datetime, timedelta
 import gspread
 from google.oauth2.service_account import Credentials
 
+import breadth
+import data_provider
+import divergence
+import metrics
+import screens
+import snapshot
+import tracking_eval
+from bar_cache import BarCache
+from ingest import to_compute_dtype
+from live import ZONE_LABELS, load_recent_events
+from lookback_planner import MIN_BARS, REQUIRED_BARS, fetch_history
+from singleflight import ScanCoordinator, SingleFlight
+from universe import ALL_STOCKS
+
 # ============================================================================
 # 页面配置
 # ============================================================================
@@ -76,75 +92,14 @@ def get_spreadsheet():
         bearish_sheet = spreadsheet.add_worksheet(title="Bearish", rows=1000, cols=10)
         bearish_sheet.append_row(["symbol", "d0_date", "d0_price", "current_price", "change_pct", "trading_days", "score", "score_details", "status", "result"])
     
-    return spreadsheet, bullish_sheet, bearish_sheet
+    # 之后对工作表的每次调用都计入 Sheets API 指标
+    return spreadsheet, metrics.InstrumentedProxy(bullish_sheet), metrics.InstrumentedProxy(bearish_sheet)
 
 # ============================================================================
 # 股票池
 # ============================================================================
 
-# 纳斯达克100
-NASDAQ_100 = [
-    "AAPL", "MSFT", "AMZN", "NVDA", "GOOGL", "META", "GOOG", "TSLA", "AVGO", "COST",
-    "PEP", "CSCO", "NFLX", "AMD", "ADBE", "TMUS", "CMCSA", "INTC", "INTU", "QCOM",
-    "TXN", "AMGN", "HON", "AMAT", "BKNG", "ISRG", "SBUX", "VRTX", "LRCX", "GILD",
-    "ADI", "ADP", "MDLZ", "REGN", "PANW", "MU", "KLAC", "SNPS", "CDNS", "MELI",
-    "PYPL", "ASML", "MAR", "CRWD", "CTAS", "ORLY", "MRVL", "ABNB", "NXPI", "FTNT",
-    "WDAY", "CSX", "PCAR", "MNST", "ADSK", "DXCM", "AEP", "CPRT", "ODFL", "PAYX",
-    "AZN", "KDP", "CHTR", "ROST", "KHC", "EXC", "LULU", "IDXX", "VRSK", "MCHP",
-    "FAST", "EA", "XEL", "CTSH", "GEHC", "CSGP", "BKR", "FANG", "ON", "DDOG",
-    "ANSS", "BIIB", "TEAM", "ZS", "ILMN", "WBD", "ALGN", "MRNA", "DLTR", "ENPH",
-    "SIRI", "CEG", "TTWO", "GFS", "LCID", "RIVN", "WBA", "JD", "PDD", "BIDU"
-]
-
-# 标普500 (不含纳斯达克100重复的)
-SP500_EXTRA = [
-    # 金融
-    "JPM", "BAC", "WFC", "GS", "MS", "C", "BLK", "SCHW", "AXP", "USB",
-    "PNC", "TFC", "COF", "BK", "STT", "AIG", "MET", "PRU", "ALL", "TRV",
-    "AFL", "CB", "CME", "ICE", "MCO", "SPGI", "MMC", "AON", "MSCI",
-    # 医疗
-    "UNH", "JNJ", "PFE", "LLY", "ABBV", "MRK", "TMO", "ABT", "DHR", "BMY",
-    "CVS", "ELV", "CI", "HCA", "HUM", "MCK", "CAH", "ZTS", "SYK",
-    "BSX", "MDT", "EW", "IQV", "A", "BIO", "TECH",
-    # 消费
-    "WMT", "HD", "MCD", "NKE", "LOW", "TGT", "TJX", "AZO",
-    "DG", "CMG", "YUM", "DPZ", "EBAY", "ETSY", "BBY",
-    "KMB", "CL", "PG", "KO", "MO", "PM", "EL", "CLX", "CHD", "SJM",
-    # 工业
-    "CAT", "BA", "UPS", "RTX", "DE", "LMT", "GE", "MMM", "EMR",
-    "ITW", "PH", "ROK", "ETN", "CMI", "WM", "RSG", "FDX", "NSC",
-    "UNP", "DAL", "UAL", "LUV", "AAL",
-    # 能源
-    "XOM", "CVX", "COP", "SLB", "EOG", "MPC", "PSX", "VLO", "OXY", "PXD",
-    "DVN", "HES", "HAL", "KMI", "WMB", "OKE",
-    # 通信/媒体
-    "DIS", "T", "VZ", "PARA", "FOX", "FOXA", "OMC", "IPG",
-    # 公用事业
-    "NEE", "DUK", "SO", "D", "SRE", "PEG", "ED", "WEC", "ES", "AWK",
-    # 材料
-    "LIN", "APD", "SHW", "ECL", "DD", "NEM", "FCX", "NUE", "VMC", "MLM",
-    # 房地产
-    "AMT", "PLD", "CCI", "EQIX", "PSA", "SPG", "O", "WELL", "DLR", "AVB",
-    "EQR", "VTR", "ARE", "MAA", "UDR",
-    # 其他大盘
-    "BRK-B", "V", "MA", "ACN", "CRM", "ORCL", "IBM", "NOW", "UBER",
-    "SQ", "SHOP", "SNOW", "NET", "ZM", "DOCU", "OKTA", "TWLO"
-]
-
-# 高波动/主题股票
-EXTRA_WATCHLIST = [
-    # 加密相关
-    "MSTR", "COIN", "HOOD", "MARA", "RIOT", "CLSK",
-    # 量子计算
-    "IONQ", "RGTI", "QUBT",
-    # AI/成长
-    "PLTR", "SOFI", "RKLB", "PATH", "AI",
-    # 中概股
-    "BABA", "NIO", "XPEV", "LI"
-]
-
-# 合并所有股票池
-ALL_STOCKS = list(set(NASDAQ_100 + SP500_EXTRA + EXTRA_WATCHLIST))
+# 股票池定义、文件加载和分片见 universe.py（与 scanner.py 共用）
 
 # ============================================================================
 # 技术指标计算
@@ -173,68 +128,6 @@ def calc_volume_ratio(df, period=20):
     vol_ratio = df['Volume'] / vol_ma
     return vol_ratio
 
-# ============================================================================
-# 摆动点和背离检测
-# ============================================================================
-
-def find_swing_lows(df, window=5):
-    lows = []
-    for i in range(window, len(df) - window):
-        current_low = df['Low'].iloc[i]
-        range_low = df['Low'].iloc[i-window:i+window+1].min()
-        if current_low == range_low:
-            lows.append(i)
-    return lows
-
-def find_swing_highs(df, window=5):
-    highs = []
-    for i in range(window, len(df) - window):
-        current_high = df['High'].iloc[i]
-        range_high = df['High'].iloc[i-window:i+window+1].max()
-        if current_high == range_high:
-            highs.append(i)
-    return highs
-
-def detect_divergence(df, wt1, lookback=30, swing_window=5):
-    bullish_div = False
-    bearish_div = False
-    div_details = ""
-    
-    recent_df = df.iloc[-lookback:].copy()
-    recent_wt1 = wt1.iloc[-lookback:].copy()
-    
-    # 看涨背离
-    swing_lows = find_swing_lows(recent_df, window=swing_window)
-    if len(swing_lows) >= 2:
-        latest_idx = swing_lows[-1]
-        prev_idx = swing_lows[-2]
-        
-        price_latest = recent_df['Low'].iloc[latest_idx]
-        price_prev = recent_df['Low'].iloc[prev_idx]
-        wt1_latest = recent_wt1.iloc[latest_idx]
-        wt1_prev = recent_wt1.iloc[prev_idx]
-        
-        if price_latest < price_prev and wt1_latest > wt1_prev:
-            bullish_div = True
-            div_details = f"底背离: ${price_prev:.1f}→${price_latest:.1f}"
-    
-    # 看跌背离
-    swing_highs = find_swing_highs(recent_df, window=swing_window)
-    if len(swing_highs) >= 2:
-        latest_idx = swing_highs[-1]
-        prev_idx = swing_highs[-2]
-        
-        price_latest = recent_df['High'].iloc[latest_idx]
-        price_prev = recent_df['High'].iloc[prev_idx]
-        wt1_latest = recent_wt1.iloc[latest_idx]
-        wt1_prev = recent_wt1.iloc[prev_idx]
-        
-        if price_latest > price_prev and wt1_latest < wt1_prev:
-            bearish_div = True
-            div_details = f"顶背离: ${price_prev:.1f}→${price_latest:.1f}"
-    
-    return bullish_div, bearish_div, div_details
-
 # ============================================================================
 # 评分系统
 # ============================================================================
@@ -256,6 +149,9 @@ def calc_reversal_score(result, is_oversold=True):
         if result.get('bullish_div'):
             score += 2
             details.append("底背离")
+        elif result.get('bullish_conf', 0) >= divergence.CONFIDENCE_MIN:
+            score += 1
+            details.append("多参数底背离")
         if result.get('rsi', 50) < 30:
             score += 1
             details.append("RSI<30")
@@ -280,6 +176,9 @@ def calc_reversal_score(result, is_oversold=True):
         if result.get('bearish_div'):
             score += 2
             details.append("顶背离")
+        elif result.get('bearish_conf', 0) >= divergence.CONFIDENCE_MIN:
+            score += 1
+            details.append("多参数顶背离")
         if result.get('rsi', 50) > 70:
             score += 1
             details.append("RSI>70")
@@ -308,18 +207,54 @@ def get_score_grade(score):
 # 扫描函数
 # ============================================================================
 
+@st.cache_resource
+def get_scan_coordinator():
+    """进程级扫描协调器：所有会话共享，相同股票池的并发扫描只执行一次"""
+    return ScanCoordinator()
+
+@st.cache_resource
+def get_fetch_flights():
+    """单只股票获取的请求合并（缓存未命中时并发的相同请求只发一次）"""
+    return SingleFlight()
+
+@st.cache_resource
+def start_metrics_server():
+    """设置了 WT_METRICS_PORT 时在后台提供 /metrics（进程内只启动一次）"""
+    port = os.environ.get(metrics.METRICS_PORT_ENV)
+    if not port:
+        return None
+    return metrics.start_http_server(int(port))
+
+@st.cache_resource
+def get_bar_cache():
+    """本地日线缓存：扫描时写入，追踪评估时读取（不额外下载）"""
+    return BarCache()
+
 @st.cache_data(ttl=300)
 def scan_single_stock(symbol):
+    # 只在 st.cache_data 未命中时执行
+    metrics.CACHE_MISSES.inc(cache='scan_result')
+    return get_fetch_flights().do(symbol, lambda: _scan_single_stock(symbol))
+
+def _scan_single_stock(symbol):
     try:
-        ticker = yf.Ticker(symbol)
-        df = ticker.history(period="3mo")
-        
-        if len(df) < 50:
-            return None
-        
-        info = ticker.info
-        market_cap = info.get('marketCap', 0)
+        with metrics.STAGE_SECONDS.time(stage='fetch'):
+            ticker = data_provider.Ticker(symbol)
+            # 有本地缓存时只请求缓存之后缺少的K线
+            df = fetch_history(ticker, symbol, get_bar_cache(), REQUIRED_BARS)
+            
+            if len(df) < MIN_BARS:
+                return None
+            
+            info = ticker.info
+            market_cap = info.get('marketCap', 0)
+        try:
+            get_bar_cache().save(symbol, df, market_cap)
+        except (OSError, ValueError, pa.lib.ArrowException) as e:
+            # 缓存写入失败不影响本次结果，但要留下记录（磁盘满、缓存文件损坏等）
+            print(f"  ⚠️ 写入 {symbol} 日线缓存失败: {e}")
         
+        df = to_compute_dtype(df)
         wt1, wt2 = calc_wavetrend(df)
         rsi = calc_rsi(df)
         vol_ratio = calc_volume_ratio(df)
@@ -346,8 +281,8 @@ def scan_single_stock(symbol):
         
         wt_direction = "↑" if current_wt1 > prev_wt1 else "↓" if current_wt1 < prev_wt1 else "→"
         
-        # 背离
-        bullish_div, bearish_div, div_details = detect_divergence(df, wt1)
+        # 背离（默认 30/5 参数，另含多参数置信度）
+        div = divergence.latest_divergence(df, wt1)
         
         # 成交量状态
         if current_vol_ratio >= 2.0:
@@ -370,9 +305,7 @@ def scan_single_stock(symbol):
             'rsi': round(current_rsi, 1),
             'vol_ratio': round(current_vol_ratio, 2),
             'vol_status': vol_status,
-            'bullish_div': bullish_div,
-            'bearish_div': bearish_div,
-            'div_details': div_details,
+            **div,
             'market_cap_b': round(market_cap / 1e9, 1) if market_cap else 0,
         }
         
@@ -380,25 +313,53 @@ def scan_single_stock(symbol):
     except Exception as e:
         return None
 
-def scan_all_stocks(symbols, min_market_cap_b, ob_level, os_level, progress_bar=None):
-    results = []
-    skipped_no_data = 0
-    skipped_market_cap = 0
+def fetch_all_stocks(symbols, flight=None):
+    """
+    获取并计算全部股票的指标（不含阈值相关的分类，可在会话之间共享）
+    flight: singleflight.Flight，用于报告进度
+    """
+    raw_results = []
+    total = len(symbols)
+    start = time.perf_counter()
     
     for i, symbol in enumerate(symbols):
-        if progress_bar:
-            progress_bar.progress((i + 1) / len(symbols), f"扫描中: {symbol}")
+        if flight:
+            flight.report(i + 1, total, symbol)
         
+        metrics.CACHE_REQUESTS.inc(cache='scan_result')
         result = scan_single_stock(symbol)
-        
-        if result is None:
-            skipped_no_data += 1
-            continue
-        
-        if result['market_cap_b'] < min_market_cap_b:
+        if result is not None:
+            raw_results.append(result)
+    
+    # 每次实际扫描计数一次（共享结果的会话不重复计数）；市值过滤由各会话按自己的设置执行，这里不计 filtered
+    metrics.SYMBOLS.inc(len(raw_results), outcome='fetched')
+    metrics.SYMBOLS.inc(total - len(raw_results), outcome='failed')
+    metrics.SCAN_DURATION.set(time.perf_counter() - start, mode='app')
+    metrics.SCAN_LAST_SUCCESS.set_to_current_time(mode='app')
+    
+    # 保存冷启动快照（失败不影响本次扫描）
+    try:
+        snapshot.save_snapshot(raw_results, symbols, datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                               get_bar_cache())
+        get_warm_start.clear()
+    except (OSError, pa.lib.ArrowException) as e:
+        # 可能在后台刷新线程中运行（没有页面上下文），打印到日志
+        print(f"  ⚠️ 保存冷启动快照失败: {e}")
+    return raw_results
+
+def classify_stocks(raw_results, total, min_market_cap_b, ob_level, os_level):
+    """按会话自己的市值/阈值设置分类和评分，返回 (results, stats)"""
+    results = []
+    skipped_market_cap = 0
+    
+    for raw in raw_results:
+        if raw['market_cap_b'] < min_market_cap_b:
             skipped_market_cap += 1
             continue
         
+        # 共享结果不能修改，逐条复制
+        result = dict(raw)
+        
         # 分类
         if result['wt1'] <= os_level:
             result['signal'] = '🟢 超卖'
@@ -427,15 +388,133 @@ def scan_all_stocks(symbols, min_market_cap_b, ob_level, os_level, progress_bar=
         
         results.append(result)
     
-    # 调试信息
+    stats = {
+        'total': total,
+        'skipped_no_data': total - len(raw_results),
+        'skipped_market_cap': skipped_market_cap,
+        'results': len(results),
+    }
+    return results, stats
+
+def scan_all_stocks(symbols, min_market_cap_b, ob_level, os_level, progress_bar=None):
+    """
+    扫描股票池
+    同一时间相同股票池的扫描只在后台执行一次，其他会话加入并共享结果；
+    本会话只负责显示进度和按自己的设置分类
+    """
+    flight, joined = get_scan_coordinator().start(tuple(symbols), lambda f: fetch_all_stocks(symbols, f))
+    if joined:
+        st.info(f"已有进行中的扫描，加入共享结果（{flight.subscribers} 个会话）")
+    
+    while not flight.wait(0.5):
+        if progress_bar:
+            progress_bar.progress(flight.fraction, f"扫描中: {flight.label}")
+    
+    return classify_stocks(flight.result(), len(symbols), min_market_cap_b, ob_level, os_level)
+
+@st.cache_resource
+def get_warm_start():
+    """进程启动时读取一次冷启动快照（内存映射），没有时为 None"""
+    try:
+        return snapshot.load_snapshot()
+    except Exception:
+        return None
+
+def start_background_refresh(symbols, warm):
+    """后台执行完整扫描（先用快照面板补种日线缓存，扫描时只请求缺少的K线），返回 flight"""
+    def refresh(flight):
+        snapshot.seed_cache(warm, get_bar_cache())
+        return fetch_all_stocks(symbols, flight)
+    
+    flight, _ = get_scan_coordinator().start(tuple(symbols), refresh)
+    return flight
+
+def load_warm_start(symbols, min_market_cap_b, ob_level, os_level):
+    """
+    会话还没有扫描结果时，先显示快照中的结果并启动后台刷新
+    快照的股票池与当前不同时不使用
+    """
+    warm = get_warm_start()
+    if warm is None or not warm.raw_results or set(warm.symbols) != set(symbols):
+        return False
+    
+    results, stats = classify_stocks(warm.raw_results, len(warm.symbols), min_market_cap_b, ob_level, os_level)
+    st.session_state.scan_results = results
+    st.session_state.scan_stats = stats
+    st.session_state.scan_time = warm.scan_time
+    st.session_state.refresh_flight = start_background_refresh(symbols, warm)
+    return True
+
+def _refresh_status_panel(min_market_cap_b, ob_level, os_level):
+    flight = st.session_state.get('refresh_flight')
+    if flight is None:
+        return
+    if not flight.finished():
+        st.caption(f"⏳ 当前显示 {st.session_state.scan_time} 的快照，后台刷新中: "
+                   f"{flight.done}/{flight.total} {flight.label}")
+        return
+    
+    st.session_state.refresh_flight = None
+    try:
+        raw_results = flight.result()
+    except Exception as e:
+        st.warning(f"后台刷新失败，继续显示快照: {e}")
+        return
+    results, stats = classify_stocks(raw_results, len(flight.key), min_market_cap_b, ob_level, os_level)
+    st.session_state.scan_results = results
+    st.session_state.scan_stats = stats
+    st.session_state.scan_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    st.rerun()
+
+# 支持 st.fragment 的版本每秒检查一次，刷新完成后整页重绘；否则随页面交互检查
+display_refresh_status = (st.fragment(run_every=1)(_refresh_status_panel)
+                          if hasattr(st, 'fragment') else _refresh_status_panel)
+
+def display_scan_stats(stats):
+    """侧边栏扫描统计（每个会话各自显示）"""
     st.sidebar.markdown("---")
     st.sidebar.markdown("### 📊 扫描统计")
-    st.sidebar.markdown(f"- 总股票数: {len(symbols)}")
-    st.sidebar.markdown(f"- 数据获取失败: {skipped_no_data}")
-    st.sidebar.markdown(f"- 市值不足过滤: {skipped_market_cap}")
-    st.sidebar.markdown(f"- 最终结果: {len(results)}")
+    st.sidebar.markdown(f"- 总股票数: {stats['total']}")
+    st.sidebar.markdown(f"- 数据获取失败: {stats['skipped_no_data']}")
+    st.sidebar.markdown(f"- 市值不足过滤: {stats['skipped_market_cap']}")
+    st.sidebar.markdown(f"- 最终结果: {stats['results']}")
+
+# 市场宽度显示的交易日数
+BREADTH_DAYS = 120
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_market_breadth(symbols, ob_level, os_level, scan_time):
+    """在本地日线缓存上一次向量化计算市场宽度（scan_time 变化即重新计算）"""
+    cache = get_bar_cache()
+    frames = ((s, df) for s in symbols for df in [cache.load(s)[0]] if df is not None)
+    return breadth.compute_breadth(frames, ob_level=ob_level, os_level=os_level).tail(BREADTH_DAYS)
+
+def display_market_breadth(symbols, ob_level, os_level, scan_time):
+    """市场宽度: 超卖/超买占比、净交叉、背离数，作为单只股票信号的背景"""
+    series = get_market_breadth(tuple(symbols), ob_level, os_level, scan_time)
+    if not len(series):
+        return
     
-    return results
+    latest = series.iloc[-1]
+    back = series.iloc[-min(5, len(series) - 1) - 1]
+    with st.expander(f"🌊 市场宽度（{series.index[-1]:%Y-%m-%d}，{int(latest['symbols'])} 只）"):
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("超卖占比", f"{latest['pct_oversold']:.1f}%",
+                      f"{latest['pct_oversold'] - back['pct_oversold']:+.1f}pp (5日)", delta_color="off")
+        with col2:
+            st.metric("超买占比", f"{latest['pct_overbought']:.1f}%",
+                      f"{latest['pct_overbought'] - back['pct_overbought']:+.1f}pp (5日)", delta_color="off")
+        with col3:
+            st.metric("净交叉 (金叉-死叉)", f"{int(latest['net_cross']):+d}")
+        with col4:
+            st.metric("底背离 / 顶背离", f"{int(latest['bullish_div'])} / {int(latest['bearish_div'])}")
+        
+        st.line_chart(series[['pct_oversold', 'pct_overbought']].rename(
+            columns={'pct_oversold': '超卖 %', 'pct_overbought': '超买 %'}))
+        st.bar_chart(series[['net_cross']].rename(columns={'net_cross': '净交叉'}))
+        st.line_chart(series[['bullish_div', 'bearish_div']].rename(
+            columns={'bullish_div': '底背离', 'bearish_div': '顶背离'}))
 
 # ============================================================================
 # Google Sheets 追踪模块
@@ -518,7 +597,7 @@ def delete_sheet_row(sheet, row_index):
 def get_current_price(symbol):
     """获取当前价格"""
     try:
-        ticker = yf.Ticker(symbol)
+        ticker = data_provider.Ticker(symbol)
         df = ticker.history(period="5d")
         if len(df) > 0:
             return round(df['Close'].iloc[-1], 2)
@@ -531,7 +610,7 @@ def get_trading_days_count(start_date_str):
     try:
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
         # 获取 SPY 的历史数据来计算交易日
-        spy = yf.Ticker("SPY")
+        spy = data_provider.Ticker("SPY")
         df = spy.history(start=start_date, end=datetime.now())
         return len(df)
     except:
@@ -583,8 +662,25 @@ def update_tracking_data():
         try:
             records = sheet.get_all_records()
             
+            # 有本地日线缓存的记录一次性按价格路径评估，其余回退到逐只取价
+            tracking = [(idx, item) for idx, item in enumerate(records) if item.get("status") == "追踪中"]
+            outcomes = tracking_eval.evaluate([item for _, item in tracking], list_key, get_bar_cache())
+            outcome_of = {idx: row for (idx, _), (_, row) in zip(tracking, outcomes.iterrows())}
+            
             for idx, item in enumerate(records):
                 if item.get("status") == "追踪中":
+                    outcome = outcome_of[idx]
+                    if outcome["covered"]:
+                        item["current_price"] = float(outcome["current_price"])
+                        item["change_pct"] = float(outcome["change_pct"])
+                        item["trading_days"] = int(outcome["trading_days"])
+                        item["result"] = outcome["result"]
+                        if outcome["complete"]:
+                            item["status"] = "已完成"
+                        update_sheet_row(sheet, idx, item)
+                        data[list_key].append(item)
+                        continue
+                    
                     # 更新价格
                     current_price = get_current_price(item["symbol"])
                     if current_price:
@@ -647,8 +743,14 @@ def remove_from_tracking(symbol, signal_type):
     
     return False
 
-def calculate_accuracy(items):
-    """计算准确率"""
+def calculate_accuracy(items, outcomes=None):
+    """
+    计算准确率
+    outcomes: tracking_eval.evaluate 的结果（与 items 对应）；提供时有缓存数据的记录按价格路径判定
+    """
+    if outcomes is not None and len(outcomes):
+        items = [dict(item, result=row["result"]) if row["covered"] else item
+                 for item, (_, row) in zip(items, outcomes.iterrows())]
     completed = [item for item in items if item.get("status") == "已完成"]
     if not completed:
         return None, 0, 0
@@ -659,6 +761,29 @@ def calculate_accuracy(items):
     
     return accuracy, correct, total
 
+def display_path_stats(outcomes):
+    """价格路径统计: 平均最大有利/不利波动、到达 ±5% 的平均交易日、各周期平均收益"""
+    rows = []
+    for key, label in [("bullish", "🟢 做多"), ("bearish", "🔴 做空")]:
+        if not outcomes[key]["covered"].any():
+            continue
+        stats = tracking_eval.summarize(outcomes[key])
+        row = {
+            '方向': label,
+            '样本': int(outcomes[key]["covered"].sum()),
+            '平均MFE%': stats['avg_mfe'],
+            '平均MAE%': stats['avg_mae'],
+            '到达目标(天)': stats['avg_target_day'],
+        }
+        for h in tracking_eval.HORIZONS:
+            row[f'{h}日收益%'] = stats[f'avg_ret_{h}d']
+        rows.append(row)
+    
+    if rows:
+        with st.expander("📐 价格路径统计（基于本地日线缓存）"):
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+            st.caption("MFE/MAE: D0 之后 30 个交易日内的最大有利/不利波动（做空方向已换算）；判定按先触及 ±5% 的一侧")
+
 def display_tracking_module():
     """显示追踪模块"""
     st.markdown("---")
@@ -707,9 +832,10 @@ def display_tracking_module():
     
     col1, col2, col3, col4 = st.columns(4)
     
-    # 计算准确率
-    bullish_accuracy, bullish_correct, bullish_total = calculate_accuracy(data["bullish"])
-    bearish_accuracy, bearish_correct, bearish_total = calculate_accuracy(data["bearish"])
+    # 计算准确率（有本地日线缓存的记录按价格路径判定）
+    outcomes = {key: tracking_eval.evaluate(data[key], key, get_bar_cache()) for key in ("bullish", "bearish")}
+    bullish_accuracy, bullish_correct, bullish_total = calculate_accuracy(data["bullish"], outcomes["bullish"])
+    bearish_accuracy, bearish_correct, bearish_total = calculate_accuracy(data["bearish"], outcomes["bearish"])
     
     bullish_tracking = [i for i in data["bullish"] if i.get("status") == "追踪中"]
     bearish_tracking = [i for i in data["bearish"] if i.get("status") == "追踪中"]
@@ -729,6 +855,8 @@ def display_tracking_module():
         else:
             st.metric("🔴 做空准确率", "暂无数据")
     
+    display_path_stats(outcomes)
+    
     # Tab 显示详情
     tab1, tab2, tab3 = st.tabs(["🟢 做多信号追踪", "🔴 做空信号追踪", "📋 历史记录"])
     
@@ -809,10 +937,68 @@ def display_tracking_module():
         if not completed_bullish and not completed_bearish:
             st.info("暂无已完成的追踪记录")
 
+# ============================================================================
+# 盘中实时信号（live.py 写入的事件）
+# ============================================================================
+
+def _live_events_panel():
+    events = load_recent_events()
+    if not events:
+        return
+    st.markdown(f"### ⚡ 盘中实时信号（最近 {len(events)} 条）")
+    rows = [{
+        '时间': e['ts'],
+        '股票': e['symbol'],
+        '变化': f"{ZONE_LABELS[e['from']]} → {ZONE_LABELS[e['to']]}",
+        'WT1': e['wt1'],
+        '价格': e['price'],
+        '交叉': e['cross'],
+    } for e in events]
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+# 支持 st.fragment 的版本每秒自动刷新，否则随页面刷新
+display_live_events = st.fragment(run_every=1)(_live_events_panel) if hasattr(st, 'fragment') else _live_events_panel
+
 # ============================================================================
 # 显示结果函数
 # ============================================================================
 
+def display_custom_screens(results):
+    """自定义筛选表达式：保存到 data/screens.json，对当前会话的扫描结果评估（不访问网络）"""
+    with st.expander("🔎 自定义筛选"):
+        st.caption("例如 `wt1 < -60 and rsi < 35 and vol_ratio > 1.2 and bullish_div`；可用列: "
+                   + ", ".join(screens.COLUMNS))
+        col1, col2, col3 = st.columns([1, 3, 1])
+        with col1:
+            name = st.text_input("名称", key="screen_name")
+        with col2:
+            expr = st.text_input("表达式", key="screen_expr")
+        with col3:
+            st.write("")
+            if st.button("💾 保存", key="screen_save") and name and expr:
+                try:
+                    screens.add_screen(name.strip(), expr)
+                    st.success(f"已保存筛选 {name}")
+                except screens.ScreenError as e:
+                    st.error(str(e))
+        
+        saved = screens.load_screens()
+        if not saved:
+            st.info("还没有保存的筛选")
+            return
+        hits, errors = screens.screen_hits(results)
+        for error in errors:
+            st.warning(error)
+        for screen_name, symbols in hits.items():
+            col1, col2 = st.columns([5, 1])
+            with col1:
+                st.markdown(f"**{screen_name}** `{saved[screen_name]}` → {len(symbols)} 只: "
+                            f"{', '.join(symbols) if symbols else '无'}")
+            with col2:
+                if st.button("🗑️", key=f"screen_remove_{screen_name}"):
+                    screens.remove_screen(screen_name)
+                    st.rerun()
+
 def display_results(results, scan_time):
     """显示扫描结果"""
     
@@ -927,6 +1113,8 @@ def display_results(results, scan_time):
         all_sorted = sorted(results, key=lambda x: x['score'], reverse=True)
         display_table(all_sorted)
     
+    display_custom_screens(results)
+    
     st.markdown("---")
     st.caption(f"⏰ 扫描时间: {scan_time}")
 
@@ -935,6 +1123,7 @@ def display_results(results, scan_time):
 # ============================================================================
 
 def main():
+    start_metrics_server()
     st.title("📊 WaveTrend 扫描器 V3.0")
     st.markdown("**新增**: 信号追踪模块 - Google Sheets 持久化存储")
     
@@ -942,6 +1131,7 @@ def main():
     if 'scan_results' not in st.session_state:
         st.session_state.scan_results = None
         st.session_state.scan_time = None
+        st.session_state.scan_stats = None
     
     # 侧边栏
     with st.sidebar:
@@ -1007,15 +1197,28 @@ def main():
         # 扫描逻辑
         if scan_button:
             progress_bar = st.progress(0, "准备扫描...")
-            results = scan_all_stocks(symbols, min_market_cap, ob_level, os_level, progress_bar)
+            results, stats = scan_all_stocks(symbols, min_market_cap, ob_level, os_level, progress_bar)
             progress_bar.empty()
             
             # 保存到 session state
             st.session_state.scan_results = results
+            st.session_state.scan_stats = stats
             st.session_state.scan_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            st.session_state.refresh_flight = None
+        elif st.session_state.scan_results is None:
+            # 冷启动: 先显示上次扫描的快照
+            load_warm_start(symbols, min_market_cap, ob_level, os_level)
+        
+        display_refresh_status(min_market_cap, ob_level, os_level)
+        
+        if st.session_state.scan_stats is not None:
+            display_scan_stats(st.session_state.scan_stats)
+        
+        display_live_events()
         
         # 显示结果
         if st.session_state.scan_results is not None:
+            display_market_breadth(symbols, ob_level, os_level, st.session_state.scan_time)
             display_results(st.session_state.scan_results, st.session_state.scan_time)
         else:
             st.info("👆 点击 **开始扫描** 按钮开始扫描股票")
@@ -0,0 +1,160 @@
+"""
+扫描结果的 Arrow IPC（Feather v2）导出
+下游看板/notebook 直接内存映射读取，不再解析 latest_scan.json
+
+文件:
+    scan_results.arrow       每只股票一行，字段同 scan_archive.SCAN_SCHEMA
+    indicator_series.arrow   长表: symbol, date, wt1, wt2, rsi, vol_ratio
+
+Schema 版本写在 schema metadata 的 b'wavetrend.schema_version'，
+每个字段的说明写在字段 metadata 的 b'description'。
+字段只增不改；删除或改变含义时提升 SCHEMA_VERSION。
+文件不压缩，读取时 pa.memory_map + ipc.open_file 为零拷贝。
+
+读取示例:
+    import arrow_export
+    table = arrow_export.load_table("data/arrow/scan_results.arrow")
+    df = table.to_pandas()
+"""
+
+import argparse
+import os
+import uuid
+
+import numpy as np
+import pyarrow as pa
+
+from bar_cache import _to_naive_dates
+from scan_archive import SCAN_SCHEMA, results_to_table
+
+SCHEMA_VERSION = 1
+VERSION_KEY = b'wavetrend.schema_version'
+
+RESULTS_FILE = "scan_results.arrow"
+SERIES_FILE = "indicator_series.arrow"
+
+FIELD_DOCS = {
+    'scan_time': "扫描时间 YYYY-MM-DD HH:MM:SS",
+    'symbol': "股票代码（Yahoo 格式）",
+    'signal_type': "oversold / overbought / approaching_os / approaching_ob / neutral",
+    'price': "最新收盘价",
+    'price_change': "当日涨跌幅 %",
+    'wt1': "WaveTrend WT1（n1=10, n2=21）",
+    'wt2': "WT2 = WT1 的 4 日均线",
+    'wt_direction': "WT1 方向 ↑ / ↓ / →",
+    'cross': "当日金叉/死叉，无则为空字符串",
+    'rsi': "RSI(14)",
+    'vol_ratio': "成交量 / 20 日均量",
+    'bullish_div': "底背离（30 日内最近两个摆动低点）",
+    'bearish_div': "顶背离（30 日内最近两个摆动高点）",
+    'div_details': "背离详情",
+    'market_cap': "市值（美元）",
+    'score': "反转评分 0-9",
+    'grade': "评分等级 A/B/C/D",
+    'score_details': "评分明细",
+    'bullish_conf': "底背离多参数置信度 0-1（20/30/60 回看 × 3/5/8 摆动窗口中触发的比例）",
+    'bearish_conf': "顶背离多参数置信度 0-1",
+    'div_configs': "触发的背离参数组（回看/窗口）及强度（价格变化 %, WT1 变化），例如 \"底 20,30/3(-4.2%, +8.1) | 顶 60/8(+2.1%, -5.0)\"",
+    'deferred': "未计算的延迟字段（远离信号区的中性股票，值为 null；可用 scanner.restore_deferred 从日线缓存重算）",
+    'deferred_as_of': "延迟字段对应的最后一根K线日期",
+    'date': "交易日",
+}
+
+def _documented(schema):
+    fields = [f.with_metadata({b'description': FIELD_DOCS.get(f.name, '').encode()}) for f in schema]
+    return pa.schema(fields, metadata={VERSION_KEY: str(SCHEMA_VERSION).encode()})
+
+RESULTS_SCHEMA = _documented(SCAN_SCHEMA)
+
+SERIES_SCHEMA = _documented(pa.schema([
+    ('symbol', pa.dictionary(pa.int32(), pa.string())),
+    ('date', pa.date32()),
+    ('wt1', pa.float32()),
+    ('wt2', pa.float32()),
+    ('rsi', pa.float32()),
+    ('vol_ratio', pa.float32()),
+]))
+
+# ============================================================================
+# 1. 写入
+# ============================================================================
+
+def _write_ipc(table, path):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+def series_to_table(series):
+    """
+    series: {symbol: DataFrame(index=日期, 列 wt1/wt2/rsi/vol_ratio)}
+    拼接为长表，symbol 列字典编码
+    """
+    symbols = list(series)
+    lengths = [len(series[s]) for s in symbols]
+    codes = np.repeat(np.arange(len(symbols), dtype=np.int32), lengths)
+
+    def concat(parts, dtype):
+        return np.concatenate(parts) if parts else np.array([], dtype=dtype)
+
+    def column(name):
+        return concat([series[s][name].to_numpy(dtype=np.float32) for s in symbols], np.float32)
+
+    dates = concat([_to_naive_dates(series[s].index).to_numpy().astype('datetime64[D]') for s in symbols],
+                   'datetime64[D]')
+
+    arrays = [
+        pa.DictionaryArray.from_arrays(pa.array(codes), pa.array(symbols, pa.string())),
+        pa.array(dates, pa.date32()),
+        pa.array(column('wt1')),
+        pa.array(column('wt2')),
+        pa.array(column('rsi')),
+        pa.array(column('vol_ratio')),
+    ]
+    return pa.Table.from_arrays(arrays, schema=SERIES_SCHEMA)
+
+def export_scan(scan_results, series=None, out_dir=os.path.join("data", "arrow")):
+    """导出扫描结果（以及可选的指标序列）为 Arrow IPC 文件，返回写入的路径列表"""
+    os.makedirs(out_dir, exist_ok=True)
+    table = results_to_table(scan_results['all'], scan_results['scan_time']).cast(RESULTS_SCHEMA)
+    paths = [os.path.join(out_dir, RESULTS_FILE)]
+    _write_ipc(table, paths[0])
+
+    if series is not None:
+        paths.append(os.path.join(out_dir, SERIES_FILE))
+        _write_ipc(series_to_table(series), paths[1])
+    return paths
+
+# ============================================================================
+# 2. 读取
+# ============================================================================
+
+def load_table(path):
+    """内存映射读取（零拷贝），schema 版本不兼容时抛出 ValueError"""
+    source = pa.memory_map(path, 'r')
+    table = pa.ipc.open_file(source).read_all()
+    version = int((table.schema.metadata or {}).get(VERSION_KEY, b'0'))
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"{path} schema 版本为 {version}，当前支持 {SCHEMA_VERSION}")
+    return table
+
+def describe(path):
+    """打印文件的 schema 说明"""
+    table = load_table(path)
+    print(f"{path}: {table.num_rows} 行, schema 版本 {SCHEMA_VERSION}")
+    for field in table.schema:
+        doc = (field.metadata or {}).get(b'description', b'').decode()
+        print(f"  {field.name:14} {str(field.type):40} {doc}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查看 Arrow 导出文件的 schema 说明")
+    parser.add_argument("paths", nargs="*",
+                        default=[os.path.join("data", "arrow", RESULTS_FILE),
+                                 os.path.join("data", "arrow", SERIES_FILE)])
+    args = parser.parse_args(argv)
+    for path in args.paths:
+        describe(path)
+
+if __name__ == "__main__":
+    main()
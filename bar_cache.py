@@ -0,0 +1,146 @@
+"""
+本地日线缓存
+- 每只股票一个 .npz 文件: 日期 + 紧凑 OHLCV（见 ingest.py）+ 市值历史
+- 每次在线获取数据时写入（新数据覆盖同日期旧数据，历史逐日累积）
+- 历史扫描（as-of）完全从缓存读取，按日期截断，不再请求网络
+"""
+
+import os
+import re
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import ingest
+
+BAR_CACHE_DIR = os.environ.get('WT_BAR_CACHE', os.path.join("data", "bars"))
+
+def _to_naive_dates(index):
+    """日线索引统一为无时区的日期（去掉 America/New_York 时区和时间部分）"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
+
+def period_start(end, period):
+    """
+    与 yfinance period 参数含义一致的起始日期
+    支持 Nd / Nwk / Nmo / Ny，例如 '3mo' -> end 往前 3 个月
+    """
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"不支持的 period: {period}")
+    n, unit = int(match.group(1)), match.group(2)
+    offset = {
+        'd': pd.DateOffset(days=n),
+        'wk': pd.DateOffset(weeks=n),
+        'mo': pd.DateOffset(months=n),
+        'y': pd.DateOffset(years=n),
+    }[unit]
+    return pd.Timestamp(end) - offset
+
+class BarCache:
+    """按股票代码存储的日线缓存"""
+
+    def __init__(self, cache_dir=BAR_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def path(self, symbol):
+        return os.path.join(self.cache_dir, f"{symbol}.npz")
+
+    def symbols(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return sorted(n[:-4] for n in os.listdir(self.cache_dir) if n.endswith(".npz"))
+
+    def __contains__(self, symbol):
+        return os.path.exists(self.path(symbol))
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+
+    def _load_arrays(self, symbol):
+        try:
+            with np.load(self.path(symbol)) as npz:
+                return {k: npz[k] for k in npz.files}
+        except FileNotFoundError:
+            return None
+
+    def load(self, symbol):
+        """
+        读取全部缓存
+        返回 (df, market_caps)，market_caps 为按日期索引的市值 Series；没有缓存时返回 (None, None)
+        """
+        arrays = self._load_arrays(symbol)
+        if arrays is None:
+            return None, None
+        index = pd.DatetimeIndex(arrays['dates'].astype('datetime64[ns]'))
+        df = pd.DataFrame({c: arrays[c] for c in ingest.KEEP_COLUMNS if c in arrays}, index=index)
+        market_caps = pd.Series(arrays['cap_values'],
+                                index=pd.DatetimeIndex(arrays['cap_dates'].astype('datetime64[ns]')))
+        return df, market_caps
+
+    def load_as_of(self, symbol, as_of, period="3mo", bars=None):
+        """
+        还原 as_of 当天在线扫描看到的数据
+        日线截断到 as_of（含），再取最后 bars 根（给定时）或按 period 取窗口；
+        市值取 as_of 当天或之前最近一次记录
+        返回 (df, market_cap)
+        """
+        df, market_caps = self.load(symbol)
+        if df is None:
+            return None, None
+        as_of = pd.Timestamp(as_of).normalize()
+        if bars is not None:
+            df = df.loc[:as_of].iloc[-bars:]
+        else:
+            df = df.loc[period_start(as_of, period):as_of]
+
+        caps = market_caps.loc[:as_of]
+        if len(caps):
+            market_cap = caps.iloc[-1]
+        elif len(market_caps):
+            # 缓存建立之前的日期：用最早的市值记录近似
+            market_cap = market_caps.iloc[0]
+        else:
+            market_cap = 0
+        return df, int(market_cap)
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def save(self, symbol, df, market_cap=None, as_of=None, replace=False):
+        """
+        合并写入：新数据覆盖相同日期的旧数据
+        replace: 丢弃全部旧K线（复权基准变化时；市值记录保留）
+        market_cap 记录在 as_of（默认为 df 最后一个交易日）
+        """
+        df = df.copy()
+        df.index = _to_naive_dates(df.index)
+        df = ingest.compact_ohlcv(df)
+
+        old_df, market_caps = self.load(symbol)
+        if old_df is not None and not replace:
+            df = pd.concat([old_df[~old_df.index.isin(df.index)], df]).sort_index()
+            df = ingest.compact_ohlcv(df)
+        elif market_caps is None:
+            market_caps = pd.Series(dtype=np.int64)
+
+        if market_cap:
+            cap_date = pd.Timestamp(as_of).normalize() if as_of is not None else df.index[-1]
+            market_caps = market_caps[market_caps.index != cap_date]
+            market_caps = pd.concat([market_caps, pd.Series([int(market_cap)], index=[cap_date])]).sort_index()
+
+        arrays = {c: df[c].to_numpy() for c in df.columns}
+        arrays['dates'] = df.index.to_numpy().astype('datetime64[D]')
+        arrays['cap_dates'] = pd.DatetimeIndex(market_caps.index).to_numpy().astype('datetime64[D]')
+        arrays['cap_values'] = market_caps.to_numpy(dtype=np.int64)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.path(symbol)}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, self.path(symbol))
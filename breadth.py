@@ -0,0 +1,248 @@
+"""
+市场宽度时间序列
+- 每个交易日全体股票中: WT1 超卖/超买占比、金叉数 - 死叉数（净交叉）、底/顶背离数、WT1 均值，
+  作为单只股票信号的市场背景
+- 在 symbols × 交易日 面板上一次向量化计算: 按批用 kernels 计算 WT1/WT2 和摆动点，
+  背离用二维的 signal_matrix.divergence_series，每批按日期汇总后合并
+  只需要 WT 和背离，不计算 RSI / 成交量 / 评分，比先算完整信号矩阵快得多
+- 与信号矩阵相同的有效性判断（历史不足 MIN_BARS 或 WT1 为 NaN 的股票当天不计入）；
+  已有信号矩阵时 from_matrix 直接按列汇总，计数相同
+- 增量更新: data/breadth.parquet（WT_BREADTH_FILE）保存已计算的日期，update() 只计算最后一天和之后的新交易日
+  （每只股票只取最近 REQUIRED_BARS + 新增天数 根K线，与在线扫描的预热长度相同）
+
+用法:
+    python breadth.py build --start 2025-01-01          # 从 data/bars 日线缓存重建
+    python breadth.py build --matrix data/signal_matrix.npz
+    python breadth.py update                             # 追加新交易日
+    python breadth.py show --days 20
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import kernels
+from lookback_planner import REQUIRED_BARS
+from scanner import MIN_BARS
+from signal_matrix import (BATCH_SIZE, CROSS_DEATH, CROSS_GOLDEN, NO_DATA, SIGNAL_TYPES, _batches,
+                           divergence_series, iter_cache_frames, padded_groups)
+
+BREADTH_FILE_ENV = 'WT_BREADTH_FILE'
+DEFAULT_BREADTH_FILE = os.path.join("data", "breadth.parquet")
+
+COUNT_FIELDS = ('symbols', 'oversold', 'overbought', 'golden_cross', 'death_cross',
+                'bullish_div', 'bearish_div')
+BREADTH_COLUMNS = COUNT_FIELDS + ('pct_oversold', 'pct_overbought', 'net_cross', 'mean_wt1')
+
+# ============================================================================
+# 1. 计算
+# ============================================================================
+
+def _finish(counts):
+    """计数（含 wt1_sum）-> 宽度表（按日期排序）"""
+    counts = counts[counts['symbols'] > 0].sort_index()
+    out = counts[list(COUNT_FIELDS)].astype(np.int64)
+    n = out['symbols'].to_numpy(dtype=np.float64)
+    out['pct_oversold'] = np.round(out['oversold'] / n * 100, 1)
+    out['pct_overbought'] = np.round(out['overbought'] / n * 100, 1)
+    out['net_cross'] = out['golden_cross'] - out['death_cross']
+    out['mean_wt1'] = np.round(counts['wt1_sum'].to_numpy() / n, 2)
+    out.index = pd.DatetimeIndex(out.index, name='date')
+    return out
+
+def _group_counts(members, columns, batch, ob_level, os_level, lookback, swing_window):
+    """一组补齐后的二维数组 -> 按日期汇总的计数"""
+    high, low, close = columns['High'], columns['Low'], columns['Close']
+    wt1, wt2 = kernels.wavetrend_2d(high, low, close)
+    low64, high64 = low.astype(np.float64), high.astype(np.float64)
+    bullish = divergence_series(low64, wt1, kernels.swing_mask_2d(low64, swing_window, 'low'),
+                                True, lookback, swing_window)
+    bearish = divergence_series(high64, wt1, kernels.swing_mask_2d(high64, swing_window, 'high'),
+                                False, lookback, swing_window)
+
+    prev_wt1 = np.concatenate([wt1[:, :1], wt1[:, :-1]], axis=1)
+    prev_wt2 = np.concatenate([wt2[:, :1], wt2[:, :-1]], axis=1)
+    bars = np.cumsum(~np.isnan(close), axis=1)
+    valid = (bars >= MIN_BARS) & ~np.isnan(wt1)
+    # 每个格子的交易日（左侧补齐部分为 NaN）
+    days = kernels.left_pad([batch[i][1].index.to_numpy().astype('datetime64[D]').astype(np.int64)
+                             for i in members])
+
+    with np.errstate(invalid='ignore'):
+        flags = {
+            'symbols': valid,
+            'oversold': wt1 <= os_level,
+            'overbought': wt1 >= ob_level,
+            'golden_cross': (wt1 > wt2) & (prev_wt1 <= prev_wt2),
+            'death_cross': (wt1 < wt2) & (prev_wt1 >= prev_wt2),
+            'bullish_div': bullish,
+            'bearish_div': bearish,
+        }
+    frame = pd.DataFrame({name: flag[valid] for name, flag in flags.items()})
+    frame['wt1_sum'] = wt1[valid]
+    frame['day'] = days[valid].astype(np.int64)
+    return frame.groupby('day').sum()
+
+def compute_breadth(frames, start=None, end=None, ob_level=60, os_level=-60, lookback=30,
+                    swing_window=5, batch_size=BATCH_SIZE):
+    """
+    frames: 可迭代的 (symbol, df)，df 应包含 start 之前足够的历史用于预热
+    返回 DataFrame（行: 交易日）: BREADTH_COLUMNS
+    """
+    parts = []
+    for batch in _batches(frames, batch_size):
+        for members, columns in padded_groups(batch):
+            parts.append(_group_counts(members, columns, batch, ob_level, os_level, lookback, swing_window))
+    if not parts:
+        return pd.DataFrame(columns=list(BREADTH_COLUMNS), index=pd.DatetimeIndex([], name='date'))
+
+    counts = pd.concat(parts).groupby(level=0).sum()
+    counts.index = counts.index.to_numpy().astype('datetime64[D]').astype('datetime64[ns]')
+    out = _finish(counts)
+    if start is not None:
+        out = out.loc[pd.Timestamp(start):]
+    if end is not None:
+        out = out.loc[:pd.Timestamp(end)]
+    return out
+
+def from_matrix(matrix):
+    """已有信号矩阵时按列汇总（阈值为计算矩阵时使用的阈值）"""
+    signal = matrix['signal']
+    valid = signal != NO_DATA
+    counts = pd.DataFrame({
+        'symbols': valid.sum(axis=0),
+        'oversold': (signal == SIGNAL_TYPES.index('oversold')).sum(axis=0),
+        'overbought': (signal == SIGNAL_TYPES.index('overbought')).sum(axis=0),
+        'golden_cross': (matrix['cross'] == CROSS_GOLDEN).sum(axis=0),
+        'death_cross': (matrix['cross'] == CROSS_DEATH).sum(axis=0),
+        'bullish_div': matrix['bullish_div'].sum(axis=0),
+        'bearish_div': matrix['bearish_div'].sum(axis=0),
+        'wt1_sum': np.where(valid, matrix['wt1'], 0).sum(axis=0, dtype=np.float64),
+    }, index=matrix.dates)
+    return _finish(counts)
+
+# ============================================================================
+# 2. 存储与增量更新
+# ============================================================================
+
+def breadth_file():
+    return os.environ.get(BREADTH_FILE_ENV) or DEFAULT_BREADTH_FILE
+
+def load_breadth(path=None):
+    """没有文件时返回空表"""
+    path = path or breadth_file()
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=list(BREADTH_COLUMNS), index=pd.DatetimeIndex([], name='date'))
+    return pd.read_parquet(path)
+
+def save_breadth(series, path=None):
+    """原子写入，返回路径"""
+    path = path or breadth_file()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    series.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def append_days(rows, path=None):
+    """追加（同一日期覆盖旧值）并保存，返回完整序列"""
+    existing = load_breadth(path)
+    if len(rows):
+        existing = existing[~existing.index.isin(rows.index)]
+        existing = pd.concat([existing, rows]).sort_index() if len(existing) else rows
+        save_breadth(existing, path)
+    return existing
+
+def update(frames, path=None, ob_level=60, os_level=-60):
+    """
+    只重算已保存的最后一个交易日（盘中扫描时可能是未收盘的K线）和之后的新交易日并追加；
+    没有已保存的数据时计算全部历史。返回完整序列
+    """
+    existing = load_breadth(path)
+    if not len(existing):
+        rows = compute_breadth(frames, ob_level=ob_level, os_level=os_level)
+        save_breadth(rows, path)
+        return rows
+
+    last = existing.index.max()
+
+    def recent(frames):
+        for symbol, df in frames:
+            new_bars = int((df.index >= last).sum())
+            if new_bars:
+                yield symbol, df.iloc[-(REQUIRED_BARS + new_bars):]
+
+    rows = compute_breadth(recent(frames), ob_level=ob_level, os_level=os_level)
+    return append_days(rows.loc[rows.index >= last], path)
+
+def update_from_cache(symbols=None, cache=None, path=None):
+    """用本地日线缓存追加新交易日（扫描完成后调用，不访问网络）"""
+    return update(iter_cache_frames(symbols, cache), path)
+
+# ============================================================================
+# 3. 报告
+# ============================================================================
+
+def format_row(date, row):
+    return (f"{pd.Timestamp(date):%Y-%m-%d} ({int(row['symbols'])} 只): "
+            f"超卖 {row['pct_oversold']:.1f}% | 超买 {row['pct_overbought']:.1f}% | "
+            f"净交叉 {int(row['net_cross']):+d} (金叉 {int(row['golden_cross'])} / 死叉 {int(row['death_cross'])}) | "
+            f"底背离 {int(row['bullish_div'])} / 顶背离 {int(row['bearish_div'])} | WT1 均值 {row['mean_wt1']:.1f}")
+
+def print_breadth(series, days=5):
+    """打印最近一天的宽度和前几天的变化"""
+    if not len(series):
+        return
+    print("\n🌊 市场宽度:")
+    print(f"  {format_row(series.index[-1], series.iloc[-1])}")
+    if len(series) > 1:
+        pos = -min(days, len(series) - 1) - 1
+        back, latest = series.iloc[pos], series.iloc[-1]
+        print(f"  较 {series.index[pos]:%Y-%m-%d}: "
+              f"超卖 {latest['pct_oversold'] - back['pct_oversold']:+.1f}pp | "
+              f"超买 {latest['pct_overbought'] - back['pct_overbought']:+.1f}pp | "
+              f"WT1 均值 {latest['mean_wt1'] - back['mean_wt1']:+.1f}")
+
+# ============================================================================
+# 4. 命令行
+# ============================================================================
+
+def main(argv=None):
+    import universe
+
+    parser = argparse.ArgumentParser(description="市场宽度时间序列")
+    parser.add_argument("command", choices=["build", "update", "show"])
+    parser.add_argument("--file", help=f"宽度文件（默认 {BREADTH_FILE_ENV} 或 {DEFAULT_BREADTH_FILE}）")
+    parser.add_argument("--universe", action="append", help="股票池名称或文件路径（默认: 缓存中的全部股票）")
+    parser.add_argument("--matrix", help="build 时改用信号矩阵 .npz")
+    parser.add_argument("--start")
+    parser.add_argument("--days", type=int, default=20, help="show 显示的天数")
+    args = parser.parse_args(argv)
+
+    symbols = universe.load_universe(args.universe) if args.universe else None
+    if args.command == "build":
+        if args.matrix:
+            from signal_matrix import SignalMatrix
+            series = from_matrix(SignalMatrix.load(args.matrix))
+            if args.start:
+                series = series.loc[pd.Timestamp(args.start):]
+        else:
+            series = compute_breadth(iter_cache_frames(symbols), start=args.start)
+        print(f"💾 市场宽度已保存到: {save_breadth(series, args.file)} ({len(series)} 天)")
+    elif args.command == "update":
+        before = len(load_breadth(args.file))
+        series = update(iter_cache_frames(symbols), args.file)
+        print(f"💾 市场宽度新增 {len(series) - before} 天，共 {len(series)} 天")
+    else:
+        series = load_breadth(args.file)
+        for date, row in series.tail(args.days).iterrows():
+            print(f"  {format_row(date, row)}")
+    print_breadth(series)
+    return series
+
+if __name__ == "__main__":
+    main()
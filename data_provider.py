@@ -0,0 +1,278 @@
+"""
+行情数据的录制 / 回放
+- 所有 yf.Ticker(...).history() 和 .info 调用都经过 data_provider.Ticker
+- WT_DATA_MODE 控制行为:
+    live（默认）  直接请求 Yahoo
+    record        请求 Yahoo，同时把响应写入录制目录
+    replay        完全从录制目录读取，不访问网络；可加人工延迟模拟真实请求耗时
+- 录制目录（WT_DATA_ARCHIVE，默认 data/recordings）每只股票一个 .npz:
+    history 响应按 ingest.compact_ohlcv 存储（float32 价格 / 整数成交量，扫描器只用这些列），
+    .info 响应存为 JSON
+- 回放匹配: 参数完全相同的录制优先；否则取该股票同周期最近一次录制，按请求的 start/end 截取
+  （fetch_start 等按 "今天" 计算的起始日期在回放时会变化）
+
+用法:
+    WT_DATA_MODE=record python scanner.py
+    WT_DATA_MODE=replay WT_REPLAY_LATENCY=0.2 WT_REPLAY_JITTER=0.05 python scanner.py
+    python data_provider.py list
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+import ingest
+
+DATA_MODE_ENV = 'WT_DATA_MODE'
+ARCHIVE_ENV = 'WT_DATA_ARCHIVE'
+LATENCY_ENV = 'WT_REPLAY_LATENCY'
+JITTER_ENV = 'WT_REPLAY_JITTER'
+
+DEFAULT_ARCHIVE_DIR = os.path.join("data", "recordings")
+MODES = ('live', 'record', 'replay')
+
+class ReplayMiss(KeyError):
+    """回放模式下没有对应的录制"""
+
+def _normalize_args(kwargs):
+    """history() 参数规范化为可比较的字符串字典（None 不参与匹配）"""
+    args = {}
+    for key, value in kwargs.items():
+        if value is None:
+            continue
+        if isinstance(value, (pd.Timestamp, np.datetime64)) or hasattr(value, 'strftime'):
+            value = pd.Timestamp(value).strftime('%Y-%m-%d')
+        args[key] = str(value)
+    args.setdefault('interval', '1d')
+    return args
+
+def _args_key(args):
+    return json.dumps(args, sort_keys=True)
+
+# ============================================================================
+# 1. 录制存档
+# ============================================================================
+
+class RecordingArchive:
+    """每只股票一个 .npz: meta（JSON 条目列表）+ 各 history 响应的数组"""
+
+    def __init__(self, archive_dir=None):
+        self.archive_dir = archive_dir or os.environ.get(ARCHIVE_ENV) or DEFAULT_ARCHIVE_DIR
+        self._lock = threading.Lock()
+        self._loaded = {}
+
+    def path(self, symbol):
+        return os.path.join(self.archive_dir, f"{symbol}.npz")
+
+    def symbols(self):
+        if not os.path.isdir(self.archive_dir):
+            return []
+        return sorted(n[:-4] for n in os.listdir(self.archive_dir) if n.endswith(".npz"))
+
+    def _read(self, symbol):
+        """返回 (entries, arrays)；回放时每只股票只读一次"""
+        if symbol in self._loaded:
+            return self._loaded[symbol]
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            entries, arrays = [], {}
+        else:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {k: data[k] for k in data.files if k != 'meta'}
+                entries = json.loads(str(data['meta']))
+        self._loaded[symbol] = (entries, arrays)
+        return entries, arrays
+
+    def _write(self, symbol, entries, arrays):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = self.path(symbol)
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(tmp_path, meta=np.array(json.dumps(entries, ensure_ascii=False)), **arrays)
+        os.replace(tmp_path, path)
+
+    def _append(self, symbol, entry, new_arrays=None):
+        with self._lock:
+            entries, arrays = self._read(symbol)
+            # 参数相同的旧录制被新录制替换
+            entries = [e for e in entries
+                       if not (e['call'] == entry['call'] and e.get('key') == entry.get('key'))]
+            if new_arrays:
+                entry['id'] = 1 + max((e.get('id', -1) for e in entries), default=-1)
+                prefix = f"h{entry['id']}_"
+                live_prefixes = {f"h{e['id']}_" for e in entries if 'id' in e}
+                arrays = {k: v for k, v in arrays.items() if k[:k.index('_') + 1] in live_prefixes}
+                arrays.update({prefix + k: v for k, v in new_arrays.items()})
+            entries = entries + [entry]
+            self._write(symbol, entries, arrays)
+            self._loaded[symbol] = (entries, arrays)
+
+    # ------------------------------------------------------------------
+    # history
+    # ------------------------------------------------------------------
+
+    def record_history(self, symbol, kwargs, df):
+        args = _normalize_args(kwargs)
+        df = ingest.compact_ohlcv(df)
+        index = pd.DatetimeIndex(df.index)
+        tz = str(index.tz) if index.tz is not None else ''
+        stamps = (index.tz_convert('UTC').tz_localize(None) if tz else index).to_numpy().astype('datetime64[ns]')
+        arrays = {'index': stamps.astype(np.int64)}
+        arrays.update({col: df[col].to_numpy() for col in df.columns})
+        entry = {'call': 'history', 'key': _args_key(args), 'args': args, 'tz': tz,
+                 'columns': list(df.columns), 'recorded_at': pd.Timestamp.now().isoformat()}
+        self._append(symbol, entry, arrays)
+
+    def _frame(self, entry, arrays):
+        prefix = f"h{entry['id']}_"
+        index = pd.DatetimeIndex(arrays[prefix + 'index'].astype('datetime64[ns]'))
+        if entry['tz']:
+            index = index.tz_localize('UTC').tz_convert(entry['tz'])
+        return pd.DataFrame({col: arrays[prefix + col] for col in entry['columns']}, index=index)
+
+    def load_history(self, symbol, kwargs):
+        args = _normalize_args(kwargs)
+        key = _args_key(args)
+        entries, arrays = self._read(symbol)
+        history = [e for e in entries if e['call'] == 'history']
+        for entry in history:
+            if entry['key'] == key:
+                return self._frame(entry, arrays)
+
+        same_interval = [e for e in history if e['args']['interval'] == args['interval']]
+        if not same_interval:
+            raise ReplayMiss(f"{symbol}: 没有 history({key}) 的录制")
+        df = self._frame(max(same_interval, key=lambda e: e['recorded_at']), arrays)
+        tz = df.index.tz
+        if 'start' in args:
+            start = pd.Timestamp(args['start'])
+            df = df.loc[(start.tz_localize(tz) if tz is not None else start):]
+        if 'end' in args:
+            # 与 yfinance 一致，end 不包含当天
+            end = pd.Timestamp(args['end'])
+            df = df.loc[:(end.tz_localize(tz) if tz is not None else end) - pd.Timedelta(1, 'ns')]
+        return df
+
+    # ------------------------------------------------------------------
+    # info
+    # ------------------------------------------------------------------
+
+    def record_info(self, symbol, info):
+        entry = {'call': 'info', 'key': '', 'value': json.loads(json.dumps(info, default=str)),
+                 'recorded_at': pd.Timestamp.now().isoformat()}
+        self._append(symbol, entry)
+
+    def load_info(self, symbol):
+        entries, _ = self._read(symbol)
+        for entry in entries:
+            if entry['call'] == 'info':
+                return entry['value']
+        raise ReplayMiss(f"{symbol}: 没有 info 的录制")
+
+# ============================================================================
+# 2. Ticker
+# ============================================================================
+
+class RecordingTicker:
+    """请求 Yahoo 并录制响应"""
+
+    def __init__(self, symbol, archive):
+        self.symbol = symbol
+        self.archive = archive
+        self._ticker = yf.Ticker(symbol)
+
+    def history(self, **kwargs):
+        df = self._ticker.history(**kwargs)
+        self.archive.record_history(self.symbol, kwargs, df)
+        return df
+
+    @property
+    def info(self):
+        info = self._ticker.info
+        self.archive.record_info(self.symbol, info)
+        return info
+
+class ReplayTicker:
+    """从录制读取，不访问网络；每次调用前等待 latency ± jitter 秒"""
+
+    def __init__(self, symbol, archive, latency=0.0, jitter=0.0):
+        self.symbol = symbol
+        self.archive = archive
+        self.latency = latency
+        self.jitter = jitter
+
+    def _wait(self):
+        delay = self.latency + (random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def history(self, **kwargs):
+        self._wait()
+        return self.archive.load_history(self.symbol, kwargs)
+
+    @property
+    def info(self):
+        self._wait()
+        return self.archive.load_info(self.symbol)
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+def get_archive(archive_dir=None):
+    """同一目录在进程内共用一个存档对象（回放时每只股票只读一次文件）"""
+    archive_dir = archive_dir or os.environ.get(ARCHIVE_ENV) or DEFAULT_ARCHIVE_DIR
+    with _archives_lock:
+        if archive_dir not in _archives:
+            _archives[archive_dir] = RecordingArchive(archive_dir)
+        return _archives[archive_dir]
+
+def data_mode():
+    mode = os.environ.get(DATA_MODE_ENV, 'live').lower()
+    if mode not in MODES:
+        raise ValueError(f"{DATA_MODE_ENV}={mode} 无效，可选: {', '.join(MODES)}")
+    return mode
+
+def Ticker(symbol):
+    """按 WT_DATA_MODE 返回 yf.Ticker / RecordingTicker / ReplayTicker"""
+    mode = data_mode()
+    if mode == 'record':
+        return RecordingTicker(symbol, get_archive())
+    if mode == 'replay':
+        return ReplayTicker(symbol, get_archive(),
+                            float(os.environ.get(LATENCY_ENV, 0) or 0),
+                            float(os.environ.get(JITTER_ENV, 0) or 0))
+    return yf.Ticker(symbol)
+
+# ============================================================================
+# 3. 命令行
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="行情录制存档")
+    parser.add_argument("command", choices=["list"])
+    parser.add_argument("--archive", help=f"录制目录（默认 {ARCHIVE_ENV} 或 {DEFAULT_ARCHIVE_DIR}）")
+    parser.add_argument("--symbol", help="只显示一只股票的录制条目")
+    args = parser.parse_args(argv)
+
+    archive = RecordingArchive(args.archive)
+    symbols = [args.symbol] if args.symbol else archive.symbols()
+    total = 0
+    for symbol in symbols:
+        entries, arrays = archive._read(symbol)
+        size = os.path.getsize(archive.path(symbol)) if os.path.exists(archive.path(symbol)) else 0
+        total += size
+        if args.symbol:
+            for e in entries:
+                bars = len(arrays.get(f"h{e['id']}_index", [])) if 'id' in e else ''
+                print(f"  {e['call']:8} {e['recorded_at'][:19]}  {e.get('key', '')} {bars}")
+    print(f"📼 {archive.archive_dir}: {len(symbols)} 只股票, {total / 1024:.0f} KB")
+    return symbols
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+分布式扫描：基于共享目录的任务队列
+- coordinator: 把股票池切成批次写入队列目录
+- worker: 任意台机器/任意多个进程领取批次（带租约），扫描后写入部分结果
+- merge: 合并所有部分结果，生成标准 latest_scan.json
+
+队列目录结构：
+    job.json                      任务参数与完整股票池顺序
+    batches/batch_00000.json      每个批次的股票代码
+    leases/batch_00000.<gen>.lease  租约（gen 递增，最大的为当前租约）
+    results/batch_00000.json      批次扫描结果（存在即表示完成）
+
+租约先完整写入临时文件，再用 os.link 链接到租约路径：链接是原子的，且目标已存在时失败，
+同一代号只有一个 worker 能创建成功，也不会留下写了一半的租约。
+租约过期（worker 崩溃）后，其他 worker 创建下一代租约即可接手该批次。
+无法解析的租约（旧版本崩溃留下的空文件等）视为在 mtime + 租约时长 时过期。
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+
+import scanner
+import universe
+from lazy_result import snapshot_scan
+
+DEFAULT_QUEUE_DIR = os.path.join("data", "queue")
+DEFAULT_BATCH_SIZE = 25
+DEFAULT_LEASE_SECONDS = 300
+
+# ============================================================================
+# 1. 文件工具
+# ============================================================================
+
+def _write_json_atomic(path, data):
+    """先写临时文件再改名，读取方不会看到写了一半的文件"""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def _batch_ids(queue_dir):
+    names = os.listdir(os.path.join(queue_dir, "batches"))
+    return sorted(n[:-len(".json")] for n in names if n.endswith(".json"))
+
+def _result_path(queue_dir, batch_id):
+    return os.path.join(queue_dir, "results", f"{batch_id}.json")
+
+# ============================================================================
+# 2. Coordinator
+# ============================================================================
+
+def create_job(queue_dir, symbols, batch_size=DEFAULT_BATCH_SIZE,
+               min_market_cap=10e9, ob_level=60, os_level=-60):
+    """创建扫描任务：写入任务参数和全部批次"""
+    if os.path.exists(os.path.join(queue_dir, "job.json")):
+        raise FileExistsError(f"队列目录已存在任务: {queue_dir}")
+
+    for sub in ("batches", "leases", "results"):
+        os.makedirs(os.path.join(queue_dir, sub), exist_ok=True)
+
+    batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+    for n, batch in enumerate(batches):
+        _write_json_atomic(os.path.join(queue_dir, "batches", f"batch_{n:05d}.json"), batch)
+
+    # job.json 最后写入，worker 看到它时批次已经全部就绪
+    _write_json_atomic(os.path.join(queue_dir, "job.json"), {
+        'symbols': symbols,
+        'batch_size': batch_size,
+        'num_batches': len(batches),
+        'min_market_cap': min_market_cap,
+        'ob_level': ob_level,
+        'os_level': os_level,
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    })
+
+    return len(batches)
+
+def load_job(queue_dir):
+    return _read_json(os.path.join(queue_dir, "job.json"))
+
+# ============================================================================
+# 3. 租约
+# ============================================================================
+
+def _leases(queue_dir, batch_id):
+    """返回该批次所有租约 [(gen, path)]，按 gen 升序"""
+    lease_dir = os.path.join(queue_dir, "leases")
+    prefix = batch_id + "."
+    leases = []
+    for name in os.listdir(lease_dir):
+        if name.startswith(prefix) and name.endswith(".lease"):
+            gen = name[len(prefix):-len(".lease")]
+            if gen.isdigit():
+                leases.append((int(gen), os.path.join(lease_dir, name)))
+    return sorted(leases)
+
+def _lease_path(queue_dir, batch_id, gen):
+    return os.path.join(queue_dir, "leases", f"{batch_id}.{gen}.lease")
+
+def _lease_expires(path, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """租约过期时间；文件无法解析时按 mtime + lease_seconds 计算"""
+    try:
+        return _read_json(path)['expires']
+    except (ValueError, KeyError, TypeError):
+        return os.path.getmtime(path) + lease_seconds
+
+def _create_lease(path, lease):
+    """原子地创建租约文件（已存在时返回 False）"""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(lease, f)
+    try:
+        os.link(tmp_path, path)
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(tmp_path)
+    return True
+
+def try_claim(queue_dir, batch_id, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    尝试领取批次
+    返回租约代号 gen；批次已完成、被他人持有且未过期、或竞争失败时返回 None
+    """
+    if os.path.exists(_result_path(queue_dir, batch_id)):
+        return None
+
+    leases = _leases(queue_dir, batch_id)
+    if leases:
+        gen, path = leases[-1]
+        try:
+            expires = _lease_expires(path, lease_seconds)
+        except FileNotFoundError:
+            return None
+        if expires > time.time():
+            return None
+        gen += 1
+    else:
+        gen = 0
+
+    lease = {'worker': worker_id, 'expires': time.time() + lease_seconds}
+    if not _create_lease(_lease_path(queue_dir, batch_id, gen), lease):
+        return None
+    return gen
+
+def renew_lease(queue_dir, batch_id, gen, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """续租（心跳）。租约已被接手时返回 False"""
+    if _leases(queue_dir, batch_id)[-1][0] != gen:
+        return False
+    _write_json_atomic(_lease_path(queue_dir, batch_id, gen),
+                       {'worker': worker_id, 'expires': time.time() + lease_seconds})
+    return True
+
+# ============================================================================
+# 4. Worker
+# ============================================================================
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def process_batch(queue_dir, job, batch_id, gen, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """扫描一个批次并写入部分结果"""
+    symbols = _read_json(os.path.join(queue_dir, "batches", f"{batch_id}.json"))
+    results = []
+    renew_at = time.time() + lease_seconds / 3
+
+    for symbol in symbols:
+        result = scanner.scan_symbol(symbol, job['min_market_cap'], job['ob_level'], job['os_level'])
+        if result is not None:
+            results.append(result)
+        if time.time() >= renew_at:
+            renew_lease(queue_dir, batch_id, gen, worker_id, lease_seconds)
+            renew_at = time.time() + lease_seconds / 3
+
+    # 即使租约已被接手也照常写入：同一批次的结果是等价的，覆盖无害
+    _write_json_atomic(_result_path(queue_dir, batch_id), snapshot_scan(scanner.classify_results(results)))
+    return len(results)
+
+def run_worker(queue_dir, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+               poll_interval=2.0, exit_when_idle=False):
+    """
+    worker 主循环：不断领取批次直到全部完成
+    exit_when_idle: 没有可领取的批次时立即退出，而不是等待其他 worker 的租约过期
+    """
+    worker_id = worker_id or default_worker_id()
+
+    while not os.path.exists(os.path.join(queue_dir, "job.json")):
+        time.sleep(poll_interval)
+    job = load_job(queue_dir)
+    processed = 0
+
+    while True:
+        pending = [b for b in _batch_ids(queue_dir) if not os.path.exists(_result_path(queue_dir, b))]
+        if not pending:
+            break
+
+        claimed = False
+        for batch_id in pending:
+            gen = try_claim(queue_dir, batch_id, worker_id, lease_seconds)
+            if gen is None:
+                continue
+            claimed = True
+            count = process_batch(queue_dir, job, batch_id, gen, worker_id, lease_seconds)
+            processed += 1
+            print(f"  [{worker_id}] {batch_id} 完成: {count} 条结果")
+
+        if not claimed:
+            if exit_when_idle:
+                break
+            time.sleep(poll_interval)
+
+    return processed
+
+# ============================================================================
+# 5. 状态与合并
+# ============================================================================
+
+def job_status(queue_dir, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """统计批次状态: done / leased / expired / pending"""
+    status = {'done': 0, 'leased': 0, 'expired': 0, 'pending': 0}
+    now = time.time()
+    for batch_id in _batch_ids(queue_dir):
+        if os.path.exists(_result_path(queue_dir, batch_id)):
+            status['done'] += 1
+            continue
+        leases = _leases(queue_dir, batch_id)
+        if not leases:
+            status['pending'] += 1
+            continue
+        try:
+            expires = _lease_expires(leases[-1][1], lease_seconds)
+        except FileNotFoundError:
+            expires = now + 1
+        status['leased' if expires > now else 'expired'] += 1
+    return status
+
+def merge_job(queue_dir):
+    """
+    合并所有批次结果为标准扫描结果结构
+    有未完成批次时抛出 RuntimeError
+    """
+    job = load_job(queue_dir)
+    partials = []
+    missing = []
+    for batch_id in _batch_ids(queue_dir):
+        path = _result_path(queue_dir, batch_id)
+        if os.path.exists(path):
+            partials.append(_read_json(path))
+        else:
+            missing.append(batch_id)
+    if missing:
+        raise RuntimeError(f"还有 {len(missing)} 个批次未完成: {', '.join(missing[:5])}")
+    return scanner.merge_scan_results(partials, job['symbols'])
+
+def run_local(queue_dir, num_workers=4, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """在本机启动多个 worker 进程，全部完成后合并结果"""
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(queue_dir, f"{socket.gethostname()}-local{n}", lease_seconds),
+        )
+        for n in range(num_workers)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    return merge_job(queue_dir)
+
+# ============================================================================
+# 6. 命令行
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WaveTrend 分布式扫描")
+    parser.add_argument("command", choices=["init", "worker", "status", "merge", "local"])
+    parser.add_argument("--queue-dir", default=DEFAULT_QUEUE_DIR)
+    parser.add_argument("--universe", action="append", help="股票池名称或文件路径（init/local）")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--lease-seconds", type=int, default=DEFAULT_LEASE_SECONDS)
+    parser.add_argument("--workers", type=int, default=4, help="本地 worker 进程数（local）")
+    parser.add_argument("--exit-when-idle", action="store_true")
+    parser.add_argument("--output-dir", default="data")
+    args = parser.parse_args(argv)
+
+    if args.command in ("init", "local") and not os.path.exists(os.path.join(args.queue_dir, "job.json")):
+        symbols = universe.load_universe(args.universe or ["default"])
+        num_batches = create_job(args.queue_dir, symbols, args.batch_size)
+        print(f"📋 已创建任务: {len(symbols)} 只股票, {num_batches} 个批次 -> {args.queue_dir}")
+
+    if args.command == "worker":
+        processed = run_worker(args.queue_dir, lease_seconds=args.lease_seconds,
+                               exit_when_idle=args.exit_when_idle)
+        print(f"✅ worker 结束，共处理 {processed} 个批次")
+    elif args.command == "status":
+        print(job_status(args.queue_dir, args.lease_seconds))
+    elif args.command in ("merge", "local"):
+        if args.command == "local":
+            scan_results = run_local(args.queue_dir, args.workers, args.lease_seconds)
+        else:
+            scan_results = merge_job(args.queue_dir)
+        scanner.print_report(scan_results)
+        scanner.save_results(scan_results, args.output_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+多参数背离检测（多个回看天数 × 摆动窗口一次完成）
+- detect_divergence 固定 lookback=30, swing_window=5；这里同时评估 LOOKBACKS × SWING_WINDOWS
+  （默认 20/30/60 × 3/5/8 共 9 组），每组的判断与对截断数据调用 detect_divergence 相同
+- 复用计算:
+    滚动极值  从前后各 1 根K线的极值开始，较大窗口由两个平移后的较小窗口极值取 min/max 得到
+              （w+s 的窗口被 [t-s-w, t-s+w] 和 [t+s-w, t+s+w] 覆盖，s ≤ w），各窗口依次复用
+    摆动点    每个窗口一次: 每天可见的最近两个摆动点及其价格/WT1、是否背离
+    回看天数  只影响 "较早的摆动点是否仍在窗口内" 这一个比较，各回看天数几乎不增加计算
+- 强度: 两个摆动点之间的价格变化 %（底背离为负）和 WT1 变化（底背离为正）
+- 置信度: 触发的参数组数 / 总组数；评分中默认参数（30/5）未触发但置信度 ≥ CONFIDENCE_MIN 时 +1
+- 一维（单只股票）或二维（symbols × 交易日，沿最后一维）均可
+
+用法:
+    python divergence.py check            # 与 divergence_series / detect_divergence 逐组对比
+    python divergence.py bench --symbols 1000
+"""
+
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+
+LOOKBACKS = (20, 30, 60)
+SWING_WINDOWS = (3, 5, 8)
+DEFAULT_CONFIG = (30, 5)
+
+# 置信度达到该值（默认 9 组中至少 3 组）时，评分中计为多参数背离
+# 取 0.3 而不是 1/3: 结果字典中的置信度四舍五入到 2 位（3/9 -> 0.33）
+CONFIDENCE_MIN = 0.3
+
+# 单侧（底/顶）结果；fired 以 (lookback, window) 为键，其余以 window 为键
+# prev_* / latest_* 为每天可见的最近两个摆动点的价格和 WT1（没有时为 NaN）
+SideGrid = namedtuple('SideGrid', ['fired', 'prev_price', 'latest_price', 'prev_wt1', 'latest_wt1'])
+
+# ============================================================================
+# 1. 滚动极值与摆动点
+# ============================================================================
+
+def _shift(values, s):
+    """沿最后一维平移（正数向右），移出的位置为 NaN"""
+    out = np.full_like(values, np.nan)
+    if s > 0:
+        out[..., s:] = values[..., :-s]
+    elif s < 0:
+        out[..., :s] = values[..., -s:]
+    else:
+        out[...] = values
+    return out
+
+def rolling_extrema(values, windows=SWING_WINDOWS, kind='low'):
+    """
+    以每个点为中心、前后 w 根K线的 min（kind='low'）或 max，{w: 数组}
+    窗口不完整或含 NaN 时为 NaN
+    """
+    x = np.asarray(values, dtype=np.float64)
+    reduce = np.minimum if kind == 'low' else np.maximum
+    # 前后各 1 根K线的极值；np.minimum / np.maximum 遇到 NaN 返回 NaN
+    current, extreme = 1, reduce(reduce(_shift(x, 1), x), _shift(x, -1))
+
+    out = {}
+    for target in sorted(set(windows)):
+        while current < target:
+            s = min(current, target - current)
+            extreme = reduce(_shift(extreme, s), _shift(extreme, -s))
+            current += s
+        out[target] = extreme
+    return out
+
+def swing_masks(values, windows=SWING_WINDOWS, kind='low'):
+    """{w: 摆动点掩码}，与 signal_matrix.swing_mask / kernels.swing_mask_2d 相同"""
+    x = np.asarray(values, dtype=np.float64)
+    return {w: x == extreme for w, extreme in rolling_extrema(x, windows, kind).items()}
+
+# ============================================================================
+# 2. 背离网格
+# ============================================================================
+
+def _side(price, wt1, masks, bullish, lookbacks):
+    from signal_matrix import _take, last_two_swings
+
+    t = np.arange(price.shape[-1])
+    fired, prev_price, latest_price, prev_wt1, latest_wt1 = {}, {}, {}, {}, {}
+    for w, mask in masks.items():
+        latest, prev = last_two_swings(mask, w)
+        found = (latest >= 0) & (prev >= 0)
+        a = np.clip(latest, 0, None)
+        b = np.clip(prev, 0, None)
+        pa, pb = _take(price, a), _take(price, b)
+        wa, wb = _take(wt1, a), _take(wt1, b)
+        with np.errstate(invalid='ignore'):
+            if bullish:
+                diverged = found & (pa < pb) & (wa > wb)
+            else:
+                diverged = found & (pa > pb) & (wa < wb)
+        prev_price[w] = np.where(found, pb, np.nan)
+        latest_price[w] = np.where(found, pa, np.nan)
+        prev_wt1[w] = np.where(found, wb, np.nan)
+        latest_wt1[w] = np.where(found, wa, np.nan)
+        for lookback in lookbacks:
+            # 较早的摆动点要在 [t-lookback+1, t] 窗口内且有完整的左侧窗口
+            start = np.maximum(0, t - lookback + 1)
+            fired[(lookback, w)] = diverged & (prev >= start + w)
+    return SideGrid(fired, prev_price, latest_price, prev_wt1, latest_wt1)
+
+def divergence_grid(low, high, wt1, lookbacks=LOOKBACKS, windows=SWING_WINDOWS):
+    """
+    每一天、每组参数的底/顶背离，返回 (bullish, bearish) 两个 SideGrid
+    low / high / wt1: 一维或二维（沿最后一维）数组
+    """
+    low = np.asarray(low, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    wt1 = np.asarray(wt1, dtype=np.float64)
+    bullish = _side(low, wt1, swing_masks(low, windows, 'low'), True, lookbacks)
+    bearish = _side(high, wt1, swing_masks(high, windows, 'high'), False, lookbacks)
+    return bullish, bearish
+
+def confidence(side):
+    """触发的参数组比例（0-1），形状与输入的每天相同"""
+    return np.mean([f for f in side.fired.values()], axis=0)
+
+def fired_configs(side, pos=-1):
+    """
+    某一天（默认最后一天）触发的参数组，按 (lookback, window) 排序:
+    [{'lookback', 'window', 'price_delta', 'wt1_delta'}]，price_delta 为 %
+    """
+    out = []
+    for (lookback, w), fired in sorted(side.fired.items()):
+        if fired[..., pos]:
+            out.append({
+                'lookback': lookback,
+                'window': w,
+                'price_delta': round(float((side.latest_price[w][..., pos] / side.prev_price[w][..., pos] - 1) * 100), 2),
+                'wt1_delta': round(float(side.latest_wt1[w][..., pos] - side.prev_wt1[w][..., pos]), 2),
+            })
+    return out
+
+# ============================================================================
+# 3. 单只股票最新一天
+# ============================================================================
+
+def latest_divergence(df, wt1, lookbacks=LOOKBACKS, windows=SWING_WINDOWS, default=DEFAULT_CONFIG):
+    """
+    扫描结果的背离字段（一维，只取最后一天）:
+        bullish_div / bearish_div / div_details  默认参数组的结果，与 detect_divergence 相同
+        bullish_conf / bearish_conf              各侧触发的参数组比例
+        div_configs                              触发的参数组及其强度（价格变化 %, WT1 变化），
+                                                 例如 "底 20,30/3(-4.2%, +8.1) 30/5(-3.9%, +7.4) | 顶 60/8(+2.1%, -5.0)"
+    """
+    bullish, bearish = divergence_grid(df['Low'].to_numpy(), df['High'].to_numpy(),
+                                       np.asarray(wt1), lookbacks, windows)
+    lookback, w = default
+    fields = {
+        'bullish_div': bool(bullish.fired[default][-1]),
+        'bearish_div': bool(bearish.fired[default][-1]),
+        'div_details': "",
+        'bullish_conf': round(float(confidence(bullish)[-1]), 2),
+        'bearish_conf': round(float(confidence(bearish)[-1]), 2),
+    }
+    # 与 detect_divergence 相同: 两侧都触发时显示顶背离
+    for name, side, label in (('bullish_div', bullish, '底背离'), ('bearish_div', bearish, '顶背离')):
+        if fields[name]:
+            fields['div_details'] = (f"{label}: 价格 {side.prev_price[w][-1]:.1f}→{side.latest_price[w][-1]:.1f}, "
+                                     f"WT1 {side.prev_wt1[w][-1]:.1f}→{side.latest_wt1[w][-1]:.1f}")
+
+    parts = []
+    for side, label in ((bullish, '底'), (bearish, '顶')):
+        configs = fired_configs(side)
+        if configs:
+            # 强度只取决于摆动窗口: 同一窗口的回看天数合并显示，例如 "20,30/5(-3.9%, +7.4)"
+            by_window = {}
+            for c in configs:
+                by_window.setdefault(c['window'], []).append(c)
+            parts.append(label + " " + " ".join(
+                f"{','.join(str(c['lookback']) for c in group)}/{w}"
+                f"({group[0]['price_delta']:+.1f}%, {group[0]['wt1_delta']:+.1f})"
+                for w, group in sorted(by_window.items())))
+    fields['div_configs'] = " | ".join(parts)
+    return fields
+
+# ============================================================================
+# 4. 验证与基准
+# ============================================================================
+
+def _synthetic(n_symbols, n_days, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_symbols, n_days)), axis=1))
+    spread = np.abs(rng.normal(0, 0.01, (n_symbols, n_days))) * close
+    return np.round(close + spread, 2), np.round(close - spread, 2), np.round(close, 2)
+
+def _reference(low, high, wt1, lookbacks, windows):
+    """逐组调用 signal_matrix 的单参数实现"""
+    from signal_matrix import divergence_series, swing_mask
+
+    out = {}
+    for w in windows:
+        low_mask = np.array([swing_mask(row, w, 'low') for row in low])
+        high_mask = np.array([swing_mask(row, w, 'high') for row in high])
+        for lookback in lookbacks:
+            out[(lookback, w)] = (divergence_series(low, wt1, low_mask, True, lookback, w),
+                                  divergence_series(high, wt1, high_mask, False, lookback, w))
+    return out
+
+def check(n_symbols=50, n_days=300):
+    """与单参数实现逐组比较，并抽查最后一天与 detect_divergence 一致，返回是否一致"""
+    import pandas as pd
+    from kernels import wavetrend_2d
+    from scanner import detect_divergence
+
+    high, low, close = _synthetic(n_symbols, n_days)
+    low[3, 40:60] = np.nan   # 缺失数据
+    wt1, _ = wavetrend_2d(high, low, close)
+    bullish, bearish = divergence_grid(low, high, wt1)
+    ref = _reference(low, high, wt1, LOOKBACKS, SWING_WINDOWS)
+    ok = True
+    for config, (ref_bull, ref_bear) in ref.items():
+        same = np.array_equal(bullish.fired[config], ref_bull) and np.array_equal(bearish.fired[config], ref_bear)
+        ok &= same
+        print(f"  {config[0]:>3}/{config[1]}  {'✅ 一致' if same else '❌ 不一致'}  "
+              f"(底 {int(ref_bull.sum())}, 顶 {int(ref_bear.sum())})")
+
+    for i in range(0, n_symbols, 5):
+        if i == 3:
+            continue
+        df = pd.DataFrame({'High': high[i], 'Low': low[i], 'Close': close[i]})
+        for lookback, w in ref:
+            expect = detect_divergence(df, pd.Series(wt1[i]), lookback, w)[:2]
+            got = (bool(bullish.fired[(lookback, w)][i, -1]), bool(bearish.fired[(lookback, w)][i, -1]))
+            ok &= expect == got
+    print(f"  detect_divergence 抽查: {'✅ 一致' if ok else '❌ 不一致'}")
+    return ok
+
+def bench(n_symbols=1000, n_days=252):
+    """一次计算全部参数组 vs 逐组计算（swing_mask_2d + divergence_series）"""
+    from kernels import swing_mask_2d, wavetrend_2d
+    from signal_matrix import divergence_series
+
+    high, low, close = _synthetic(n_symbols, n_days, seed=n_symbols)
+    wt1, _ = wavetrend_2d(high, low, close)
+    divergence_grid(low[:2], high[:2], wt1[:2])
+
+    start = time.perf_counter()
+    divergence_grid(low, high, wt1)
+    grid = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for w in SWING_WINDOWS:
+        for lookback in LOOKBACKS:
+            divergence_series(low, wt1, swing_mask_2d(low, w, 'low'), True, lookback, w)
+            divergence_series(high, wt1, swing_mask_2d(high, w, 'high'), False, lookback, w)
+    separate = time.perf_counter() - start
+
+    configs = len(LOOKBACKS) * len(SWING_WINDOWS)
+    print(f"  {n_symbols} 只 × {n_days} 天, {configs} 组参数: 一次计算 {grid:.3f}s, "
+          f"逐组计算 {separate:.3f}s ({separate / grid:.1f}x)")
+    return grid, separate
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多参数背离检测验证与基准")
+    parser.add_argument("command", choices=["check", "bench"])
+    parser.add_argument("--symbols", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=252)
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        return check()
+    return bench(args.symbols, args.days)
+
+if __name__ == "__main__":
+    main()
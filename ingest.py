@@ -0,0 +1,44 @@
+"""
+数据入口：紧凑存储 + 可配置计算精度
+- ticker.history() 返回的 Dividends / Stock Splits 列扫描器从不使用，入库前直接丢弃
+- 价格存为 float32，成交量存为整数（uint32，放不下时用 int64）
+  成交量有缺失（NaN）时保留 NaN、存为 float64: 填 0 会拉低 20 日均量，误判为缩量
+- 指标计算精度由 WT_COMPUTE_DTYPE 环境变量控制（默认 float64）
+  注意价格入库时已舍入到 float32，即使按 float64 计算，指标也与未压缩的原始数据不逐位相同
+  可用 scanner.py --check-precision 验证 float32 下信号与 float64 完全一致
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# 保留的列（Open 扫描器不直接使用，但多周期重采样需要）
+KEEP_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+PRICE_DTYPE = np.float32
+VOLUME_DTYPE = np.uint32
+
+COMPUTE_DTYPE = os.environ.get('WT_COMPUTE_DTYPE', 'float64')
+
+def compact_ohlcv(df):
+    """丢弃无用列并把价格/成交量降为紧凑类型"""
+    df = df[[c for c in KEEP_COLUMNS if c in df.columns]]
+    columns = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if col == 'Volume':
+            if np.isnan(values.astype(np.float64)).any():
+                # 缺失的成交量保持 NaN（与未压缩时 calc_volume_ratio 的行为相同）
+                columns[col] = values.astype(np.float64)
+                continue
+            dtype = VOLUME_DTYPE if values.max(initial=0) <= np.iinfo(VOLUME_DTYPE).max else np.int64
+            columns[col] = values.astype(dtype)
+        else:
+            columns[col] = values.astype(PRICE_DTYPE)
+    return pd.DataFrame(columns, index=df.index)
+
+def to_compute_dtype(df, dtype=None):
+    """把紧凑数据转换为计算精度（成交量同样转为浮点，避免整数均值运算溢出/截断）"""
+    dtype = np.dtype(dtype or COMPUTE_DTYPE)
+    return df.astype({col: dtype for col in df.columns if col in KEEP_COLUMNS})
@@ -0,0 +1,258 @@
+"""
+批量指标内核（symbols × 交易日 二维数组）
+- EWM 递推和摆动点窗口扫描沿时间轴是串行的，单只股票逐个调用 pandas 时这部分是瓶颈
+- 安装了 numba 时编译为按股票并行（prange）的内核；否则用 NumPy 在股票维度上向量化、时间维度逐步递推
+- 两个后端的结果与 pandas 参考实现（scanner.calc_wavetrend / signal_matrix.swing_mask）逐位一致:
+    ewm_2d          ≡ Series.ewm(span, adjust=False).mean()（含 NaN 的处理）
+    wavetrend_2d    ≡ calc_wavetrend（WT2 的 4 日均线仍用 pandas rolling，在二维上一次完成）
+    swing_mask_2d   ≡ swing_mask / find_swing_lows / find_swing_highs（窗口内有 NaN 时不是摆动点）
+- 行可以左侧补 NaN 到相同长度（前导 NaN 等价于从第一根有效K线开始计算）
+
+WT_KERNELS=numpy 强制使用 NumPy 后端
+
+用法:
+    python kernels.py check                      # 与 pandas 参考实现对比
+    python kernels.py bench --symbols 1000 10000 # 基准测试
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    if os.environ.get('WT_KERNELS', '').lower() == 'numpy':
+        raise ImportError
+    import numba
+    if 'NUMBA_THREADING_LAYER' not in os.environ:
+        # 网页在脚本线程中调用内核；tbb 层在非主线程启动后解释器退出时会挂起，优先用 omp
+        numba.config.THREADING_LAYER_PRIORITY = ['omp', 'tbb', 'workqueue']
+except ImportError:
+    numba = None
+
+BACKEND = 'numba' if numba is not None else 'numpy'
+
+# ============================================================================
+# 1. NumPy 后端
+# ============================================================================
+
+def _ewm_numpy(x, alpha):
+    """与 pandas ewm(adjust=False) 相同的递推，股票维度向量化"""
+    n_rows, n_cols = x.shape
+    out = np.empty_like(x)
+    if n_cols == 0:
+        return out
+    old_wt_factor = 1.0 - alpha
+    weighted = x[:, 0].copy()
+    old_wt = np.ones(n_rows)
+    out[:, 0] = weighted
+    for t in range(1, n_cols):
+        cur = x[:, t]
+        obs = cur == cur
+        started = weighted == weighted
+        # 已开始的行: 每根K线（含 NaN）旧权重衰减；有观测值时按权重合并
+        old_wt = np.where(started, old_wt * old_wt_factor, old_wt)
+        update = started & obs & (weighted != cur)
+        merged = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        weighted = np.where(update, merged, weighted)
+        old_wt = np.where(started & obs, 1.0, old_wt)
+        # 尚未开始的行: 第一个观测值作为初始值
+        weighted = np.where(~started & obs, cur, weighted)
+        out[:, t] = weighted
+    return out
+
+def _swing_numpy(x, window, lowest):
+    n_rows, n_cols = x.shape
+    mask = np.zeros(x.shape, dtype=bool)
+    width = 2 * window + 1
+    if n_cols < width:
+        return mask
+    windows = np.lib.stride_tricks.sliding_window_view(x, width, axis=1)
+    extreme = windows.min(axis=2) if lowest else windows.max(axis=2)
+    # min/max 遇到 NaN 返回 NaN，比较结果为 False，与 rolling 的 NaN 处理一致
+    mask[:, window:n_cols - window] = x[:, window:n_cols - window] == extreme
+    return mask
+
+# ============================================================================
+# 2. numba 后端
+# ============================================================================
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _ewm_numba(x, alpha):
+        n_rows, n_cols = x.shape
+        out = np.empty_like(x)
+        old_wt_factor = 1.0 - alpha
+        for i in numba.prange(n_rows):
+            if n_cols == 0:
+                continue
+            weighted = x[i, 0]
+            old_wt = 1.0
+            out[i, 0] = weighted
+            for t in range(1, n_cols):
+                cur = x[i, t]
+                obs = cur == cur
+                if weighted == weighted:
+                    old_wt *= old_wt_factor
+                    if obs:
+                        if weighted != cur:
+                            weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                        old_wt = 1.0
+                elif obs:
+                    weighted = cur
+                out[i, t] = weighted
+        return out
+
+    @numba.njit(parallel=True, cache=True)
+    def _swing_numba(x, window, lowest):
+        n_rows, n_cols = x.shape
+        mask = np.zeros(x.shape, dtype=np.bool_)
+        for i in numba.prange(n_rows):
+            for t in range(window, n_cols - window):
+                cur = x[i, t]
+                if cur != cur:
+                    continue
+                ok = True
+                for k in range(t - window, t + window + 1):
+                    v = x[i, k]
+                    if v != v or (v < cur if lowest else v > cur):
+                        ok = False
+                        break
+                mask[i, t] = ok
+        return mask
+
+# ============================================================================
+# 3. 接口
+# ============================================================================
+
+def ewm_2d(values, span):
+    """每行独立的 ewm(span, adjust=False).mean()"""
+    x = np.ascontiguousarray(values, dtype=np.float64)
+    alpha = 2.0 / (span + 1.0)
+    if BACKEND == 'numba':
+        return _ewm_numba(x, alpha)
+    return _ewm_numpy(x, alpha)
+
+def swing_mask_2d(values, window=5, kind='low'):
+    """每行的摆动点掩码：该点是前后 window 根K线中的最低（最高）点"""
+    x = np.ascontiguousarray(values, dtype=np.float64)
+    if BACKEND == 'numba':
+        return _swing_numba(x, window, kind == 'low')
+    return _swing_numpy(x, window, kind == 'low')
+
+def wavetrend_2d(high, low, close, n1=10, n2=21):
+    """二维 calc_wavetrend，返回 (wt1, wt2)；ap 按输入精度计算（与 pandas 对 float32 列的运算一致）"""
+    ap = (np.asarray(high) + np.asarray(low) + np.asarray(close)) / 3
+    esa = ewm_2d(ap, n1)
+    d = ewm_2d(np.abs(ap - esa), n1)
+    d[d == 0] = np.nan
+    ci = (ap - esa) / (0.015 * d)
+    wt1 = ewm_2d(ci, n2)
+    # 列为股票，pandas 在每列上独立滚动（与 Series.rolling 相同的算法）
+    wt2 = pd.DataFrame(wt1.T).rolling(window=4).mean().to_numpy().T
+    return wt1, np.ascontiguousarray(wt2)
+
+def left_pad(rows, dtype=np.float64):
+    """不同长度的一维数组左侧补 NaN 对齐为二维数组"""
+    width = max((len(r) for r in rows), default=0)
+    out = np.full((len(rows), width), np.nan, dtype=dtype)
+    for i, r in enumerate(rows):
+        if len(r):
+            out[i, width - len(r):] = r
+    return out
+
+# ============================================================================
+# 4. 验证与基准
+# ============================================================================
+
+def _synthetic(n_symbols, n_days, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_symbols, n_days)), axis=1))
+    spread = np.abs(rng.normal(0, 0.01, (n_symbols, n_days))) * close
+    high = np.round(close + spread, 2)
+    low = np.round(close - spread, 2)
+    return high, low, np.round(close, 2)
+
+def _reference(high, low, close):
+    """逐只股票调用 pandas 参考实现"""
+    from scanner import calc_wavetrend
+    from signal_matrix import swing_mask
+
+    wt1 = np.empty_like(close)
+    wt2 = np.empty_like(close)
+    lows = np.zeros(close.shape, dtype=bool)
+    highs = np.zeros(close.shape, dtype=bool)
+    for i in range(close.shape[0]):
+        valid = ~np.isnan(close[i])
+        df = pd.DataFrame({'High': high[i, valid], 'Low': low[i, valid], 'Close': close[i, valid]})
+        a, b = calc_wavetrend(df)
+        wt1[i], wt2[i] = np.nan, np.nan
+        wt1[i, valid], wt2[i, valid] = a.to_numpy(), b.to_numpy()
+        lows[i, valid] = swing_mask(df['Low'].to_numpy(), 5, 'low')
+        highs[i, valid] = swing_mask(df['High'].to_numpy(), 5, 'high')
+    return wt1, wt2, lows, highs
+
+def check(n_symbols=200, n_days=300):
+    """与 pandas 参考实现逐位比较（含长度不同、左侧补 NaN 的行），返回是否一致"""
+    high, low, close = _synthetic(n_symbols, n_days)
+    # 一部分股票历史较短
+    for i in range(0, n_symbols, 7):
+        cut = (i * 13) % (n_days // 2)
+        high[i, :cut] = low[i, :cut] = close[i, :cut] = np.nan
+    # 成交价不变的区间（d = 0 -> NaN）
+    high[3, 100:120] = low[3, 100:120] = close[3, 100:120] = 50.0
+
+    ref = _reference(high, low, close)
+    wt1, wt2 = wavetrend_2d(high, low, close)
+    got = (wt1, wt2, swing_mask_2d(low, 5, 'low'), swing_mask_2d(high, 5, 'high'))
+    ok = True
+    for name, a, b in zip(('wt1', 'wt2', 'swing_low', 'swing_high'), got, ref):
+        same = np.array_equal(a, b, equal_nan=a.dtype.kind == 'f')
+        ok &= same
+        print(f"  {name:10} {'✅ 一致' if same else '❌ 不一致'}")
+    print(f"  后端: {BACKEND}, {n_symbols} 只 × {n_days} 天")
+    return ok
+
+def bench(symbol_counts=(1000, 10000), n_days=252, reference_limit=1000):
+    """
+    kernels（wavetrend_2d + 两个 swing_mask_2d）对比逐只 pandas 参考实现
+    参考实现超过 reference_limit 只时按前 reference_limit 只的耗时线性外推
+    """
+    results = []
+    for n in symbol_counts:
+        high, low, close = _synthetic(n, n_days, seed=n)
+        wavetrend_2d(high[:2], low[:2], close[:2])          # numba 首次编译不计入
+        swing_mask_2d(low[:2]); swing_mask_2d(high[:2], kind='high')
+
+        start = time.perf_counter()
+        wavetrend_2d(high, low, close)
+        swing_mask_2d(low, 5, 'low')
+        swing_mask_2d(high, 5, 'high')
+        kernel = time.perf_counter() - start
+
+        m = min(n, reference_limit)
+        start = time.perf_counter()
+        _reference(high[:m], low[:m], close[:m])
+        reference = (time.perf_counter() - start) * n / m
+
+        results.append((n, kernel, reference))
+        note = "" if m == n else f"（按 {m} 只外推）"
+        print(f"  {n:>6} 只 × {n_days} 天: {BACKEND} {kernel:.3f}s, pandas {reference:.2f}s{note}, "
+              f"加速 {reference / kernel:.0f}x")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量指标内核验证与基准")
+    parser.add_argument("command", choices=["check", "bench"])
+    parser.add_argument("--symbols", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--days", type=int, default=252)
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        return check()
+    return bench(args.symbols, args.days)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+按需计算字段的扫描结果
+- 大部分股票落在中性区（评分 0，不显示），它们的背离、RSI/成交量状态等字段只在被访问时才计算
+- LazyResult 是 dict 子类：result['rsi'] / result.get('rsi') 触发计算，计算结果写回字典
+- 序列化（JSON / 分片 / 归档 / Arrow）使用 snapshot()：不计算未访问的字段，写为 null，
+  并用 deferred（字段列表）和 deferred_as_of（K线日期）标记，读取方据此区分"未计算"和"无数据"
+- from_snapshot() 把带标记的 dict 还原为 LazyResult，标记的字段交给调用方提供的函数重新计算
+  （scanner.restore_deferred 从本地日线缓存读取 deferred_as_of 之前的K线）
+"""
+
+DEFERRED_KEY = 'deferred'
+DEFERRED_AS_OF_KEY = 'deferred_as_of'
+
+class LazyResult(dict):
+    """
+    loaders: {字段名: 函数}，函数无参数，返回包含该字段（通常还有同组其他字段）的 dict
+    同一个函数负责的字段一次算完
+    as_of: 计算用的最后一根K线日期（YYYY-MM-DD），序列化时写入 deferred_as_of
+    """
+
+    def __init__(self, data, loaders, as_of=None):
+        super().__init__(data)
+        self._loaders = dict(loaders)
+        self.as_of = as_of
+
+    def __missing__(self, key):
+        loader = self._loaders.get(key)
+        if loader is None:
+            raise KeyError(key)
+        values = loader()
+        self.update(values)
+        for name in values:
+            self._loaders.pop(name, None)
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self._loaders
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    @property
+    def pending(self):
+        """尚未计算的字段"""
+        return sorted(self._loaders)
+
+    def materialize(self):
+        """计算全部字段"""
+        for key in list(self._loaders):
+            if key in self._loaders:
+                self[key]
+        return self
+
+    def __reduce__(self):
+        # pickle / 多进程传递时不携带计算闭包
+        return dict, (snapshot(self),)
+
+def snapshot(row):
+    """普通 dict 副本：未计算的字段写为 None，并记录在 deferred / deferred_as_of 中（不触发计算）"""
+    if not isinstance(row, LazyResult):
+        return row
+    out = dict(row)
+    pending = row.pending
+    if pending:
+        out.update(dict.fromkeys(pending))
+        out[DEFERRED_KEY] = pending
+        out[DEFERRED_AS_OF_KEY] = row.as_of
+    return out
+
+def from_snapshot(row, make_loaders):
+    """
+    snapshot() 写出的 dict -> LazyResult；没有延迟字段时原样返回
+    make_loaders(row, fields): 返回 {字段名: 函数}，覆盖 fields
+    """
+    pending = row.get(DEFERRED_KEY)
+    if not pending:
+        return row
+    data = {k: v for k, v in row.items() if k not in pending and k not in (DEFERRED_KEY, DEFERRED_AS_OF_KEY)}
+    return LazyResult(data, make_loaders(row, pending), row.get(DEFERRED_AS_OF_KEY))
+
+def snapshot_scan(scan_results):
+    """整份扫描结果（classify_results 结构）的可序列化副本（延迟字段不计算）"""
+    return {k: [snapshot(r) for r in v] if isinstance(v, list) else v
+            for k, v in scan_results.items()}
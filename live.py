@@ -0,0 +1,405 @@
+"""
+盘中实时模式：按报价流更新当日未完成的日线，增量计算 WT1/WT2
+- 每只股票保存昨日收盘时的 EWM 状态（esa、d、WT1 以及最近 3 根 WT1），
+  每个报价只做常数次运算即可得到"如果现在收盘"的 WT1/WT2，不重算历史
+- 跨日运行时，新交易日的第一个报价先把上一日的K线并入递推状态，再开始新的日线
+- 报价源可替换: ReplayQuoteSource（本地回放文件）、SocketQuoteSource（TCP 换行分隔 JSON）
+- WT1 跨越阈值（进入/离开超卖、超买、接近区）时立即推送给各个 sink（事件文件、Telegram 等）
+
+报价格式（回放文件每行一个 JSON，socket 同样）:
+    {"ts": "2025-03-14T10:31:05-04:00", "symbol": "AAPL", "price": 212.3, "volume": 18234500}
+    volume 为当日累计成交量，可省略
+
+用法:
+    python live.py --replay data/ticks.jsonl --speed 10
+    python live.py --socket 127.0.0.1:9100 --telegram
+"""
+
+import abc
+import argparse
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque, namedtuple
+
+import pandas as pd
+
+import lookback_planner
+import universe
+from bar_cache import BarCache
+
+LIVE_EVENTS_PATH = os.path.join("data", "live_events.jsonl")
+LIVE_STATE_PATH = os.path.join("data", "live_state.json")
+STATE_WRITE_INTERVAL = 1.0
+
+Quote = namedtuple('Quote', ['ts', 'symbol', 'price', 'volume'])
+
+ZONE_LABELS = {
+    'oversold': '🟢 超卖',
+    'overbought': '🔴 超买',
+    'approaching_os': '🟡 接近超卖',
+    'approaching_ob': '🟡 接近超买',
+    'neutral': '⚪ 中性',
+}
+
+def wt_zone(wt1, ob_level=60, os_level=-60):
+    """与 scan_symbol 相同的分类"""
+    if wt1 <= os_level:
+        return 'oversold'
+    if wt1 >= ob_level:
+        return 'overbought'
+    if wt1 <= -53:
+        return 'approaching_os'
+    if wt1 >= 53:
+        return 'approaching_ob'
+    return 'neutral'
+
+# ============================================================================
+# 1. 增量 WaveTrend
+# ============================================================================
+
+class WaveTrendState:
+    """
+    昨日收盘后的 WaveTrend 递推状态 + 今日正在形成的日线
+    update() 为 O(1)，结果与把今日K线追加到历史后调用 calc_wavetrend 一致
+    day 与正在形成的日线不同时先 roll()，上一日的K线成为已完成K线
+    """
+
+    def __init__(self, symbol, esa, d, wt1, wt1_tail, prev_close, n1=10, n2=21):
+        self.symbol = symbol
+        self.esa = esa
+        self.d = d
+        self.wt1 = wt1
+        self.wt1_tail = list(wt1_tail)          # 最近 3 根已完成K线的 WT1（算 WT2 用）
+        self.prev_wt2 = sum(wt1_tail[-3:] + [wt1]) / 4 if len(wt1_tail) >= 3 else float('nan')
+        self.prev_close = prev_close
+        self.a1 = 2 / (n1 + 1)
+        self.a2 = 2 / (n2 + 1)
+        self.bar = None                          # 今日 [open, high, low, close, volume]
+        self.day = None                          # 今日K线的交易日
+        self._current = None                     # 今日K线当前的 (esa, d, wt1, wt2)
+
+    @classmethod
+    def from_history(cls, symbol, df, n1=10, n2=21):
+        """由已完成的日线（截至昨日）计算递推状态"""
+        # 缓存中的价格是 float32: 先逐列转为 float64 再相加（与 to_compute_dtype 后的 calc_wavetrend 一致）
+        ap = (df['High'].astype('float64') + df['Low'].astype('float64') + df['Close'].astype('float64')) / 3
+        esa = ap.ewm(span=n1, adjust=False).mean()
+        d = (ap - esa).abs().ewm(span=n1, adjust=False).mean()
+        ci = (ap - esa) / (0.015 * d.replace(0, float('nan')))
+        wt1 = ci.ewm(span=n2, adjust=False).mean()
+        return cls(symbol, float(esa.iloc[-1]), float(d.iloc[-1]), float(wt1.iloc[-1]),
+                   [float(v) for v in wt1.iloc[-4:-1]], float(df['Close'].iloc[-1]), n1, n2)
+
+    def update(self, price, volume=None, day=None):
+        """用最新价格更新 day（默认当前交易日）的K线，返回 (wt1, wt2)"""
+        if day is not None:
+            if self.bar is not None and day != self.day:
+                self.roll()
+            self.day = day
+        if self.bar is None:
+            self.bar = [price, price, price, price, volume or 0]
+        else:
+            bar = self.bar
+            bar[1] = max(bar[1], price)
+            bar[2] = min(bar[2], price)
+            bar[3] = price
+            if volume is not None:
+                bar[4] = volume
+        ap = (self.bar[1] + self.bar[2] + self.bar[3]) / 3
+        esa = self.a1 * ap + (1 - self.a1) * self.esa
+        d = self.a1 * abs(ap - esa) + (1 - self.a1) * self.d
+        ci = (ap - esa) / (0.015 * d) if d else float('nan')
+        wt1 = self.a2 * ci + (1 - self.a2) * self.wt1
+        wt2 = (sum(self.wt1_tail[-2:]) + self.wt1 + wt1) / 4 if len(self.wt1_tail) >= 2 else float('nan')
+        self._current = (esa, d, wt1, wt2)
+        return wt1, wt2
+
+    def roll(self):
+        """收盘: 今日K线并入递推状态（成为"昨日"），下一个报价开始新的日线"""
+        if self.bar is None:
+            return
+        esa, d, wt1, wt2 = self._current
+        self.wt1_tail = (self.wt1_tail + [self.wt1])[-3:]
+        self.esa, self.d, self.wt1, self.prev_wt2 = esa, d, wt1, wt2
+        self.prev_close = self.bar[3]
+        self.bar = None
+        self._current = None
+
+def load_states(symbols, cache=None, today=None):
+    """从日线缓存建立各股票昨日收盘的状态（缓存中今日及以后的K线不参与）"""
+    cache = cache or BarCache()
+    today = pd.Timestamp(today or pd.Timestamp.now()).normalize()
+    states = {}
+    for symbol in symbols:
+        df, _ = cache.load(symbol)
+        if df is None:
+            continue
+        df = df.loc[:today - pd.Timedelta(days=1)].iloc[-lookback_planner.REQUIRED_BARS:]
+        if len(df) < lookback_planner.MIN_BARS:
+            continue
+        states[symbol] = WaveTrendState.from_history(symbol, df)
+    return states
+
+# ============================================================================
+# 2. 报价源
+# ============================================================================
+
+class QuoteSource(abc.ABC):
+    """报价源接口：迭代产生 Quote"""
+
+    @abc.abstractmethod
+    def __iter__(self):
+        """依次产生 Quote，报价源结束时返回"""
+
+    def close(self):
+        pass
+
+def parse_quote(line):
+    data = json.loads(line)
+    return Quote(pd.Timestamp(data['ts']), data['symbol'].upper(), float(data['price']),
+                 float(data['volume']) if data.get('volume') is not None else None)
+
+class ReplayQuoteSource(QuoteSource):
+    """
+    回放本地报价文件（每行一个 JSON）
+    speed: 回放倍速，按报价时间戳间隔 / speed 等待；0 表示不等待
+    """
+
+    def __init__(self, path, speed=0):
+        self.path = path
+        self.speed = speed
+
+    def __iter__(self):
+        last_ts = None
+        started = None
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                quote = parse_quote(line)
+                if self.speed:
+                    if last_ts is None:
+                        last_ts, started = quote.ts, time.monotonic()
+                    delay = (quote.ts - last_ts).total_seconds() / self.speed - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                yield quote
+
+class SocketQuoteSource(QuoteSource):
+    """从 TCP 连接读取换行分隔的 JSON 报价（测试时可用 nc 或回放脚本代替真实行情）"""
+
+    def __init__(self, host, port, timeout=None):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.file = self.sock.makefile('r', encoding='utf-8')
+
+    def __iter__(self):
+        for line in self.file:
+            if line.strip():
+                yield parse_quote(line)
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+# ============================================================================
+# 3. 事件推送
+# ============================================================================
+
+class JsonlSink:
+    """事件追加到 JSONL 文件（Streamlit 页面读取显示）"""
+
+    def __init__(self, path=LIVE_EVENTS_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, event):
+        self.file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class TelegramSink:
+    """后台线程发送 Telegram，不阻塞报价处理"""
+
+    def __init__(self, bot_token, chat_ids):
+        from notify_telegram import TelegramSender
+
+        self.sender = TelegramSender(bot_token)
+        self.chat_ids = list(chat_ids)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="live-telegram", daemon=True)
+        self.thread.start()
+
+    def __call__(self, event):
+        self.queue.put(event)
+
+    def _run(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                break
+            self.sender.broadcast(self.chat_ids, format_event(event))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.sender.close()
+
+def print_sink(event):
+    print(format_event(event))
+
+def format_event(event):
+    cross = f" {event['cross']}" if event['cross'] else ""
+    return (f"⚡ {event['symbol']} {ZONE_LABELS[event['from']]} → {ZONE_LABELS[event['to']]}"
+            f" | WT1 {event['wt1']:.2f} | ${event['price']:.2f}{cross} ({event['ts']})")
+
+# ============================================================================
+# 4. 监控
+# ============================================================================
+
+class LiveMonitor:
+    """消费报价，维护各股票的实时 WT1 和分类，分类变化时推送事件"""
+
+    def __init__(self, states, sinks=(), ob_level=60, os_level=-60, state_path=LIVE_STATE_PATH):
+        self.states = states
+        self.sinks = list(sinks)
+        self.ob_level = ob_level
+        self.os_level = os_level
+        self.state_path = state_path
+        self.zones = {s: wt_zone(st.wt1, ob_level, os_level) for s, st in states.items()}
+        self.latest = {}
+        self.recent = deque(maxlen=200)
+        self._state_written_at = 0.0
+
+    def on_quote(self, quote):
+        """处理一个报价，分类变化时返回事件"""
+        state = self.states.get(quote.symbol)
+        if state is None:
+            return None
+        # 报价时间戳带交易所时区，date() 即交易日
+        wt1, wt2 = state.update(quote.price, quote.volume, quote.ts.date())
+        zone = wt_zone(wt1, self.ob_level, self.os_level)
+
+        cross = ""
+        if wt1 > wt2 and state.wt1 <= state.prev_wt2:
+            cross = "🔼 金叉"
+        elif wt1 < wt2 and state.wt1 >= state.prev_wt2:
+            cross = "🔽 死叉"
+
+        self.latest[quote.symbol] = {
+            'price': quote.price,
+            'change': round((quote.price / state.prev_close - 1) * 100, 2),
+            'wt1': round(wt1, 2),
+            'wt2': round(wt2, 2),
+            'zone': zone,
+            'cross': cross,
+            'ts': str(quote.ts),
+        }
+
+        event = None
+        previous = self.zones[quote.symbol]
+        if zone != previous:
+            self.zones[quote.symbol] = zone
+            event = {
+                'ts': str(quote.ts),
+                'symbol': quote.symbol,
+                'from': previous,
+                'to': zone,
+                'price': quote.price,
+                'wt1': round(wt1, 2),
+                'wt2': round(wt2, 2),
+                'cross': cross,
+            }
+            self.recent.append(event)
+            for sink in self.sinks:
+                sink(event)
+        return event
+
+    def write_state(self, force=False):
+        """每 STATE_WRITE_INTERVAL 秒把全部股票的实时状态写入文件"""
+        now = time.monotonic()
+        if not force and now - self._state_written_at < STATE_WRITE_INTERVAL:
+            return
+        self._state_written_at = now
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'updated': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+                       'symbols': self.latest}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def run(self, source):
+        """消费报价源直到结束，返回处理的报价数"""
+        count = 0
+        try:
+            for quote in source:
+                self.on_quote(quote)
+                self.write_state()
+                count += 1
+        finally:
+            self.write_state(force=True)
+            source.close()
+        return count
+
+def load_recent_events(path=LIVE_EVENTS_PATH, limit=50):
+    """读取最近的实时事件（供页面显示）"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            lines = deque(f, maxlen=limit)
+    except FileNotFoundError:
+        return []
+    return [json.loads(line) for line in reversed(lines) if line.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WaveTrend 盘中实时监控")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--replay", help="回放报价文件（JSONL）")
+    source.add_argument("--socket", help="报价 socket 地址 host:port")
+    parser.add_argument("--speed", type=float, default=0, help="回放倍速，0 为不等待")
+    parser.add_argument("--universe", action="append", help="股票池名称或文件路径")
+    parser.add_argument("--today", help="交易日（默认今天），状态取该日之前的缓存日线")
+    parser.add_argument("--events", default=LIVE_EVENTS_PATH)
+    parser.add_argument("--telegram", action="store_true", help="通过 Telegram 推送事件")
+    args = parser.parse_args(argv)
+
+    if args.telegram:
+        bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+        chat_ids = [c.strip() for c in os.environ.get('TELEGRAM_CHAT_ID', '').split(',') if c.strip()]
+        if not bot_token or not chat_ids:
+            print("❌ --telegram 需要 TELEGRAM_BOT_TOKEN 和 TELEGRAM_CHAT_ID 环境变量")
+            raise SystemExit(1)
+
+    symbols = universe.load_universe(args.universe or ["default"])
+    states = load_states(symbols, today=args.today)
+    print(f"📡 已加载 {len(states)}/{len(symbols)} 只股票的昨日状态")
+
+    sinks = [print_sink, JsonlSink(args.events)]
+    if args.telegram:
+        sinks.append(TelegramSink(bot_token, chat_ids))
+
+    if args.replay:
+        quotes = ReplayQuoteSource(args.replay, args.speed)
+    else:
+        host, port = args.socket.rsplit(':', 1)
+        quotes = SocketQuoteSource(host, int(port))
+
+    monitor = LiveMonitor(states, sinks)
+    try:
+        count = monitor.run(quotes)
+    except KeyboardInterrupt:
+        count = None
+    finally:
+        for sink in sinks:
+            if hasattr(sink, 'close'):
+                sink.close()
+    if count is not None:
+        print(f"✅ 处理报价 {count} 条")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+最少历史K线数规划
+- 由指标参数推导需要多少根日线，代替固定的 period="3mo" 和 len(df) < 50 的经验值
+- 结合本地缓存（BarCache）只请求缺少的K线
+
+推导:
+    WT1 是两级 EWM（esa/d 用 n1，WT1 用 n2）。EWM 从第一根K线起步，初始值误差按 (1 - α)^k 衰减，
+    α = 2 / (span + 1)。收敛最慢的一级决定预热长度:
+        warmup = ceil(ln(tolerance / WT_INIT_ERROR) / ln(1 - α_min))
+    WT_INIT_ERROR 是起步时 WT1 误差的量级上界（d 从 0 起步，前几根 CI 会很大），由 check 子命令验证。
+    之后还需要一个评估窗口，窗口内 WT1 都要收敛:
+        背离最长回看 60（divergence.LOOKBACKS）、WT2 的 4 日均线 + 前一根（交叉判断）、RSI 14 + 1、成交量均线 20
+    required = warmup + max(窗口)
+    MIN_BARS 只按默认背离参数组（回看 30）计算: 更长回看的参数组只影响多参数置信度，不因此排除历史较短的股票
+    MIN_BARS（103）高于原来的经验值 50: 历史不足约 5 个月的新上市股票不再参与扫描；
+    可用 WT_MIN_BARS 环境变量降低下限（接受更大的 WT1 误差）
+
+用法:
+    python lookback_planner.py show
+    python lookback_planner.py check --universe default     # 截断预热 vs 2 年历史的 WT1 误差
+"""
+
+import argparse
+import math
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import bar_cache
+import divergence
+import ingest
+import metrics
+
+WT_INIT_ERROR = 1000.0
+DEFAULT_TOLERANCE = 0.05      # WT1 允许误差（与阈值 ±53/±60 相比可忽略）
+MIN_BARS_TOLERANCE = 1.0      # 低于该精度的数据不参与扫描（新上市股票等）
+
+# 交易日 -> 日历日，另加节假日余量
+CALENDAR_RATIO = 365.25 / 252
+HOLIDAY_SLACK_DAYS = 7
+
+# 多参数背离的最长回看 / 默认参数组的回看
+DIV_LOOKBACK = max(divergence.LOOKBACKS)
+DEFAULT_DIV_LOOKBACK = divergence.DEFAULT_CONFIG[0]
+
+# 重叠K线（缓存中已收盘的一根）新旧价格的相对差超过该值时，认为发生了拆股/分红复权，整段重新获取
+ADJUSTMENT_RTOL = 1e-5
+
+FetchPlan = namedtuple('FetchPlan', ['symbol', 'start', 'cached_bars', 'full'])
+
+def ewm_warmup(span, tolerance=DEFAULT_TOLERANCE, init_error=WT_INIT_ERROR):
+    """EWM 初始值误差衰减到 tolerance 以下所需的K线数"""
+    alpha = 2 / (span + 1)
+    return max(0, math.ceil(math.log(tolerance / init_error) / math.log(1 - alpha)))
+
+def evaluation_window(wt2_len=4, rsi_period=14, vol_period=20, div_lookback=DIV_LOOKBACK):
+    """最新一根K线的信号会用到的最近K线数"""
+    return max(div_lookback, wt2_len + 1, rsi_period + 1, vol_period)
+
+def required_bars(n1=10, n2=21, wt2_len=4, rsi_period=14, vol_period=20, div_lookback=DIV_LOOKBACK,
+                  tolerance=DEFAULT_TOLERANCE):
+    """评估窗口内 WT1 误差不超过 tolerance 所需的K线数"""
+    warmup = max(ewm_warmup(n1, tolerance), ewm_warmup(n2, tolerance))
+    return warmup + evaluation_window(wt2_len, rsi_period, vol_period, div_lookback)
+
+REQUIRED_BARS = required_bars()
+MIN_BARS_ENV = 'WT_MIN_BARS'
+MIN_BARS = int(os.environ.get(MIN_BARS_ENV) or
+               required_bars(div_lookback=DEFAULT_DIV_LOOKBACK, tolerance=MIN_BARS_TOLERANCE))
+
+def calendar_days(bars):
+    return math.ceil(bars * CALENDAR_RATIO) + HOLIDAY_SLACK_DAYS
+
+def fetch_start(bars=REQUIRED_BARS, today=None):
+    """没有缓存时的请求起始日期"""
+    today = pd.Timestamp(today or pd.Timestamp.now()).normalize()
+    return today - pd.Timedelta(days=calendar_days(bars))
+
+# ============================================================================
+# 结合缓存的请求规划
+# ============================================================================
+
+def plan_fetch(symbol, cache=None, bars=REQUIRED_BARS, today=None):
+    """
+    缓存已有足够历史时，只从缓存的倒数第二个交易日开始请求: 最后一天可能是盘中数据，重新获取；
+    倒数第二天已收盘，用来与缓存对比检查复权基准是否变化。否则请求完整的 bars 根
+    """
+    today = pd.Timestamp(today or pd.Timestamp.now()).normalize()
+    if cache is not None and symbol in cache:
+        df, _ = cache.load(symbol)
+        cached = df.loc[:today]
+        if len(cached) >= max(bars, 2):
+            return FetchPlan(symbol, cached.index[-2], len(cached), False)
+    return FetchPlan(symbol, fetch_start(bars, today), 0, True)
+
+def same_basis(cached, fetched, date):
+    """缓存和新获取的数据在 date 这根K线上价格一致（复权基准未变）"""
+    if date not in cached.index or date not in fetched.index:
+        return False
+    columns = ['Open', 'High', 'Low', 'Close']
+    old = cached.loc[date, columns].to_numpy(dtype=np.float64)
+    new = fetched.loc[date, columns].to_numpy(dtype=np.float64)
+    return bool(np.allclose(old, new, rtol=ADJUSTMENT_RTOL, atol=0))
+
+def fetch_history(ticker, symbol, cache=None, bars=REQUIRED_BARS, today=None):
+    """
+    按 plan_fetch 请求日线并与缓存拼接（缓存中的旧K线 + 新获取的K线，同日以新数据为准），
+    返回最后 bars 根紧凑 OHLCV（索引为无时区日期）；请求没有返回数据时返回空表（视为获取失败）
+    重叠的K线与缓存不一致（拆股/分红后 Yahoo 重新复权了历史）时改为完整请求，
+    并用新数据替换缓存中的旧K线（只有这种情况会写缓存）
+    """
+    plan = plan_fetch(symbol, cache, bars, today)
+    if cache is not None:
+        metrics.CACHE_REQUESTS.inc(cache='bars')
+    df = _history(ticker, plan.start)
+    if not plan.full and len(df):
+        cached, _ = cache.load(symbol)
+        if same_basis(cached, df, plan.start):
+            df = pd.concat([cached[~cached.index.isin(df.index)], df]).sort_index()
+        else:
+            print(f"  ⚠️ {symbol} 复权基准变化，重新获取完整历史")
+            df = _history(ticker, fetch_start(bars, today))
+            if len(df):
+                cache.save(symbol, df, replace=True)
+            plan = plan._replace(full=True)
+    if cache is not None and plan.full:
+        metrics.CACHE_MISSES.inc(cache='bars')
+    return ingest.compact_ohlcv(df.iloc[-bars:])
+
+def _history(ticker, start):
+    df = ingest.compact_ohlcv(ticker.history(start=start.strftime('%Y-%m-%d')))
+    df.index = bar_cache._to_naive_dates(df.index)
+    return df
+
+# ============================================================================
+# 精度验证
+# ============================================================================
+
+def wt1_truncation_error(df, bars=REQUIRED_BARS, window=None):
+    """只用最后 bars 根计算的 WT1 与用全部历史计算的 WT1，在最后 window 根上的最大绝对误差"""
+    from scanner import calc_wavetrend
+
+    window = window or evaluation_window()
+    full, _ = calc_wavetrend(df)
+    truncated, _ = calc_wavetrend(df.iloc[-bars:])
+    diff = (full.iloc[-window:] - truncated.iloc[-window:]).abs()
+    return float(diff.max())
+
+def check_accuracy(frames, bars=REQUIRED_BARS, tolerance=DEFAULT_TOLERANCE):
+    """
+    frames: 可迭代的 (symbol, 长历史 DataFrame)
+    返回 (最大误差, 超过 tolerance 的股票列表)
+    """
+    max_error = 0.0
+    failed = []
+    checked = 0
+    for symbol, df in frames:
+        # 历史至少要比 bars 长一倍，"全部历史" 才能当作收敛的基准
+        if len(df) < 2 * bars:
+            continue
+        error = wt1_truncation_error(df, bars)
+        checked += 1
+        max_error = max(max_error, error)
+        if error > tolerance:
+            failed.append((symbol, error))
+    if not checked:
+        raise ValueError(f"没有可验证的股票（需要至少 {2 * bars} 根历史K线，或数据获取全部失败）")
+    print(f"  验证 {checked} 只股票: {bars} 根K线, WT1 最大误差 {max_error:.6f} (容差 {tolerance})")
+    return max_error, failed
+
+def _yahoo_frames(symbols, period="2y"):
+    import yfinance as yf
+
+    for symbol in symbols:
+        try:
+            yield symbol, yf.Ticker(symbol).history(period=period)
+        except Exception as e:
+            print(f"  ⚠️ 获取 {symbol} 数据失败: {e}")
+
+def main(argv=None):
+    import universe
+
+    parser = argparse.ArgumentParser(description="指标预热长度规划")
+    parser.add_argument("command", choices=["show", "check"])
+    parser.add_argument("--universe", action="append", help="股票池名称或文件路径")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    bars = required_bars(tolerance=args.tolerance)
+    if args.command == "show":
+        print(f"WT1 预热: n1=10 -> {ewm_warmup(10, args.tolerance)} 根, n2=21 -> {ewm_warmup(21, args.tolerance)} 根")
+        print(f"评估窗口: {evaluation_window()} 根")
+        print(f"所需K线: {bars} 根（约 {calendar_days(bars)} 个日历日）, 最少K线: {MIN_BARS} 根")
+        return bars
+
+    symbols = universe.load_universe(args.universe or ["default"])
+    try:
+        max_error, failed = check_accuracy(_yahoo_frames(symbols), bars, args.tolerance)
+    except ValueError as e:
+        print(f"  ❌ {e}")
+        raise SystemExit(1)
+    for symbol, error in failed:
+        print(f"  ❌ {symbol}: {error:.6f}")
+    if failed:
+        raise SystemExit(1)
+    return max_error, failed
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+扫描与追踪的运行指标（Prometheus 文本格式）
+- 进程内注册表: Counter / Gauge / Histogram，支持标签；同名指标重复注册时返回已有对象
+  （Streamlit 每次 rerun 都会重新执行模块级代码）
+- 导出:
+    write_textfile(job)     原子写入 <WT_METRICS_DIR>/wavetrend_<job>.prom，供 node exporter 的 textfile collector 读取
+                            （扫描和 Telegram 通知是不同进程，各写各的文件）
+    start_http_server(port) 后台线程提供 /metrics
+- 每只股票的全部记录约十几微秒，相对每只股票 ~100ms 的网络请求可忽略
+
+用法:
+    WT_METRICS_DIR=/var/lib/node_exporter/textfile python scanner.py
+    python metrics.py show
+    python metrics.py serve --port 9108
+"""
+
+import argparse
+import bisect
+import glob
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_DIR_ENV = 'WT_METRICS_DIR'
+METRICS_PORT_ENV = 'WT_METRICS_PORT'
+DEFAULT_METRICS_DIR = os.path.join("data", "metrics")
+
+# 秒；覆盖缓存命中（<1ms）到慢速网络请求（数秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+# ============================================================================
+# 1. 指标
+# ============================================================================
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，收到 {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self):
+        """[(后缀, 标签值, 额外标签, 值)]"""
+        with self._lock:
+            return [('', key, (), value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        samples = self.samples()
+        if not samples:
+            # 没有样本的指标不输出，避免扫描和通知两个 textfile 中出现重复的空指标族
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, key, extra, value in samples:
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_to_current_time(self, **labels):
+        self.set(time.time(), **labels)
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [各桶计数（非累计）..., +Inf 桶, sum]
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[i] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return sum(state[:-1]) if state else 0
+
+    def samples(self):
+        out = []
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), state[:-1]):
+                cumulative += n
+                out.append(('_bucket', key, (('le', _format_value(bound)),), cumulative))
+            out.append(('_sum', key, (), state[-1]))
+            out.append(('_count', key, (), cumulative))
+        return out
+
+# ============================================================================
+# 2. 注册表
+# ============================================================================
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"指标 {name} 已以不同类型或标签注册")
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self):
+        """Prometheus 文本格式"""
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# ============================================================================
+# 3. 扫描/追踪共用的指标
+# ============================================================================
+
+SCAN_DURATION = REGISTRY.gauge(
+    'wavetrend_scan_duration_seconds', '最近一次扫描的总耗时', ['mode'])
+SCAN_LAST_SUCCESS = REGISTRY.gauge(
+    'wavetrend_scan_last_success_timestamp_seconds', '最近一次扫描完成的 Unix 时间', ['mode'])
+STAGE_SECONDS = REGISTRY.histogram(
+    'wavetrend_stage_seconds', '各阶段耗时（fetch 为单只股票获取，evaluate 为单只股票指标计算）', ['stage'])
+SYMBOLS = REGISTRY.counter(
+    'wavetrend_symbols_total', '扫描的股票数（fetched 成功 / failed 获取失败或K线不足 / filtered 市值不足）',
+    ['outcome'])
+CACHE_REQUESTS = REGISTRY.counter(
+    'wavetrend_cache_requests_total', '缓存查询次数', ['cache'])
+CACHE_MISSES = REGISTRY.counter(
+    'wavetrend_cache_misses_total', '缓存未命中次数（命中率 = 1 - misses / requests）', ['cache'])
+SHEETS_CALLS = REGISTRY.counter(
+    'wavetrend_sheets_api_calls_total', 'Google Sheets API 调用次数', ['op', 'status'])
+SHEETS_SECONDS = REGISTRY.histogram(
+    'wavetrend_sheets_api_seconds', 'Google Sheets API 调用耗时', ['op'])
+TELEGRAM_SECONDS = REGISTRY.histogram(
+    'wavetrend_telegram_send_seconds', 'Telegram 单条消息发送耗时（含重试）', ['status'])
+
+class InstrumentedProxy:
+    """
+    包装一个客户端对象，记录每个方法调用的次数和耗时（Google Sheets worksheet 等）
+    非方法属性原样透传
+    """
+
+    def __init__(self, target, calls=SHEETS_CALLS, seconds=SHEETS_SECONDS):
+        self._target = target
+        self._calls = calls
+        self._seconds = seconds
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            status = 'error'
+            try:
+                result = attr(*args, **kwargs)
+                status = 'ok'
+                return result
+            finally:
+                self._seconds.observe(time.perf_counter() - start, op=name)
+                self._calls.inc(op=name, status=status)
+        return call
+
+# ============================================================================
+# 4. 导出
+# ============================================================================
+
+def metrics_dir():
+    return os.environ.get(METRICS_DIR_ENV) or DEFAULT_METRICS_DIR
+
+def metrics_file(job):
+    return os.path.join(metrics_dir(), f"wavetrend_{job}.prom")
+
+def write_textfile(job, path=None, registry=REGISTRY):
+    """原子写入（textfile collector 不会读到写了一半的文件），返回路径"""
+    path = path or metrics_file(job)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+    return path
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+    textfiles = ()
+
+    def do_GET(self):
+        if self.path.split('?')[0].rstrip('/') != '/metrics':
+            self.send_error(404)
+            return
+        parts = [self.registry.render()]
+        for path in self.textfiles:
+            # 定时扫描进程已退出，其指标只在 textfile 中
+            try:
+                with open(path, encoding='utf-8') as f:
+                    parts.append(f.read())
+            except OSError:
+                pass
+        body = ''.join(parts).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port, host="127.0.0.1", registry=REGISTRY, textfiles=()):
+    """后台线程提供 /metrics，返回 server（server.shutdown() 停止）"""
+    handler = type('Handler', (MetricsHandler,), {'registry': registry, 'textfiles': tuple(textfiles)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WaveTrend 运行指标")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("show", help="打印指标目录下全部 textfile 内容")
+
+    p = sub.add_parser("serve", help="通过 HTTP /metrics 提供指标目录下的 textfile 内容")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=9108)
+    args = parser.parse_args(argv)
+
+    textfiles = sorted(glob.glob(os.path.join(metrics_dir(), "*.prom")))
+    if args.command == "show":
+        for path in textfiles:
+            with open(path, encoding='utf-8') as f:
+                print(f.read(), end='')
+        return
+
+    server = start_http_server(args.port, args.host, Registry(), textfiles)
+    print(f"📈 指标已启动: http://{args.host}:{args.port}/metrics  (目录: {metrics_dir()})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,220 @@
 """
 Telegram 通知模块
 在 GitHub Actions 中运行，发送扫描结果到 Telegram
+- 连接池复用的 HTTP Session，带超时
+- 指数退避重试，遵守 Telegram 429 返回的 retry_after
+- 超过 4096 字符的报告自动按行拆分为多条消息
+- 支持多个 chat ID 并发发送（TELEGRAM_CHAT_ID 用逗号分隔）
+- 默认只发送与上次扫描相比的变化（TELEGRAM_FULL_REPORT=1 发送完整报告）
 """
 
 import os
 import json
-import requests
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import requests
+from requests.adapters import HTTPAdapter
+
+import alert_state
+import metrics
+
+TELEGRAM_API = os.environ.get('TELEGRAM_API_BASE', "https://api.telegram.org")
+
+# Telegram 单条消息长度上限（按 UTF-16 码元计）
+MESSAGE_LIMIT = 4096
+
+# ============================================================================
+# 1. 消息拆分
+# ============================================================================
+
+def _tg_len(text):
+    """Telegram 按 UTF-16 码元计算长度（emoji 占 2）"""
+    return len(text.encode('utf-16-le')) // 2
+
+_TAG = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9-]*)[^<>]*>')
+_ENTITY = re.compile(r'&(#\d+|#x[0-9a-fA-F]+|\w+);')
+
+def _safe_cut(line, cut):
+    """把切点移到 HTML 标签或实体之外"""
+    lt = line.rfind('<', 0, cut)
+    if lt > line.rfind('>', 0, cut):
+        cut = lt
+    amp = line.rfind('&', 0, cut)
+    if amp >= 0:
+        entity = _ENTITY.match(line, amp)
+        if entity and entity.end() > cut:
+            cut = amp
+    return cut
+
+def _open_tags(text):
+    """text 末尾仍未闭合的标签 [(标签名, 原始开标签)]"""
+    stack = []
+    for m in _TAG.finditer(text):
+        name = m.group(2).lower()
+        if not m.group(1):
+            stack.append((name, m.group(0)))
+            continue
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i][0] == name:
+                del stack[i:]
+                break
+    return stack
+
+def _hard_cut(line, limit):
+    """
+    单行超长时切出不超过 limit 的一段: (这一段, 剩余部分)
+    不在标签/实体中间断开；仍打开的标签在这一段末尾闭合、在剩余部分开头重新打开
+    """
+    cut = limit
+    while cut > 0:
+        while cut > 0 and _tg_len(line[:cut]) > limit:
+            cut -= 1
+        cut = _safe_cut(line, cut)
+        opened = _open_tags(line[:cut])
+        closing = "".join(f"</{name}>" for name, _ in reversed(opened))
+        reopening = "".join(tag for _, tag in opened)
+        # 剩余部分必须变短，否则会无限循环
+        if _tg_len(line[:cut] + closing) <= limit and cut > len(reopening):
+            return line[:cut] + closing, reopening + line[cut:]
+        cut -= max(len(closing), 1)
+    # 标签本身超过 limit 等极端情况: 按字符切（该段可能被 Telegram 拒绝）
+    cut = limit
+    while _tg_len(line[:cut]) > limit:
+        cut -= 1
+    return line[:cut], line[cut:]
+
+def split_message(text, limit=MESSAGE_LIMIT):
+    """
+    按行拆分长消息，每段不超过 limit
+    只在换行处断开，保证每行内的 HTML 标签完整；单行超长时才硬切（见 _hard_cut）
+    """
+    chunks = []
+    current = []
+    current_len = 0
+    
+    for line in text.split("\n"):
+        while _tg_len(line) > limit:
+            if current:
+                chunks.append("\n".join(current))
+                current, current_len = [], 0
+            piece, line = _hard_cut(line, limit)
+            chunks.append(piece)
+    
+        line_len = _tg_len(line) + (1 if current else 0)
+        if current and current_len + line_len > limit:
+            chunks.append("\n".join(current))
+            current, current_len = [], 0
+            line_len = _tg_len(line)
+        current.append(line)
+        current_len += line_len
+    
+    if current and any(current):
+        chunks.append("\n".join(current))
+    return chunks
+
+# ============================================================================
+# 2. 发送
+# ============================================================================
+
+class TelegramSender:
+    """
+    Telegram 消息发送器
+    api_base 可指向本地测试服务器（例如 http://127.0.0.1:8080）
+    """
+    
+    def __init__(self, bot_token, api_base=TELEGRAM_API, timeout=10, max_retries=4,
+                 backoff=1.0, pool_size=8):
+        self.url = f"{api_base.rstrip('/')}/bot{bot_token}/sendMessage"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+    
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
+    def _post(self, chat_id, text):
+        """发送单条消息，失败时按退避策略重试；返回是否成功"""
+        payload = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": "HTML"
+        }
+    
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff * (2 ** attempt)
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                if response.status_code == 200:
+                    metrics.TELEGRAM_SECONDS.observe(time.perf_counter() - start, status='ok')
+                    return True
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code == 429:
+                    # Telegram 限流: {"parameters": {"retry_after": 秒数}}
+                    try:
+                        delay = response.json()["parameters"]["retry_after"]
+                    except (ValueError, KeyError, TypeError):
+                        pass
+                elif response.status_code < 500:
+                    # 其他 4xx（token 错误、chat 不存在等）重试也没用
+                    break
+    
+            if attempt < self.max_retries:
+                time.sleep(delay)
+    
+        metrics.TELEGRAM_SECONDS.observe(time.perf_counter() - start, status='error')
+        print(f"❌ Telegram 通知发送失败 (chat {chat_id}): {error}")
+        return False
+    
+    def send(self, chat_id, message):
+        """发送到单个 chat，长消息自动拆分（按顺序逐条发送）"""
+        for chunk in split_message(message):
+            if not self._post(chat_id, chunk):
+                return False
+        return True
+    
+    def broadcast(self, chat_ids, message):
+        """并发发送到多个 chat，返回 {chat_id: 是否成功}"""
+        chat_ids = list(chat_ids)
+        if not chat_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, len(chat_ids))) as pool:
+            results = pool.map(lambda chat_id: self.send(chat_id, message), chat_ids)
+            return dict(zip(chat_ids, results))
+    
+    def close(self):
+        self.session.close()
+
 def send_telegram_message(bot_token, chat_id, message):
     """
     发送 Telegram 消息
     """
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    payload = {
-        "chat_id": chat_id,
-        "text": message,
-        "parse_mode": "HTML"
-    }
-    
+    sender = TelegramSender(bot_token)
     try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
+        ok = sender.send(chat_id, message)
+    finally:
+        sender.close()
+    if ok:
         print("✅ Telegram 通知发送成功")
-        return True
-    except Exception as e:
-        print(f"❌ Telegram 通知发送失败: {e}")
-        return False
+    return ok
+
+# ============================================================================
+# 3. 消息格式
+# ============================================================================
 
-def format_message(scan_results):
+def format_message(scan_results, max_per_side=None):
     """
     格式化扫描结果为 Telegram 消息
+    max_per_side: 每类最多显示几只，None 表示全部（超长时由 split_message 拆分）
     """
     oversold = scan_results.get('oversold', [])
     overbought = scan_results.get('overbought', [])
@@ -45,11 +229,11 @@ def format_message(scan_results):
     # 超卖（做多机会）
     if oversold:
         lines.append(f"🟢 <b>超卖信号 (WT1 ≤ -60)</b> [{len(oversold)}只]")
-        for s in oversold[:5]:  # 最多显示5只
+        for s in oversold[:max_per_side]:
             cross_info = f" {s['cross']}" if s['cross'] else ""
             lines.append(f"  • <code>{s['symbol']}</code> ${s['price']} | WT1: {s['wt1']}{cross_info}")
-        if len(oversold) > 5:
-            lines.append(f"  ...还有 {len(oversold) - 5} 只")
+        if max_per_side is not None and len(oversold) > max_per_side:
+            lines.append(f"  ...还有 {len(oversold) - max_per_side} 只")
         lines.append("")
     else:
         lines.append("🟢 超卖信号: 无")
@@ -58,11 +242,11 @@ def format_message(scan_results):
     # 超买（做空/止盈）
     if overbought:
         lines.append(f"🔴 <b>超买信号 (WT1 ≥ 60)</b> [{len(overbought)}只]")
-        for s in overbought[:5]:
+        for s in overbought[:max_per_side]:
             cross_info = f" {s['cross']}" if s['cross'] else ""
             lines.append(f"  • <code>{s['symbol']}</code> ${s['price']} | WT1: {s['wt1']}{cross_info}")
-        if len(overbought) > 5:
-            lines.append(f"  ...还有 {len(overbought) - 5} 只")
+        if max_per_side is not None and len(overbought) > max_per_side:
+            lines.append(f"  ...还有 {len(overbought) - max_per_side} 只")
         lines.append("")
     else:
         lines.append("🔴 超买信号: 无")
@@ -75,25 +259,54 @@ def format_message(scan_results):
     return "\n".join(lines)
 
 def main():
-    # 从环境变量获取配置
-    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
-    chat_id = os.environ.get('TELEGRAM_CHAT_ID')
+    # 指标文件在所有路径上都写出（包括缺少配置、没有变化等提前返回）
+    try:
+        # 从环境变量获取配置
+        bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+        chat_ids = [c.strip() for c in os.environ.get('TELEGRAM_CHAT_ID', '').split(',') if c.strip()]
     
-    if not bot_token or not chat_id:
-        print("❌ 缺少 TELEGRAM_BOT_TOKEN 或 TELEGRAM_CHAT_ID 环境变量")
-        return
+        if not bot_token or not chat_ids:
+            print("❌ 缺少 TELEGRAM_BOT_TOKEN 或 TELEGRAM_CHAT_ID 环境变量")
+            return
     
-    # 读取扫描结果
-    try:
-        with open('data/latest_scan.json', 'r') as f:
-            scan_results = json.load(f)
-    except FileNotFoundError:
-        print("❌ 找不到扫描结果文件")
-        return
-    
-    # 格式化并发送
-    message = format_message(scan_results)
-    send_telegram_message(bot_token, chat_id, message)
+        # 读取扫描结果
+        try:
+            with open('data/latest_scan.json', 'r') as f:
+                scan_results = json.load(f)
+        except FileNotFoundError:
+            print("❌ 找不到扫描结果文件")
+            return
+    
+        # 格式化: 默认只发送变化，首次运行（没有状态文件）时全部视为新信号
+        full_report = os.environ.get('TELEGRAM_FULL_REPORT') == '1'
+        if full_report:
+            message = format_message(scan_results)
+        else:
+            state = alert_state.load_state() or {'signals': {}, 'scan_time': None}
+            diff = alert_state.diff_signals(state['signals'], alert_state.extract_signals(scan_results),
+                                            alert_state.scanned_symbols(scan_results))
+            if not alert_state.has_changes(diff):
+                print("ℹ️ 信号无变化，不发送通知")
+                return
+            message = alert_state.format_diff_message(diff, scan_results.get('scan_time'), state['scan_time'])
+    
+        # 发送
+        sender = TelegramSender(bot_token)
+        try:
+            results = sender.broadcast(chat_ids, message)
+        finally:
+            sender.close()
+        sent = sum(results.values())
+        if sent == len(chat_ids):
+            print(f"✅ Telegram 通知发送成功: {sent} 个 chat")
+        else:
+            print(f"⚠️ Telegram 通知部分失败: {sent}/{len(chat_ids)} 个 chat 成功")
+    
+        # 至少一个 chat 收到后才更新状态，否则下次重新发送这些变化
+        if sent:
+            alert_state.save_state(scan_results)
+    finally:
+        metrics.write_textfile('telegram')
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,188 @@
+"""
+多年 OHLCV 面板存储（内存映射）
+- 磁盘布局: 固定 dtype 的三维数组 symbols × 交易日 × 字段
+- meta.json 保存代码索引、日期索引、字段和 dtype
+- 打开时只读取 meta.json 并建立 np.memmap，几乎瞬间完成
+- window() 返回零拷贝的 DataFrame 视图，可直接传给 calc_wavetrend / calc_rsi 等函数
+  内存占用只与实际访问的窗口成正比，而不是全部历史
+
+用法:
+    python panel_store.py build --universe default --period 5y --path data/panel
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+STORE_VERSION = 1
+
+class PanelStore:
+    """symbols × 交易日 × 字段 的内存映射面板"""
+
+    def __init__(self, path, symbols, dates, fields, data):
+        self.path = path
+        self.symbols = list(symbols)
+        self.dates = pd.DatetimeIndex(dates)
+        self.fields = list(fields)
+        self.data = data
+        self._symbol_index = {s: i for i, s in enumerate(self.symbols)}
+        self._field_index = {f: i for i, f in enumerate(self.fields)}
+
+    # ------------------------------------------------------------------
+    # 创建 / 打开
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def create(cls, path, symbols, dates, fields=FIELDS, dtype='float32'):
+        """创建新的空面板（全部填 NaN），之后用 write() 逐只写入"""
+        os.makedirs(path, exist_ok=True)
+        dates = pd.DatetimeIndex(dates).normalize()
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        shape = (len(symbols), len(dates), len(fields))
+
+        meta = {
+            'version': STORE_VERSION,
+            'symbols': list(symbols),
+            'dates': [d.strftime('%Y-%m-%d') for d in dates],
+            'fields': list(fields),
+            'dtype': np.dtype(dtype).name,
+            'shape': list(shape),
+        }
+        data = np.memmap(os.path.join(path, 'panel.bin'), dtype=dtype, mode='w+', shape=shape)
+        data[:] = np.nan
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        return cls(path, symbols, dates, fields, data)
+
+    @classmethod
+    def open(cls, path, mode='r'):
+        """打开已有面板；mode='r+' 时可写"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != STORE_VERSION:
+            raise ValueError(f"不支持的面板版本: {meta['version']}")
+        data = np.memmap(os.path.join(path, 'panel.bin'), dtype=meta['dtype'], mode=mode,
+                         shape=tuple(meta['shape']))
+        return cls(path, meta['symbols'], pd.to_datetime(meta['dates']), meta['fields'], data)
+
+    def flush(self):
+        self.data.flush()
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def write(self, symbol, df):
+        """把单只股票的日线数据按日期索引对齐写入面板"""
+        i = self._symbol_index[symbol]
+        index = pd.DatetimeIndex(df.index).normalize()
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        pos = self.dates.get_indexer(index)
+        mask = pos >= 0
+        for k, field in enumerate(self.fields):
+            if field in df:
+                self.data[i, pos[mask], k] = df[field].to_numpy()[mask]
+
+    # ------------------------------------------------------------------
+    # 读取（零拷贝视图）
+    # ------------------------------------------------------------------
+
+    def __contains__(self, symbol):
+        return symbol in self._symbol_index
+
+    def date_range(self, start=None, end=None, bars=None):
+        """日期区间 -> 切片 [d0, d1)；bars 指定时只取区间末尾的 bars 根"""
+        d0 = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side='left')
+        d1 = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side='right')
+        if bars is not None:
+            d0 = max(d0, d1 - bars)
+        return slice(d0, d1)
+
+    def window(self, symbol, start=None, end=None, bars=None):
+        """
+        单只股票的 OHLCV 视图（DataFrame，列为字段名）
+        去掉首尾全为 NaN 的行（上市前/退市后），仍然是切片视图，不复制数据
+        """
+        i = self._symbol_index[symbol]
+        sl = self.date_range(start, end, bars)
+        block = self.data[i, sl, :]
+
+        valid = ~np.isnan(block).all(axis=1)
+        if not valid.any():
+            return None
+        first = int(valid.argmax())
+        last = len(valid) - int(valid[::-1].argmax())
+        block = block[first:last]
+        dates = self.dates[sl][first:last]
+
+        return pd.DataFrame(block, index=dates, columns=self.fields, copy=False)
+
+    def field(self, name, start=None, end=None, bars=None):
+        """单个字段的 symbols × 交易日 二维视图（跨股票向量化计算用）"""
+        sl = self.date_range(start, end, bars)
+        return self.data[:, sl, self._field_index[name]]
+
+    def iter_windows(self, symbols=None, start=None, end=None, bars=None):
+        """逐只股票迭代 (symbol, DataFrame 视图)，跳过没有数据的股票"""
+        for symbol in symbols or self.symbols:
+            if symbol not in self._symbol_index:
+                continue
+            df = self.window(symbol, start, end, bars)
+            if df is not None:
+                yield symbol, df
+
+# ============================================================================
+# 构建
+# ============================================================================
+
+def build_panel(path, symbols, period="5y", calendar_symbol="SPY", dtype='float32'):
+    """
+    从 Yahoo 下载日线数据构建面板
+    交易日历取自 calendar_symbol；逐只下载并写入，峰值内存只有一只股票的数据
+    """
+    import yfinance as yf
+
+    calendar = yf.Ticker(calendar_symbol).history(period=period)
+    store = PanelStore.create(path, symbols, calendar.index, dtype=dtype)
+
+    total = len(symbols)
+    for n, symbol in enumerate(symbols):
+        print(f"\r  写入面板: {n+1}/{total} - {symbol}    ", end="", flush=True)
+        try:
+            df = yf.Ticker(symbol).history(period=period)
+        except Exception as e:
+            print(f"  ⚠️ 获取 {symbol} 数据失败: {e}")
+            continue
+        if len(df):
+            store.write(symbol, df)
+
+    store.flush()
+    print(f"\r  面板已保存到: {path} ({len(symbols)} 只 × {len(store.dates)} 天)")
+    return store
+
+def main(argv=None):
+    import universe
+
+    parser = argparse.ArgumentParser(description="构建 OHLCV 内存映射面板")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--path", default=os.path.join("data", "panel"))
+    parser.add_argument("--universe", action="append", help="股票池名称或文件路径")
+    parser.add_argument("--period", default="5y")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        symbols = universe.load_universe(args.universe or ["default"])
+        build_panel(args.path, symbols, args.period)
+    else:
+        store = PanelStore.open(args.path)
+        print(f"{len(store.symbols)} 只股票 × {len(store.dates)} 个交易日 × {store.fields}")
+        print(f"日期: {store.dates[0].date()} ~ {store.dates[-1].date()}, dtype: {store.data.dtype}")
+
+if __name__ == "__main__":
+    main()
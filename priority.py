@@ -0,0 +1,134 @@
+"""
+按信号相关度排序的扫描
+- 根据上一次扫描（latest_scan.json）的状态估计每只股票本次改变分类的可能性
+- 先扫描最可能变化的股票，每完成一个档位就发布一次结果
+- 时间预算或限流紧张时可以只扫描高优先级档位，其余股票沿用上一次结果
+
+档位:
+    0  上次处于信号区（超买/超卖/接近），刚出现金叉/死叉，或 WT1 距离阈值 ≤ HOT_DISTANCE
+    1  WT1 距离阈值 ≤ WARM_DISTANCE，或上次没有结果
+    2  其余
+"""
+
+import json
+import os
+import time
+
+import scanner
+
+HOT_DISTANCE = 10
+WARM_DISTANCE = 25
+APPROACH_LEVEL = 53
+NUM_TIERS = 3
+
+def load_previous(output_dir="data"):
+    """上一次扫描结果 {symbol: result}；没有时返回空字典"""
+    try:
+        with open(os.path.join(output_dir, "latest_scan.json")) as f:
+            scan = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {r['symbol']: r for r in scan['all']}
+
+def threshold_distance(wt1, ob_level=60, os_level=-60):
+    """WT1 到最近一个分类边界的距离"""
+    return min(abs(wt1 - b) for b in (os_level, -APPROACH_LEVEL, APPROACH_LEVEL, ob_level))
+
+def priority_key(prev, ob_level=60, os_level=-60):
+    """(档位, 档内排序值)，越小越优先"""
+    if prev is None:
+        return 1, 0.0
+    dist = threshold_distance(prev['wt1'], ob_level, os_level)
+    if prev.get('signal_type', 'neutral') != 'neutral' or prev.get('cross') or dist <= HOT_DISTANCE:
+        return 0, dist
+    if dist <= WARM_DISTANCE:
+        return 1, dist
+    return 2, dist
+
+def prioritize(symbols, previous, ob_level=60, os_level=-60):
+    """按优先级把股票池分成 NUM_TIERS 个档位（档内按距离升序，相同时保持原顺序）"""
+    tiers = [[] for _ in range(NUM_TIERS)]
+    keyed = [(priority_key(previous.get(s), ob_level, os_level), i, s) for i, s in enumerate(symbols)]
+    for (tier, _), _, symbol in sorted(keyed):
+        tiers[tier].append(symbol)
+    return tiers
+
+def publish_view(results, scanned, previous, symbols):
+    """
+    本次已刷新的结果 + 未刷新股票的上次结果
+    stale 字段列出沿用上次结果的股票
+    """
+    fresh = {r['symbol']: r for r in results}
+    rows, stale = [], []
+    for symbol in symbols:
+        if symbol in fresh:
+            rows.append(fresh[symbol])
+        elif symbol not in scanned and symbol in previous:
+            rows.append(previous[symbol])
+            stale.append(symbol)
+    view = scanner.classify_results(rows)
+    view['stale'] = stale
+    return view
+
+def scan_prioritized(symbols, previous=None, min_market_cap=10e9, ob_level=60, os_level=-60,
+                     dtype=None, cache=None, on_tier_complete=None, time_budget=None,
+                     stop_after_tier=None):
+    """
+    按优先级扫描
+    on_tier_complete(tier, view): 每个档位完成后调用，view 为 publish_view 的结果
+    time_budget: 秒；超时后不再开始新的股票（档位 0 总是扫完）
+    stop_after_tier: 扫完该档位后停止
+    返回 (view, complete)
+    """
+    previous = previous or {}
+    tiers = prioritize(symbols, previous, ob_level, os_level)
+    started = time.monotonic()
+    results = []
+    scanned = set()
+    total = len(symbols)
+    out_of_time = False
+
+    for tier, tier_symbols in enumerate(tiers):
+        for symbol in tier_symbols:
+            if time_budget is not None and tier > 0 and time.monotonic() - started > time_budget:
+                out_of_time = True
+                break
+            print(f"\r  扫描进度: {len(scanned)+1}/{total} (档位 {tier}) - {symbol}    ", end="", flush=True)
+            result = scanner.scan_symbol(symbol, min_market_cap, ob_level, os_level, dtype, cache=cache)
+            scanned.add(symbol)
+            if result is not None:
+                results.append(result)
+
+        if tier_symbols and on_tier_complete:
+            on_tier_complete(tier, publish_view(results, scanned, previous, symbols))
+        if out_of_time or (stop_after_tier is not None and tier >= stop_after_tier):
+            break
+
+    complete = len(scanned) == total
+    print(f"\r  扫描完成! 已刷新 {len(scanned)}/{total} 只                    ")
+    return publish_view(results, scanned, previous, symbols), complete
+
+def run(symbols, output_dir="data", dtype=None, cache=None, time_budget=None, stop_after_tier=None):
+    """
+    命令行入口：读取上次结果，逐档发布 latest_scan.json
+    完整扫描时正常保存（含归档）；提前停止时只更新 latest_scan.json
+    """
+    previous = load_previous(output_dir)
+    tiers = prioritize(symbols, previous)
+    print(f"\n🎯 优先级档位: " + " | ".join(f"档位{t}: {len(s)} 只" for t, s in enumerate(tiers)))
+
+    def publish(tier, view):
+        scanner.write_latest(view, output_dir)
+        print(f"\n  📤 档位 {tier} 已发布（沿用上次结果 {len(view['stale'])} 只）")
+
+    view, complete = scan_prioritized(symbols, previous, dtype=dtype, cache=cache,
+                                      on_tier_complete=publish, time_budget=time_budget,
+                                      stop_after_tier=stop_after_tier)
+    scanner.print_report(view)
+    if complete:
+        view.pop('stale')
+        scanner.save_results(view, output_dir)
+    else:
+        scanner.write_latest(view, output_dir)
+        print(f"\n⏸️ 提前停止: {len(view['stale'])} 只沿用上次结果，本次不归档")
+    return view
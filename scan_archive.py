@@ -0,0 +1,170 @@
+"""
+扫描结果列式归档（Parquet，按日期分区，只追加）
+- 替代每天一个带缩进的 scan_YYYYMMDD.json
+- 目录结构: data/archive/date=YYYY-MM-DD/part-HHMMSS-<uuid>.parquet
+  （scan_time 只精确到秒，同一秒内的两次扫描靠 uuid 区分，不会互相覆盖）
+- 行按 symbol 排序写入，按股票查询时可利用行组统计跳过无关数据；
+  按日期查询时只读取对应分区
+- latest_scan.json 仍由 scanner.save_results 写出，作为兼容视图
+
+用法:
+    python scan_archive.py history AAPL --start 2025-01-01
+    python scan_archive.py import-json data        # 导入旧的 scan_*.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import uuid
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from lazy_result import snapshot
+
+ARCHIVE_DIR = os.path.join("data", "archive")
+ARCHIVE_VERSION = 1
+
+# 归档列。低基数字符串使用字典编码
+SCAN_SCHEMA = pa.schema([
+    ('scan_time', pa.string()),
+    ('symbol', pa.string()),
+    ('signal_type', pa.dictionary(pa.int8(), pa.string())),
+    ('price', pa.float32()),
+    ('price_change', pa.float32()),
+    ('wt1', pa.float32()),
+    ('wt2', pa.float32()),
+    ('wt_direction', pa.dictionary(pa.int8(), pa.string())),
+    ('cross', pa.dictionary(pa.int8(), pa.string())),
+    ('rsi', pa.float32()),
+    ('vol_ratio', pa.float32()),
+    ('bullish_div', pa.bool_()),
+    ('bearish_div', pa.bool_()),
+    ('div_details', pa.string()),
+    ('market_cap', pa.int64()),
+    ('score', pa.int8()),
+    ('grade', pa.dictionary(pa.int8(), pa.string())),
+    ('score_details', pa.string()),
+    ('bullish_conf', pa.float32()),
+    ('bearish_conf', pa.float32()),
+    ('div_configs', pa.string()),
+    ('deferred', pa.list_(pa.dictionary(pa.int8(), pa.string()))),
+    ('deferred_as_of', pa.string()),
+], metadata={b'archive_version': str(ARCHIVE_VERSION).encode()})
+
+PARTITIONING = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+
+# ============================================================================
+# 1. 写入
+# ============================================================================
+
+def results_to_table(results, scan_time):
+    """单股结果列表 -> Arrow Table（缺失字段和未计算的延迟字段写为 null，后者记录在 deferred 列）"""
+    rows = sorted((snapshot(r) for r in results), key=lambda r: r['symbol'])
+    columns = {}
+    for field in SCAN_SCHEMA:
+        if field.name == 'scan_time':
+            columns[field.name] = [scan_time] * len(rows)
+        else:
+            columns[field.name] = [r.get(field.name) for r in rows]
+    return pa.Table.from_pydict(columns, schema=SCAN_SCHEMA)
+
+def append_scan(scan_results, archive_dir=ARCHIVE_DIR):
+    """把一次扫描的全部结果追加为按日期分区的 Parquet 文件"""
+    scan_time = scan_results['scan_time']
+    ts = datetime.strptime(scan_time, '%Y-%m-%d %H:%M:%S')
+    partition = os.path.join(archive_dir, f"date={ts:%Y-%m-%d}")
+    os.makedirs(partition, exist_ok=True)
+
+    table = results_to_table(scan_results['all'], scan_time)
+    filepath = os.path.join(partition, f"part-{ts:%H%M%S}-{uuid.uuid4().hex[:12]}.parquet")
+    tmp_path = filepath + ".tmp"
+    pq.write_table(table, tmp_path, compression='zstd', row_group_size=1024)
+    os.replace(tmp_path, filepath)
+    return filepath
+
+# ============================================================================
+# 2. 查询
+# ============================================================================
+
+def _dataset(archive_dir=ARCHIVE_DIR):
+    # 显式 schema: 较早的分区缺少后来新增的列时读为 null
+    schema = pa.unify_schemas([SCAN_SCHEMA, PARTITIONING.schema])
+    return ds.dataset(archive_dir, format='parquet', partitioning=PARTITIONING, schema=schema,
+                      exclude_invalid_files=True)
+
+def _date_filter(start=None, end=None):
+    expr = None
+    # 分区值是 YYYY-MM-DD 字符串，字典序即日期序
+    if start is not None:
+        expr = ds.field('date') >= pd.Timestamp(start).strftime('%Y-%m-%d')
+    if end is not None:
+        cond = ds.field('date') <= pd.Timestamp(end).strftime('%Y-%m-%d')
+        expr = cond if expr is None else expr & cond
+    return expr
+
+def read_scans(start=None, end=None, symbols=None, columns=None, archive_dir=ARCHIVE_DIR):
+    """
+    读取归档（DataFrame）
+    start/end 过滤只读取对应日期分区；symbols 过滤利用行组统计
+    """
+    if not os.path.isdir(archive_dir):
+        return pd.DataFrame(columns=['date'] + (columns or SCAN_SCHEMA.names))
+
+    expr = _date_filter(start, end)
+    if symbols is not None:
+        cond = ds.field('symbol').isin(list(symbols))
+        expr = cond if expr is None else expr & cond
+
+    if columns is not None:
+        columns = ['date'] + [c for c in columns if c != 'date']
+    table = _dataset(archive_dir).to_table(columns=columns, filter=expr)
+    df = table.to_pandas()
+    sort_cols = [c for c in ('scan_time', 'symbol') if c in df.columns]
+    return df.sort_values(sort_cols).reset_index(drop=True) if sort_cols else df
+
+def read_symbol_history(symbol, start=None, end=None, columns=None, archive_dir=ARCHIVE_DIR):
+    """单只股票的信号历史（按扫描时间排序）"""
+    return read_scans(start, end, [symbol], columns, archive_dir)
+
+# ============================================================================
+# 3. 迁移
+# ============================================================================
+
+def import_json_history(data_dir="data", archive_dir=ARCHIVE_DIR):
+    """把旧的 scan_YYYYMMDD.json 导入归档，返回导入的文件数"""
+    count = 0
+    for path in sorted(glob.glob(os.path.join(data_dir, "scan_*.json"))):
+        with open(path) as f:
+            scan_results = json.load(f)
+        append_scan(scan_results, archive_dir)
+        count += 1
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="扫描结果归档")
+    sub = parser.add_subparsers(dest="command", required=True)
+    history = sub.add_parser("history", help="查询单只股票的信号历史")
+    history.add_argument("symbol")
+    history.add_argument("--start")
+    history.add_argument("--end")
+    importer = sub.add_parser("import-json", help="导入旧的 scan_*.json")
+    importer.add_argument("data_dir", nargs="?", default="data")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "history":
+        df = read_symbol_history(args.symbol.upper(), args.start, args.end,
+                                 ['scan_time', 'signal_type', 'price', 'wt1', 'rsi', 'score', 'grade', 'cross'],
+                                 args.archive_dir)
+        print(df.to_string(index=False) if len(df) else "没有记录")
+    else:
+        count = import_json_history(args.data_dir, args.archive_dir)
+        print(f"✅ 已导入 {count} 个扫描文件")
+
+if __name__ == "__main__":
+    main()
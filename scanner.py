@@ -7,82 +7,31 @@ WaveTrend 日线筛选报警系统 V2.0
 - 综合评分系统
 """
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime
+import argparse
 import json
 import os
+import time
+
+import data_provider
+import divergence
+import ingest
+import lookback_planner
+import metrics
+import scan_archive
+import screens
+import universe
+from bar_cache import BarCache
+from lazy_result import DEFERRED_AS_OF_KEY, LazyResult, from_snapshot, snapshot_scan
 
 # ============================================================================
 # 1. 股票池
 # ============================================================================
 
-# 纳斯达克100
-NASDAQ_100 = [
-    "AAPL", "MSFT", "AMZN", "NVDA", "GOOGL", "META", "GOOG", "TSLA", "AVGO", "COST",
-    "PEP", "CSCO", "NFLX", "AMD", "ADBE", "TMUS", "CMCSA", "INTC", "INTU", "QCOM",
-    "TXN", "AMGN", "HON", "AMAT", "BKNG", "ISRG", "SBUX", "VRTX", "LRCX", "GILD",
-    "ADI", "ADP", "MDLZ", "REGN", "PANW", "MU", "KLAC", "SNPS", "CDNS", "MELI",
-    "PYPL", "ASML", "MAR", "CRWD", "CTAS", "ORLY", "MRVL", "ABNB", "NXPI", "FTNT",
-    "WDAY", "CSX", "PCAR", "MNST", "ADSK", "DXCM", "AEP", "CPRT", "ODFL", "PAYX",
-    "AZN", "KDP", "CHTR", "ROST", "KHC", "EXC", "LULU", "IDXX", "VRSK", "MCHP",
-    "FAST", "EA", "XEL", "CTSH", "GEHC", "CSGP", "BKR", "FANG", "ON", "DDOG",
-    "ANSS", "BIIB", "TEAM", "ZS", "ILMN", "WBD", "ALGN", "MRNA", "DLTR", "ENPH",
-    "SIRI", "CEG", "TTWO", "GFS", "LCID", "RIVN", "WBA", "JD", "PDD", "BIDU"
-]
-
-# 标普500 (不含纳斯达克100重复的)
-SP500_EXTRA = [
-    # 金融
-    "JPM", "BAC", "WFC", "GS", "MS", "C", "BLK", "SCHW", "AXP", "USB",
-    "PNC", "TFC", "COF", "BK", "STT", "AIG", "MET", "PRU", "ALL", "TRV",
-    "AFL", "CB", "CME", "ICE", "MCO", "SPGI", "MMC", "AON", "MSCI",
-    # 医疗
-    "UNH", "JNJ", "PFE", "LLY", "ABBV", "MRK", "TMO", "ABT", "DHR", "BMY",
-    "AMGN", "CVS", "ELV", "CI", "HCA", "HUM", "MCK", "CAH", "ZTS", "SYK",
-    "BSX", "MDT", "EW", "DXCM", "IDXX", "IQV", "A", "BIO", "TECH",
-    # 消费
-    "WMT", "HD", "MCD", "NKE", "LOW", "TGT", "SBUX", "TJX", "ORLY", "AZO",
-    "ROST", "DG", "DLTR", "CMG", "YUM", "DPZ", "EBAY", "ETSY", "BBY",
-    "KMB", "CL", "PG", "KO", "MO", "PM", "EL", "CLX", "CHD", "SJM",
-    # 工业
-    "CAT", "BA", "HON", "UPS", "RTX", "DE", "LMT", "GE", "MMM", "EMR",
-    "ITW", "PH", "ROK", "ETN", "PCAR", "CMI", "WM", "RSG", "FDX", "NSC",
-    "UNP", "CSX", "DAL", "UAL", "LUV", "AAL",
-    # 能源
-    "XOM", "CVX", "COP", "SLB", "EOG", "MPC", "PSX", "VLO", "OXY", "PXD",
-    "DVN", "HES", "HAL", "KMI", "WMB", "OKE",
-    # 通信/媒体
-    "DIS", "CMCSA", "T", "VZ", "CHTR", "NFLX", "PARA", "FOX", "FOXA",
-    "OMC", "IPG",
-    # 公用事业
-    "NEE", "DUK", "SO", "D", "AEP", "EXC", "SRE", "XEL", "PEG", "ED",
-    "WEC", "ES", "AWK",
-    # 材料
-    "LIN", "APD", "SHW", "ECL", "DD", "NEM", "FCX", "NUE", "VMC", "MLM",
-    # 房地产
-    "AMT", "PLD", "CCI", "EQIX", "PSA", "SPG", "O", "WELL", "DLR", "AVB",
-    "EQR", "VTR", "ARE", "MAA", "UDR",
-    # 其他大盘
-    "BRK-B", "V", "MA", "ACN", "CRM", "ORCL", "IBM", "NOW", "UBER", "ABNB",
-    "SQ", "SHOP", "SNOW", "DDOG", "NET", "ZM", "DOCU", "OKTA", "TWLO"
-]
-
-# 高波动/主题股票
-EXTRA_WATCHLIST = [
-    # 加密相关
-    "MSTR", "COIN", "HOOD", "MARA", "RIOT", "CLSK",
-    # 量子计算
-    "IONQ", "RGTI", "QUBT",
-    # AI/成长
-    "PLTR", "SOFI", "RKLB", "PATH", "AI",
-    # 中概股
-    "BABA", "NIO", "XPEV", "LI"
-]
-
-# 合并所有股票池
-ALL_STOCKS = list(set(NASDAQ_100 + SP500_EXTRA + EXTRA_WATCHLIST))
+# 股票池定义、文件加载和分片见 universe.py
+ALL_STOCKS = universe.ALL_STOCKS
 
 # ============================================================================
 # 2. 技术指标计算
@@ -220,7 +169,7 @@ def calc_reversal_score(result, is_oversold=True):
     - WT1 超卖 (≤-60): +1
     - WT1 金叉: +2
     - WT1 拐头向上: +1
-    - 看涨背离: +2
+    - 看涨背离: +2（默认参数未触发、多参数置信度 ≥ divergence.CONFIDENCE_MIN 时 +1）
     - RSI 超卖 (<30): +1
     - 成交量萎缩 (<0.8): +1 (卖压衰竭)
     - 成交量放大 (>1.5) + 上涨: +1 (买方进场)
@@ -252,6 +201,9 @@ def calc_reversal_score(result, is_oversold=True):
         if result.get('bullish_div'):
             score += 2
             details.append("底背离+2")
+        elif result.get('bullish_conf', 0) >= divergence.CONFIDENCE_MIN:
+            score += 1
+            details.append("多参数底背离+1")
         
         # 5. RSI 超卖
         if result.get('rsi', 50) < 30:
@@ -291,6 +243,9 @@ def calc_reversal_score(result, is_oversold=True):
         if result.get('bearish_div'):
             score += 2
             details.append("顶背离+2")
+        elif result.get('bearish_conf', 0) >= divergence.CONFIDENCE_MIN:
+            score += 1
+            details.append("多参数顶背离+1")
         
         # 5. RSI 超买
         if result.get('rsi', 50) > 70:
@@ -325,147 +280,318 @@ def get_score_grade(score):
 # 6. 获取股票数据
 # ============================================================================
 
-def get_stock_data(symbol, period="3mo"):
-    """获取股票日线数据和基本信息"""
+# K线数由指标参数推导（见 lookback_planner.py）
+# REQUIRED_BARS: 每次扫描使用的K线数，WT1 预热误差 < 0.05
+# MIN_BARS: 少于该数量（新上市等）WT1 误差可能超过 1，不参与扫描
+REQUIRED_BARS = lookback_planner.REQUIRED_BARS
+MIN_BARS = lookback_planner.MIN_BARS
+
+# WT1 距离接近区（±53）超过该值的中性股票，RSI/成交量/背离等字段延迟计算
+LAZY_MARGIN = 5
+
+def get_stock_data(symbol, period=None, cache=None):
+    """
+    获取股票日线数据和基本信息
+    period: 给定时按 yfinance period 获取；默认只获取 REQUIRED_BARS 根，
+            有缓存时只请求缓存之后缺少的K线
+    cache: BarCache，给定时把获取到的数据写入本地缓存（供历史扫描使用）
+    """
     try:
-        ticker = yf.Ticker(symbol)
-        df = ticker.history(period=period)
+        ticker = data_provider.Ticker(symbol)
+        if period is not None:
+            df = ingest.compact_ohlcv(ticker.history(period=period))
+        else:
+            df = lookback_planner.fetch_history(ticker, symbol, cache, REQUIRED_BARS)
         
-        if len(df) < 50:
+        if len(df) < MIN_BARS:
             return None, None
         
         info = ticker.info
         market_cap = info.get('marketCap', 0)
         
+        if cache is not None:
+            cache.save(symbol, df, market_cap)
+        
         return df, market_cap
     except Exception as e:
         print(f"  ⚠️ 获取 {symbol} 数据失败: {e}")
         return None, None
 
-# ============================================================================
-# 7. 扫描函数
-# ============================================================================
+def signal_zones(df, ob_level=60, os_level=-60):
+    """
+    逐根 K 线计算所有会影响信号/评分的离散状态（精度验证用）
+    返回 {名称: 整数数组}，以及 WT1 序列
+    """
+    wt1, wt2 = calc_wavetrend(df)
+    rsi = calc_rsi(df).to_numpy(dtype=np.float64)
+    vol_ratio = calc_volume_ratio(df).to_numpy(dtype=np.float64)
+    w1 = wt1.to_numpy(dtype=np.float64)
+    w2 = wt2.to_numpy(dtype=np.float64)
+    p1 = np.roll(w1, 1)
+    p2 = np.roll(w2, 1)
+    
+    zones = {
+        'signal': np.select([w1 <= os_level, w1 >= ob_level, w1 <= -53, w1 >= 53], [1, 2, 3, 4], 0),
+        'cross': np.select([(w1 > w2) & (p1 <= p2), (w1 < w2) & (p1 >= p2)], [1, 2], 0),
+        'direction': np.select([w1 > p1, w1 < p1], [1, -1], 0),
+        'rsi': np.select([rsi < 30, rsi > 70], [1, 2], 0),
+        # 成交量有多个分界点（状态标签 0.7/1.5/2.0，评分 0.8/1.5），逐个比较后按位组合
+        'volume': ((vol_ratio >= 2.0) * 1 | (vol_ratio >= 1.5) * 2 | (vol_ratio > 1.5) * 4
+                   | (vol_ratio < 0.7) * 8 | (vol_ratio < 0.8) * 16),
+    }
+    # 第一根没有前值
+    for name in ('cross', 'direction'):
+        zones[name][0] = 0
+    return zones, w1
 
-def scan_stocks(symbols, min_market_cap=10e9, ob_level=60, os_level=-60):
+def check_precision(df, dtype='float32', ob_level=60, os_level=-60):
     """
-    扫描股票池
+    精度验证：原始 float64 数据 vs 紧凑存储 + dtype 计算
+    返回 {状态名: 不一致的K线数, 'max_wt1_diff': WT1 最大绝对误差}
     """
-    results = []
-    total = len(symbols)
+    ref_zones, ref_wt1 = signal_zones(df.astype(np.float64), ob_level, os_level)
+    test_df = ingest.to_compute_dtype(ingest.compact_ohlcv(df), dtype)
+    test_zones, test_wt1 = signal_zones(test_df, ob_level, os_level)
     
+    report = {name: int((ref_zones[name] != test_zones[name]).sum()) for name in ref_zones}
+    report['max_wt1_diff'] = float(np.nanmax(np.abs(ref_wt1 - test_wt1)))
+    return report
+
+def check_precision_universe(symbols, dtype='float32', period="1y"):
+    """对股票池逐只做精度验证，打印不一致的股票"""
+    totals = {}
+    max_diff = 0.0
+    checked = 0
     for i, symbol in enumerate(symbols):
-        print(f"\r  扫描进度: {i+1}/{total} - {symbol}    ", end="", flush=True)
-        
-        df, market_cap = get_stock_data(symbol)
-        
-        if df is None:
-            continue
-        
-        # 市值筛选
-        if market_cap and market_cap < min_market_cap:
+        print(f"\r  验证进度: {i+1}/{len(symbols)} - {symbol}    ", end="", flush=True)
+        try:
+            df = data_provider.Ticker(symbol).history(period=period)
+        except Exception as e:
+            print(f"  ⚠️ 获取 {symbol} 数据失败: {e}")
             continue
-        
-        # 计算指标
-        wt1, wt2 = calc_wavetrend(df)
-        rsi = calc_rsi(df)
-        vol_ratio = calc_volume_ratio(df)
-        
-        if wt1.isna().iloc[-1]:
+        if len(df) < 50:
             continue
-        
-        # 当前值
-        current_wt1 = wt1.iloc[-1]
-        current_wt2 = wt2.iloc[-1]
-        prev_wt1 = wt1.iloc[-2] if len(wt1) > 1 else current_wt1
-        prev_wt2 = wt2.iloc[-2] if len(wt2) > 1 else current_wt2
-        current_price = df['Close'].iloc[-1]
-        prev_price = df['Close'].iloc[-2] if len(df) > 1 else current_price
-        price_change = (current_price / prev_price - 1) * 100
-        current_rsi = rsi.iloc[-1]
-        current_vol_ratio = vol_ratio.iloc[-1]
-        
-        # 金叉/死叉
-        cross = ""
-        if current_wt1 > current_wt2 and prev_wt1 <= prev_wt2:
-            cross = "🔼 金叉"
-        elif current_wt1 < current_wt2 and prev_wt1 >= prev_wt2:
-            cross = "🔽 死叉"
-        
-        # WT1 方向
-        wt_direction = "↑" if current_wt1 > prev_wt1 else "↓" if current_wt1 < prev_wt1 else "→"
-        
-        # 背离检测
-        bullish_div, bearish_div, div_details = detect_divergence(df, wt1)
-        
-        # 成交量状态
-        if current_vol_ratio >= 2.0:
-            vol_status = "🔥 暴量"
-        elif current_vol_ratio >= 1.5:
-            vol_status = "📈 放量"
-        elif current_vol_ratio < 0.7:
-            vol_status = "📉 缩量"
-        else:
-            vol_status = "正常"
-        
-        # RSI 状态
-        if current_rsi < 30:
-            rsi_status = "🟢 超卖"
-        elif current_rsi > 70:
-            rsi_status = "🔴 超买"
-        else:
-            rsi_status = "中性"
-        
-        # 构建结果
-        result = {
-            'symbol': symbol,
-            'price': round(current_price, 2),
-            'price_change': round(price_change, 2),
-            'wt1': round(current_wt1, 2),
-            'wt2': round(current_wt2, 2),
-            'wt_direction': wt_direction,
-            'cross': cross,
-            'rsi': round(current_rsi, 1),
-            'rsi_status': rsi_status,
-            'vol_ratio': round(current_vol_ratio, 2),
-            'vol_status': vol_status,
-            'bullish_div': bullish_div,
-            'bearish_div': bearish_div,
-            'div_details': div_details,
+        report = check_precision(df, dtype)
+        checked += 1
+        max_diff = max(max_diff, report.pop('max_wt1_diff'))
+        mismatches = {k: v for k, v in report.items() if v}
+        if mismatches:
+            print(f"\n  ❌ {symbol}: {mismatches}")
+        for k, v in report.items():
+            totals[k] = totals.get(k, 0) + v
+    
+    print(f"\r  验证完成: {checked} 只股票, {dtype} vs float64                ")
+    print(f"  WT1 最大绝对误差: {max_diff:.6f}")
+    print(f"  不一致K线数: {totals}")
+    return totals, max_diff
+
+# ============================================================================
+# 7. 扫描函数
+# ============================================================================
+
+# 延迟计算的字段（两组，各由一个函数一次算完）
+INDICATOR_FIELDS = ('rsi', 'rsi_status', 'vol_ratio', 'vol_status')
+DIVERGENCE_FIELDS = ('bullish_div', 'bearish_div', 'div_details', 'bullish_conf', 'bearish_conf', 'div_configs')
+
+def indicator_fields(df):
+    """RSI 和成交量"""
+    current_rsi = float(calc_rsi(df).iloc[-1])
+    current_vol_ratio = float(calc_volume_ratio(df).iloc[-1])
+    
+    # 成交量状态
+    if current_vol_ratio >= 2.0:
+        vol_status = "🔥 暴量"
+    elif current_vol_ratio >= 1.5:
+        vol_status = "📈 放量"
+    elif current_vol_ratio < 0.7:
+        vol_status = "📉 缩量"
+    else:
+        vol_status = "正常"
+    
+    # RSI 状态
+    if current_rsi < 30:
+        rsi_status = "🟢 超卖"
+    elif current_rsi > 70:
+        rsi_status = "🔴 超买"
+    else:
+        rsi_status = "中性"
+    
+    return {
+        'rsi': round(current_rsi, 1),
+        'rsi_status': rsi_status,
+        'vol_ratio': round(current_vol_ratio, 2),
+        'vol_status': vol_status,
+    }
+
+def divergence_fields(df, wt1):
+    """背离检测（默认参数与 detect_divergence 相同，另含多参数置信度）"""
+    return divergence.latest_divergence(df, wt1)
+
+def cached_loaders(symbol, cache, as_of, bars=REQUIRED_BARS, dtype=None):
+    """
+    延迟字段的计算函数: 从日线缓存重新读取 as_of（含）之前的 bars 根K线再计算，不持有 DataFrame
+    扫描时K线已写入缓存，读出的数据与扫描时相同；缓存中没有数据时字段为 None
+    """
+    def frame():
+        if as_of is None:
+            return None
+        df, _ = cache.load_as_of(symbol, as_of, bars=bars)
+        return None if df is None or not len(df) else ingest.to_compute_dtype(df, dtype)
+    
+    def indicators():
+        df = frame()
+        return dict.fromkeys(INDICATOR_FIELDS) if df is None else indicator_fields(df)
+    
+    def divergences():
+        df = frame()
+        return dict.fromkeys(DIVERGENCE_FIELDS) if df is None else divergence_fields(df, calc_wavetrend(df)[0])
+    
+    loaders = dict.fromkeys(INDICATOR_FIELDS, indicators)
+    loaders.update(dict.fromkeys(DIVERGENCE_FIELDS, divergences))
+    return loaders
+
+def restore_deferred(row, cache=None, dtype=None):
+    """
+    读取 latest_scan.json / 分片结果时，把写为 null 的延迟字段还原为按需计算（从日线缓存重算）
+    没有延迟字段的行原样返回
+    """
+    def make_loaders(row, fields):
+        return cached_loaders(row['symbol'], cache or BarCache(), row.get(DEFERRED_AS_OF_KEY), dtype=dtype)
+    return from_snapshot(row, make_loaders)
+
+def scan_symbol(symbol, min_market_cap=10e9, ob_level=60, os_level=-60, dtype=None,
+                as_of=None, cache=None, series_out=None):
+    """
+    扫描单只股票
+    dtype: 指标计算精度，默认取 ingest.COMPUTE_DTYPE
+    as_of: 历史日期，给定时完全从本地缓存读取并截断到该日，不请求网络
+    cache: BarCache；在线扫描时写入，历史扫描时读取
+    series_out: dict，给定时写入 {symbol: 指标序列 DataFrame}（供 Arrow 导出）
+    返回结果字典；数据不足或市值不达标时返回 None
+    """
+    if as_of is not None:
+        df, market_cap = (cache or BarCache()).load_as_of(symbol, as_of, bars=REQUIRED_BARS)
+        if df is not None and len(df) < MIN_BARS:
+            df = None
+    else:
+        with metrics.STAGE_SECONDS.time(stage='fetch'):
+            df, market_cap = get_stock_data(symbol, cache=cache)
+    
+    if df is None:
+        metrics.SYMBOLS.inc(outcome='failed')
+        return None
+    
+    # 市值筛选
+    if market_cap and market_cap < min_market_cap:
+        metrics.SYMBOLS.inc(outcome='filtered')
+        return None
+    
+    metrics.SYMBOLS.inc(outcome='fetched')
+    with metrics.STAGE_SECONDS.time(stage='evaluate'):
+        return evaluate_symbol(symbol, df, market_cap, ob_level, os_level, dtype, series_out, cache)
+
+def evaluate_symbol(symbol, df, market_cap, ob_level=60, os_level=-60, dtype=None, series_out=None,
+                    cache=None):
+    """
+    由已获取的K线计算单只股票的扫描结果（不请求网络）
+    cache: 日线缓存（已包含 df），给定时延迟字段从缓存重新读取K线计算，结果不持有 df
+    WT1 为 NaN 时返回 None
+    """
+    # 先只计算 WT，用于分级
+    df = ingest.to_compute_dtype(df, dtype)
+    wt1, wt2 = calc_wavetrend(df)
+    
+    if wt1.isna().iloc[-1]:
+        return None
+    
+    # 当前值（转为 Python float，float32 计算时也能直接写入 JSON）
+    current_wt1 = float(wt1.iloc[-1])
+    current_wt2 = float(wt2.iloc[-1])
+    prev_wt1 = float(wt1.iloc[-2]) if len(wt1) > 1 else current_wt1
+    prev_wt2 = float(wt2.iloc[-2]) if len(wt2) > 1 else current_wt2
+    current_price = float(df['Close'].iloc[-1])
+    prev_price = float(df['Close'].iloc[-2]) if len(df) > 1 else current_price
+    price_change = (current_price / prev_price - 1) * 100
+    
+    # 金叉/死叉
+    cross = ""
+    if current_wt1 > current_wt2 and prev_wt1 <= prev_wt2:
+        cross = "🔼 金叉"
+    elif current_wt1 < current_wt2 and prev_wt1 >= prev_wt2:
+        cross = "🔽 死叉"
+    
+    # WT1 方向
+    wt_direction = "↑" if current_wt1 > prev_wt1 else "↓" if current_wt1 < prev_wt1 else "→"
+    
+    if series_out is not None:
+        series_out[symbol] = pd.DataFrame({'wt1': wt1, 'wt2': wt2, 'rsi': calc_rsi(df),
+                                           'vol_ratio': calc_volume_ratio(df)})
+    
+    # 构建结果
+    result = {
+        'symbol': symbol,
+        'price': round(current_price, 2),
+        'price_change': round(price_change, 2),
+        'wt1': round(current_wt1, 2),
+        'wt2': round(current_wt2, 2),
+        'wt_direction': wt_direction,
+        'cross': cross,
+    }
+    
+    # 远离信号区的中性股票：评分恒为 0，RSI/成交量/背离等字段按需计算
+    if os_level < current_wt1 < ob_level and abs(current_wt1) < 53 - LAZY_MARGIN:
+        result.update({
             'market_cap': market_cap,
             'market_cap_b': round(market_cap / 1e9, 1) if market_cap else 0,
-        }
-        
-        # 分类和评分
-        if current_wt1 <= os_level:
-            result['signal'] = '🟢 超卖'
-            result['signal_type'] = 'oversold'
-            score, score_details = calc_reversal_score(result, is_oversold=True)
-        elif current_wt1 >= ob_level:
-            result['signal'] = '🔴 超买'
-            result['signal_type'] = 'overbought'
-            score, score_details = calc_reversal_score(result, is_oversold=False)
-        elif current_wt1 <= -53:
-            result['signal'] = '🟡 接近超卖'
-            result['signal_type'] = 'approaching_os'
-            score, score_details = calc_reversal_score(result, is_oversold=True)
-        elif current_wt1 >= 53:
-            result['signal'] = '🟡 接近超买'
-            result['signal_type'] = 'approaching_ob'
-            score, score_details = calc_reversal_score(result, is_oversold=False)
+            'signal': '⚪ 中性',
+            'signal_type': 'neutral',
+            'score': 0,
+            'score_details': '',
+        })
+        result['grade'], result['stars'] = get_score_grade(0)
+        as_of = df.index[-1].strftime('%Y-%m-%d')
+        if cache is not None:
+            loaders = cached_loaders(symbol, cache, as_of, len(df), dtype)
         else:
-            result['signal'] = '⚪ 中性'
-            result['signal_type'] = 'neutral'
-            score, score_details = 0, []
-        
-        result['score'] = score
-        result['score_details'] = ', '.join(score_details)
-        result['grade'], result['stars'] = get_score_grade(score)
-        
-        results.append(result)
+            loaders = dict.fromkeys(INDICATOR_FIELDS, lambda: indicator_fields(df))
+            loaders.update(dict.fromkeys(DIVERGENCE_FIELDS, lambda: divergence_fields(df, wt1)))
+        return LazyResult(result, loaders, as_of)
+    
+    result.update(indicator_fields(df))
+    result.update(divergence_fields(df, wt1))
+    result['market_cap'] = market_cap
+    result['market_cap_b'] = round(market_cap / 1e9, 1) if market_cap else 0
+    
+    # 分类和评分
+    if current_wt1 <= os_level:
+        result['signal'] = '🟢 超卖'
+        result['signal_type'] = 'oversold'
+        score, score_details = calc_reversal_score(result, is_oversold=True)
+    elif current_wt1 >= ob_level:
+        result['signal'] = '🔴 超买'
+        result['signal_type'] = 'overbought'
+        score, score_details = calc_reversal_score(result, is_oversold=False)
+    elif current_wt1 <= -53:
+        result['signal'] = '🟡 接近超卖'
+        result['signal_type'] = 'approaching_os'
+        score, score_details = calc_reversal_score(result, is_oversold=True)
+    elif current_wt1 >= 53:
+        result['signal'] = '🟡 接近超买'
+        result['signal_type'] = 'approaching_ob'
+        score, score_details = calc_reversal_score(result, is_oversold=False)
+    else:
+        result['signal'] = '⚪ 中性'
+        result['signal_type'] = 'neutral'
+        score, score_details = 0, []
     
-    print("\r  扫描完成!                              ")
+    result['score'] = score
+    result['score_details'] = ', '.join(score_details)
+    result['grade'], result['stars'] = get_score_grade(score)
     
-    # 分类结果
+    return result
+
+def classify_results(results, scan_time=None):
+    """把单股结果列表整理成标准扫描结果结构（latest_scan.json 格式）"""
     oversold = sorted([r for r in results if r['signal_type'] == 'oversold'], key=lambda x: x['score'], reverse=True)
     overbought = sorted([r for r in results if r['signal_type'] == 'overbought'], key=lambda x: x['score'], reverse=True)
     approaching_os = sorted([r for r in results if r['signal_type'] == 'approaching_os'], key=lambda x: x['score'], reverse=True)
@@ -477,9 +603,64 @@ def scan_stocks(symbols, min_market_cap=10e9, ob_level=60, os_level=-60):
         'overbought': overbought,
         'approaching_os': approaching_os,
         'approaching_ob': approaching_ob,
-        'scan_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        'scan_time': scan_time or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
 
+def scan_stocks(symbols, min_market_cap=10e9, ob_level=60, os_level=-60, dtype=None,
+                as_of=None, cache=None, export_arrow_dir=None):
+    """
+    扫描股票池
+    as_of: 历史日期（如 '2025-03-14'），给定时从本地缓存还原当天收盘后的扫描结果
+    export_arrow_dir: 给定时把结果和指标序列导出为 Arrow IPC 文件（见 arrow_export.py）
+    """
+    results = []
+    total = len(symbols)
+    if as_of is not None:
+        cache = cache or BarCache()
+    series = {} if export_arrow_dir else None
+    
+    for i, symbol in enumerate(symbols):
+        print(f"\r  扫描进度: {i+1}/{total} - {symbol}    ", end="", flush=True)
+        
+        result = scan_symbol(symbol, min_market_cap, ob_level, os_level, dtype, as_of, cache, series)
+        if result is not None:
+            results.append(result)
+    
+    print("\r  扫描完成!                              ")
+    
+    scan_time = pd.Timestamp(as_of).strftime('%Y-%m-%d 16:00:00') if as_of is not None else None
+    scan_results = classify_results(results, scan_time)
+    
+    if export_arrow_dir:
+        import arrow_export
+        # 只导出通过筛选的股票的序列
+        kept = {r['symbol'] for r in results}
+        series = {s: df for s, df in series.items() if s in kept}
+        for path in arrow_export.export_scan(scan_results, series, export_arrow_dir):
+            print(f"  Arrow 导出: {path}")
+    
+    return scan_results
+
+def merge_scan_results(partials, symbols=None):
+    """
+    合并多个分片的扫描结果
+    symbols: 完整股票池顺序，给定时 'all' 按该顺序排列，否则按代码排序
+    scan_time 取各分片中最晚的一个
+    """
+    merged = {}
+    for partial in partials:
+        for r in partial['all']:
+            merged[r['symbol']] = r
+    
+    if symbols is not None:
+        order = {s: i for i, s in enumerate(symbols)}
+        results = sorted(merged.values(), key=lambda r: (order.get(r['symbol'], len(order)), r['symbol']))
+    else:
+        results = sorted(merged.values(), key=lambda r: r['symbol'])
+    
+    scan_time = max((p['scan_time'] for p in partials), default=None)
+    return classify_results(results, scan_time)
+
 # ============================================================================
 # 8. 打印报告
 # ============================================================================
@@ -504,6 +685,8 @@ def print_report(scan_results):
             print(f"{s['score']}/9 {s['stars']:4} | {s['symbol']:8} | ${s['price']:>8.2f} | {s['price_change']:>+6.2f}% | {s['wt1']:>7.2f} | {s['wt_direction']:3} | {s['rsi']:>5.1f} | {s['vol_status']:8} | {div_mark:6} | {s['cross']:8}")
             if s['score_details']:
                 print(f"         └─ {s['score_details']}")
+            if s.get('div_configs'):
+                print(f"         └─ 背离参数: {s['div_configs']}")
     else:
         print("\n🟢 超卖信号: 无")
     
@@ -528,6 +711,8 @@ def print_report(scan_results):
             print(f"{s['score']}/9 {s['stars']:4} | {s['symbol']:8} | ${s['price']:>8.2f} | {s['price_change']:>+6.2f}% | {s['wt1']:>7.2f} | {s['wt_direction']:3} | {s['rsi']:>5.1f} | {s['vol_status']:8} | {div_mark:6} | {s['cross']:8}")
             if s['score_details']:
                 print(f"         └─ {s['score_details']}")
+            if s.get('div_configs'):
+                print(f"         └─ 背离参数: {s['div_configs']}")
     else:
         print("\n🔴 超买信号: 无")
     
@@ -560,58 +745,218 @@ def print_report(scan_results):
     
     # 评分说明
     print("\n📖 评分说明 (满分9分):")
-    print("  +1: WT超买/超卖 | +2: 金叉/死叉 | +1: 拐头 | +2: 背离 | +1: RSI确认 | +1: 成交量确认")
+    print("  +1: WT超买/超卖 | +2: 金叉/死叉 | +1: 拐头 | +2: 背离（仅多参数确认 +1） | +1: RSI确认 | +1: 成交量确认")
     print("  A级(≥5分)⭐⭐⭐: 强反转信号 | B级(3-4分)⭐⭐: 中等信号 | C级(2分)⭐: 弱信号")
+    
+    # 自定义筛选（data/screens.json）
+    screens.print_screen_hits(scan_results['all'])
 
 # ============================================================================
 # 9. 保存结果
 # ============================================================================
 
-def save_results(scan_results, output_dir="data"):
-    """保存扫描结果"""
+def write_latest(scan_results, output_dir="data"):
+    """原子写入 latest_scan.json（紧凑格式），返回路径"""
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
     filepath = os.path.join(output_dir, "latest_scan.json")
-    with open(filepath, 'w') as f:
-        json.dump(scan_results, f, indent=2, ensure_ascii=False)
-    
-    date_str = datetime.now().strftime('%Y%m%d')
-    history_path = os.path.join(output_dir, f"scan_{date_str}.json")
-    with open(history_path, 'w') as f:
-        json.dump(scan_results, f, indent=2, ensure_ascii=False)
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot_scan(scan_results), f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, filepath)
+    return filepath
+
+def save_results(scan_results, output_dir="data"):
+    """
+    保存扫描结果
+    - latest_scan.json: 最新一次扫描（兼容视图，紧凑格式）
+    - archive/: 按日期分区的 Parquet 归档（历史查询见 scan_archive.py）
+    """
+    with metrics.STAGE_SECONDS.time(stage='save'):
+        filepath = write_latest(scan_results, output_dir)
+        archive_path = scan_archive.append_scan(scan_results, os.path.join(output_dir, "archive"))
     
     print(f"\n💾 结果已保存到: {filepath}")
+    print(f"🗄️ 已归档: {archive_path}")
+    
+    return filepath
+
+def shard_result_path(shard_index, num_shards, output_dir="data"):
+    """分片结果文件路径"""
+    return os.path.join(output_dir, "shards", f"scan_shard_{shard_index:03d}_of_{num_shards:03d}.json")
+
+def save_shard_results(scan_results, shard_index, num_shards, output_dir="data"):
+    """保存单个分片的扫描结果，供 merge 步骤合并"""
+    filepath = shard_result_path(shard_index, num_shards, output_dir)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    
+    # 先写临时文件再改名，避免合并时读到写了一半的文件
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot_scan(scan_results), f, ensure_ascii=False)
+    os.replace(tmp_path, filepath)
+    
+    print(f"\n💾 分片 {shard_index}/{num_shards} 结果已保存到: {filepath}")
     
     return filepath
 
+def load_shard_results(num_shards, output_dir="data"):
+    """
+    读取全部分片结果
+    返回 (partials, missing)，missing 为缺失的分片编号列表
+    """
+    partials = []
+    missing = []
+    for shard_index in range(num_shards):
+        filepath = shard_result_path(shard_index, num_shards, output_dir)
+        if not os.path.exists(filepath):
+            missing.append(shard_index)
+            continue
+        with open(filepath) as f:
+            partials.append(json.load(f))
+    return partials, missing
+
 # ============================================================================
 # 10. 主程序
 # ============================================================================
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="WaveTrend 日线扫描器")
+    parser.add_argument("--universe", action="append",
+                        help="股票池名称或文件路径，可重复指定（默认: default）")
+    parser.add_argument("--shard", help="只扫描一个分片，格式 i/n，例如 0/4")
+    parser.add_argument("--merge", type=int, metavar="N",
+                        help="合并 N 个分片的结果并生成 latest_scan.json")
+    parser.add_argument("--output-dir", default="data", help="结果目录")
+    parser.add_argument("--dtype", default=None, help="指标计算精度 float64/float32（默认取 WT_COMPUTE_DTYPE）")
+    parser.add_argument("--check-precision", action="store_true",
+                        help="验证 --dtype 精度下的信号与 float64 是否完全一致")
+    parser.add_argument("--as-of", help="历史扫描日期 YYYY-MM-DD，完全使用本地缓存")
+    parser.add_argument("--priority", action="store_true",
+                        help="按上次结果的信号相关度排序扫描，逐档发布 latest_scan.json")
+    parser.add_argument("--time-budget", type=float, metavar="SECONDS",
+                        help="优先级扫描的时间预算，超时后其余股票沿用上次结果")
+    parser.add_argument("--stop-after-tier", type=int, metavar="N",
+                        help="优先级扫描只扫到档位 N（0 为最高优先级）")
+    parser.add_argument("--timeframes", help="多周期扫描，例如 1d,1wk 或 1d,4h（一次获取，本地重采样）")
+    parser.add_argument("--export-arrow", metavar="DIR",
+                        help="把结果和指标序列导出为 Arrow IPC 文件（分片扫描时写入 DIR/shard_i_of_n）")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="Prometheus 指标文件（默认 $WT_METRICS_DIR/wavetrend_scan.prom）")
+    return parser.parse_args(argv)
+
+def scan_mode(args):
+    """指标的 mode 标签"""
+    if args.merge:
+        return 'merge'
+    if args.as_of:
+        return 'as_of'
+    if args.timeframes:
+        return 'timeframes'
+    if args.shard:
+        return 'shard'
+    if args.priority:
+        return 'priority'
+    return 'full'
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.check_precision:
+        return _main(args)
+    
+    mode = scan_mode(args)
+    start = time.perf_counter()
+    scan_results = _main(args)
+    metrics.SCAN_DURATION.set(time.perf_counter() - start, mode=mode)
+    metrics.SCAN_LAST_SUCCESS.set_to_current_time(mode=mode)
+    print(f"📈 指标已写入: {metrics.write_textfile('scan', args.metrics_file)}")
+    return scan_results
+
+def _main(args):
+    all_symbols = universe.load_universe(args.universe or ["default"])
+    
+    if args.check_precision:
+        return check_precision_universe(all_symbols, args.dtype or 'float32')
+    
+    if args.merge:
+        partials, missing = load_shard_results(args.merge, args.output_dir)
+        if missing:
+            print(f"⚠️ 缺少分片结果: {missing}")
+        scan_results = merge_scan_results(partials, all_symbols)
+        print_report(scan_results)
+        save_results(scan_results, args.output_dir)
+        return scan_results
+    
     print("\n" + "="*100)
     print("🔍 WaveTrend 扫描器 V2.0 启动")
     print("   新增: 背离检测 | RSI双重确认 | 成交量分析 | 综合评分")
     print("="*100)
     
-    all_symbols = ALL_STOCKS
-    print(f"\n📋 股票池: {len(all_symbols)} 只股票")
+    shard = universe.parse_shard(args.shard) if args.shard else None
+    if shard:
+        shard_index, num_shards = shard
+        symbols = universe.shard_symbols(all_symbols, num_shards, shard_index)
+        print(f"\n📋 股票池: {len(all_symbols)} 只股票，本分片 {shard_index}/{num_shards}: {len(symbols)} 只")
+    else:
+        symbols = all_symbols
+        print(f"\n📋 股票池: {len(symbols)} 只股票")
+    export_arrow_dir = args.export_arrow
+    if export_arrow_dir and shard:
+        export_arrow_dir = os.path.join(export_arrow_dir, f"shard_{shard_index}_of_{num_shards}")
     print(f"📊 市值筛选: ≥ 100亿美元")
     print(f"📈 超买阈值: WT1 ≥ 60")
     print(f"📉 超卖阈值: WT1 ≤ -60")
     
     print("\n⏳ 开始扫描...")
     
+    if args.timeframes:
+        import timeframes
+        scan_results = timeframes.scan_stocks_mtf(symbols, timeframes.parse_timeframes(args.timeframes),
+                                                  dtype=args.dtype, cache=BarCache())
+        print_report(scan_results)
+        timeframes.print_confluence(scan_results)
+        if not shard:
+            save_results(scan_results, args.output_dir)
+        else:
+            save_shard_results(scan_results, shard_index, num_shards, args.output_dir)
+        return scan_results
+    
+    if args.priority and not shard and not args.as_of:
+        import priority
+        return priority.run(symbols, args.output_dir, args.dtype, BarCache(),
+                            args.time_budget, args.stop_after_tier)
+    
     scan_results = scan_stocks(
-        symbols=all_symbols,
+        symbols=symbols,
         min_market_cap=10e9,
         ob_level=60,
-        os_level=-60
+        os_level=-60,
+        dtype=args.dtype,
+        as_of=args.as_of,
+        cache=BarCache(),
+        export_arrow_dir=export_arrow_dir
     )
     
+    if args.as_of:
+        print_report(scan_results)
+        filepath = os.path.join(args.output_dir, f"asof_{pd.Timestamp(args.as_of):%Y%m%d}.json")
+        os.makedirs(args.output_dir, exist_ok=True)
+        with open(filepath, 'w') as f:
+            json.dump(snapshot_scan(scan_results), f, indent=2, ensure_ascii=False)
+        print(f"\n💾 历史扫描结果已保存到: {filepath}")
+        return scan_results
+    
+    if shard:
+        save_shard_results(scan_results, shard_index, num_shards, args.output_dir)
+        return scan_results
+    
     print_report(scan_results)
-    save_results(scan_results)
+    save_results(scan_results, args.output_dir)
+    
+    # 市场宽度: 用扫描时写入的日线缓存追加新交易日
+    import breadth
+    breadth.print_breadth(breadth.update_from_cache(symbols))
     
     return scan_results
 
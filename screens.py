@@ -0,0 +1,562 @@
+"""
+自定义筛选表达式
+- 用户把额外的筛选条件写成表达式，例如:
+    wt1 < -60 and rsi < 35 and vol_ratio > 1.2 and bullish_div
+- 表达式只解析一次: 用 ast 解析后按白名单逐节点检查（只允许列名、数字、比较、and/or/not、
+  四则运算和 abs），校验列名和类型（比较两侧必须是数值，and/or/not 的操作数必须是布尔列或比较），
+  编译为对整列 NumPy 数组运算的闭包
+- 布尔条件按三值逻辑求值: 有 NaN（无数据）参与的比较结果为"未知"，not 之后仍为未知，
+  只有确定为真的行才命中（not (rsi > 50) 不会命中没有 rsi 的股票）
+- 数据面板（不访问网络）:
+    ResultsPanel   扫描结果（latest_scan.json 或网页会话中的结果），每只股票一行
+    MatrixPanel    信号矩阵（signal_matrix.SignalMatrix），symbols × 交易日，可取某一天或整段历史
+  列按需构建并缓存；惰性结果（LazyResult）只有被表达式用到的字段才会计算
+- 多个筛选一次评估: 相同子表达式（例如多个筛选都有 wt1 < -60）在一次评估中只计算一次
+- 保存的筛选在 data/screens.json（WT_SCREENS_FILE）
+
+用法:
+    python screens.py add deep_os "wt1 < -60 and rsi < 35 and vol_ratio > 1.2 and bullish_div"
+    python screens.py list
+    python screens.py run                                  # 对 data/latest_scan.json 评估全部筛选
+    python screens.py run --matrix data/signal_matrix.npz --date 2025-06-30
+    python screens.py run --cache --expr "golden_cross and rsi < 40"   # 从日线缓存计算最新一天
+    python screens.py remove deep_os
+"""
+
+import argparse
+import ast
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+SCREENS_FILE_ENV = 'WT_SCREENS_FILE'
+DEFAULT_SCREENS_FILE = os.path.join("data", "screens.json")
+
+NUM, BOOL = 'num', 'bool'
+
+# 可用的列: 名称 -> (类型, 说明)
+COLUMNS = {
+    'close':          (NUM,  '收盘价'),
+    'price_change':   (NUM,  '当日涨跌 %'),
+    'wt1':            (NUM,  'WaveTrend WT1'),
+    'wt2':            (NUM,  'WaveTrend WT2'),
+    'rsi':            (NUM,  'RSI(14)'),
+    'vol_ratio':      (NUM,  '成交量 / 20 日均量'),
+    'score':          (NUM,  '反转评分 0-9'),
+    'market_cap_b':   (NUM,  '市值（十亿美元，仅扫描结果）'),
+    'bullish_div':    (BOOL, '底背离'),
+    'bearish_div':    (BOOL, '顶背离'),
+    'bullish_conf':   (NUM,  '底背离多参数置信度 0-1（仅扫描结果）'),
+    'bearish_conf':   (NUM,  '顶背离多参数置信度 0-1（仅扫描结果）'),
+    'golden_cross':   (BOOL, 'WT 金叉'),
+    'death_cross':    (BOOL, 'WT 死叉'),
+    'wt_up':          (BOOL, 'WT1 向上'),
+    'wt_down':        (BOOL, 'WT1 向下'),
+    'oversold':       (BOOL, '超卖区（WT1 ≤ 超卖阈值）'),
+    'overbought':     (BOOL, '超买区（WT1 ≥ 超买阈值）'),
+    'approaching_os': (BOOL, '接近超卖'),
+    'approaching_ob': (BOOL, '接近超买'),
+}
+
+# 列名别名
+ALIASES = {'price': 'close', 'vol': 'vol_ratio'}
+
+SIGNAL_COLUMNS = ('oversold', 'overbought', 'approaching_os', 'approaching_ob')
+
+class ScreenError(ValueError):
+    """表达式不合法（语法、不支持的语法结构、未知列或类型不匹配）"""
+
+# ============================================================================
+# 1. 编译
+# ============================================================================
+
+_COMPARE_OPS = {
+    ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater,
+    ast.GtE: np.greater_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+_BIN_OPS = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+_FUNCTIONS = {'abs': np.abs}
+
+class _Node:
+    """
+    编译后的节点: key 为规范化的表达式文本（用于跨筛选共享结果），kind 为 NUM / BOOL
+    NUM 节点返回数值数组；BOOL 节点返回 (确定为真, 确定为假) 两个掩码，都为 False 的位置为未知
+    """
+
+    def __init__(self, key, kind, fn, columns):
+        self.key = key
+        self.kind = kind
+        self.fn = fn
+        self.columns = columns
+
+    def __call__(self, panel, memo):
+        if self.key not in memo:
+            memo[self.key] = self.fn(panel, memo)
+        return memo[self.key]
+
+def _const(value):
+    key = repr(value)
+    if isinstance(value, bool):
+        return _Node(key, BOOL, lambda panel, memo: (value, not value), frozenset())
+    return _Node(key, NUM, lambda panel, memo: value, frozenset())
+
+def _column(name):
+    if COLUMNS[name][0] == BOOL:
+        def flag(panel, memo):
+            out = panel.column(name)
+            return out, np.logical_not(out)
+        return _Node(name, BOOL, flag, frozenset([name]))
+    return _Node(name, NUM, lambda panel, memo: panel.column(name), frozenset([name]))
+
+def _and(a, b):
+    return np.logical_and(a[0], b[0]), np.logical_or(a[1], b[1])
+
+def _or(a, b):
+    return np.logical_or(a[0], b[0]), np.logical_and(a[1], b[1])
+
+def _combine(key, kind, fn, children):
+    columns = frozenset().union(*(c.columns for c in children))
+    return _Node(key, kind, fn, columns)
+
+def _compile(tree):
+    """递归编译 AST 节点，不在白名单中的语法结构一律拒绝"""
+    if isinstance(tree, ast.Expression):
+        return _compile(tree.body)
+
+    if isinstance(tree, ast.Constant):
+        if isinstance(tree.value, bool) or isinstance(tree.value, (int, float)):
+            return _const(tree.value)
+        raise ScreenError(f"不支持的常量: {tree.value!r}")
+
+    if isinstance(tree, ast.Name):
+        name = ALIASES.get(tree.id.lower(), tree.id.lower())
+        if name in ('true', 'false'):
+            return _const(name == 'true')
+        if name not in COLUMNS:
+            raise ScreenError(f"未知列 '{tree.id}'，可用: {', '.join(COLUMNS)}")
+        return _column(name)
+
+    if isinstance(tree, ast.BoolOp):
+        parts = [_compile(v) for v in tree.values]
+        for part in parts:
+            _check(part, BOOL, 'and/or 的操作数')
+        combine = _and if isinstance(tree.op, ast.And) else _or
+        word = ' and ' if isinstance(tree.op, ast.And) else ' or '
+
+        def bool_op(panel, memo):
+            out = parts[0](panel, memo)
+            for part in parts[1:]:
+                out = combine(out, part(panel, memo))
+            return out
+        return _combine('(' + word.join(p.key for p in parts) + ')', BOOL, bool_op, parts)
+
+    if isinstance(tree, ast.UnaryOp):
+        operand = _compile(tree.operand)
+        if isinstance(tree.op, ast.Not):
+            _check(operand, BOOL, 'not 的操作数')
+            # 真假互换，未知仍为未知
+            return _combine(f"(not {operand.key})", BOOL,
+                            lambda panel, memo: operand(panel, memo)[::-1], [operand])
+        if isinstance(tree.op, (ast.USub, ast.UAdd)):
+            _check(operand, NUM, '正负号的操作数')
+            sign = -1 if isinstance(tree.op, ast.USub) else 1
+            if not operand.columns:
+                return _const(sign * operand.fn(None, None))
+            return _combine(f"({'-' if sign < 0 else '+'}{operand.key})", NUM,
+                            lambda panel, memo: sign * operand(panel, memo), [operand])
+        raise ScreenError(f"不支持的运算符: {type(tree.op).__name__}")
+
+    if isinstance(tree, ast.BinOp):
+        if type(tree.op) not in _BIN_OPS:
+            raise ScreenError(f"不支持的运算符: {type(tree.op).__name__}")
+        left, right = _compile(tree.left), _compile(tree.right)
+        _check(left, NUM, '算术运算的操作数')
+        _check(right, NUM, '算术运算的操作数')
+        op = _BIN_OPS[type(tree.op)]
+        symbol = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/'}[type(tree.op)]
+
+        def bin_op(panel, memo):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return op(left(panel, memo), right(panel, memo))
+        return _combine(f"({left.key} {symbol} {right.key})", NUM, bin_op, [left, right])
+
+    if isinstance(tree, ast.Compare):
+        # 链式比较 a < b < c 等价于 (a < b) and (b < c)
+        operands = [_compile(tree.left)] + [_compile(c) for c in tree.comparators]
+        for operand in operands:
+            _check(operand, NUM, '比较的操作数')
+        links = []
+        for op, left, right in zip(tree.ops, operands, operands[1:]):
+            if type(op) not in _COMPARE_OPS:
+                raise ScreenError(f"不支持的比较: {type(op).__name__}")
+            links.append(_compare(op, left, right))
+        if len(links) == 1:
+            return links[0]
+
+        def chain(panel, memo):
+            out = links[0](panel, memo)
+            for link in links[1:]:
+                out = _and(out, link(panel, memo))
+            return out
+        return _combine('(' + ' and '.join(l.key for l in links) + ')', BOOL, chain, links)
+
+    if isinstance(tree, ast.Call):
+        if not isinstance(tree.func, ast.Name) or tree.func.id not in _FUNCTIONS or tree.keywords \
+                or len(tree.args) != 1:
+            raise ScreenError(f"只支持函数: {', '.join(f'{f}(x)' for f in _FUNCTIONS)}")
+        arg = _compile(tree.args[0])
+        _check(arg, NUM, f'{tree.func.id}() 的参数')
+        fn = _FUNCTIONS[tree.func.id]
+        return _combine(f"{tree.func.id}({arg.key})", NUM, lambda panel, memo: fn(arg(panel, memo)), [arg])
+
+    raise ScreenError(f"不支持的语法: {type(tree).__name__}")
+
+def _check(node, kind, what):
+    if node.kind != kind:
+        expected = '布尔条件' if kind == BOOL else '数值'
+        raise ScreenError(f"{what}需要{expected}: {node.key}")
+
+def _compare(op, left, right):
+    fn = _COMPARE_OPS[type(op)]
+    symbol = {ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>=', ast.Eq: '==', ast.NotEq: '!='}[type(op)]
+
+    def compare(panel, memo):
+        # NaN（无数据）参与的比较结果为未知: 既不为真也不为假
+        a, b = left(panel, memo), right(panel, memo)
+        known = ~(np.isnan(a) | np.isnan(b))
+        with np.errstate(invalid='ignore'):
+            true = fn(a, b) & known
+        return true, known & ~true
+    return _combine(f"({left.key} {symbol} {right.key})", BOOL, compare, [left, right])
+
+class Screen:
+    """一个编译好的筛选；columns 为表达式用到的列"""
+
+    def __init__(self, name, expr):
+        self.name = name
+        self.expr = expr
+        try:
+            tree = ast.parse(expr.strip(), mode='eval')
+        except SyntaxError as e:
+            raise ScreenError(f"{name}: 语法错误: {e.msg}") from None
+        try:
+            self._root = _compile(tree)
+            _check(self._root, BOOL, '筛选表达式')
+        except ScreenError as e:
+            raise ScreenError(f"{name}: {e}") from None
+        self.columns = self._root.columns
+
+    def validate(self, panel):
+        """检查面板是否提供表达式用到的全部列"""
+        missing = sorted(self.columns - set(panel.available))
+        if missing:
+            raise ScreenError(f"{self.name}: 数据源没有列 {', '.join(missing)}")
+
+    def evaluate(self, panel, memo=None):
+        """布尔掩码，形状与面板的列相同；结果未知或面板中无数据的位置为 False"""
+        memo = {} if memo is None else memo
+        mask = np.broadcast_to(self._root(panel, memo)[0], panel.shape)
+        return mask & panel.valid
+
+    def __repr__(self):
+        return f"Screen({self.name!r}, {self.expr!r})"
+
+def compile_screens(screens):
+    """{名称: 表达式} -> {名称: Screen}；任一表达式不合法时抛出 ScreenError"""
+    return {name: Screen(name, expr) for name, expr in screens.items()}
+
+def evaluate_all(screens, panel):
+    """
+    一次评估全部筛选，返回 {名称: 布尔掩码}
+    所有筛选共享同一个 memo，相同的列和子表达式只计算一次
+    """
+    for screen in screens.values():
+        screen.validate(panel)
+    memo = {}
+    return {name: screen.evaluate(panel, memo) for name, screen in screens.items()}
+
+# ============================================================================
+# 2. 数据面板
+# ============================================================================
+
+class ResultsPanel:
+    """扫描结果列表（每只股票一行）"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.symbols = [r['symbol'] for r in self.results]
+        self.shape = (len(self.results),)
+        self.valid = np.ones(self.shape, dtype=bool)
+        self.available = tuple(COLUMNS)
+        self._columns = {}
+
+    def _field(self, name, dtype=np.float64):
+        values = [r.get(name) for r in self.results]
+        if dtype is np.bool_:
+            return np.array([bool(v) for v in values], dtype=bool)
+        return np.array([np.nan if v is None else v for v in values], dtype=dtype)
+
+    def column(self, name):
+        if name not in self._columns:
+            if name == 'close':
+                out = self._field('price')
+            elif name in SIGNAL_COLUMNS:
+                out = np.array([r.get('signal_type') == name for r in self.results], dtype=bool)
+            elif name in ('golden_cross', 'death_cross'):
+                word = '金叉' if name == 'golden_cross' else '死叉'
+                out = np.array([word in (r.get('cross') or '') for r in self.results], dtype=bool)
+            elif name in ('wt_up', 'wt_down'):
+                arrow = '↑' if name == 'wt_up' else '↓'
+                out = np.array([r.get('wt_direction') == arrow for r in self.results], dtype=bool)
+            elif COLUMNS[name][0] == BOOL:
+                out = self._field(name, np.bool_)
+            else:
+                out = self._field(name)
+            self._columns[name] = out
+        return self._columns[name]
+
+    def hits(self, mask):
+        return [s for s, m in zip(self.symbols, mask) if m]
+
+class MatrixPanel:
+    """
+    信号矩阵面板；date 指定时只取这一天（每只股票一行），否则为整个 symbols × 交易日 矩阵
+    当天无数据（signal == NO_DATA）的位置不会命中
+    """
+
+    def __init__(self, matrix, date=None):
+        from signal_matrix import NO_DATA
+
+        self.matrix = matrix
+        self.symbols = matrix.symbols
+        self.dates = matrix.dates
+        self._day = None
+        if date is not None:
+            date = pd.Timestamp(date)
+            pos = matrix.dates.searchsorted(date, side='right') - 1
+            if pos < 0:
+                raise KeyError(f"信号矩阵中没有 {date:%Y-%m-%d} 及之前的数据")
+            self._day = pos
+            self.date = matrix.dates[pos]
+        self.valid = self._slice(matrix['signal']) != NO_DATA
+        self.shape = self.valid.shape
+        fields = set(matrix.arrays)
+        self.available = tuple(c for c in COLUMNS if c != 'market_cap_b' and self._source(c) <= fields)
+        self._columns = {}
+
+    def _slice(self, values):
+        return values if self._day is None else values[:, self._day]
+
+    @staticmethod
+    def _source(name):
+        """列依赖的矩阵字段"""
+        if name in SIGNAL_COLUMNS:
+            return {'signal'}
+        if name in ('golden_cross', 'death_cross'):
+            return {'cross'}
+        if name in ('wt_up', 'wt_down'):
+            return {'direction'}
+        if name == 'price_change':
+            return {'close'}
+        return {name}
+
+    def column(self, name):
+        from signal_matrix import CROSS_DEATH, CROSS_GOLDEN, SIGNAL_TYPES
+
+        if name not in self._columns:
+            m = self.matrix
+            if name in SIGNAL_COLUMNS:
+                out = self._slice(m['signal']) == SIGNAL_TYPES.index(name)
+            elif name in ('golden_cross', 'death_cross'):
+                out = self._slice(m['cross']) == (CROSS_GOLDEN if name == 'golden_cross' else CROSS_DEATH)
+            elif name in ('wt_up', 'wt_down'):
+                out = self._slice(m['direction']) == (1 if name == 'wt_up' else -1)
+            elif name == 'price_change':
+                close = m['close'].astype(np.float64)
+                prev = np.concatenate([np.full((close.shape[0], 1), np.nan), close[:, :-1]], axis=1)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    out = self._slice((close / prev - 1) * 100)
+            else:
+                out = self._slice(m[name])
+                if COLUMNS[name][0] == NUM:
+                    out = out.astype(np.float64)
+            self._columns[name] = out
+        return self._columns[name]
+
+    def hits(self, mask):
+        """单日面板: 命中股票列表；整段历史: {股票: 命中日期数}"""
+        if self._day is not None:
+            return [s for s, m in zip(self.symbols, mask) if m]
+        counts = mask.sum(axis=1)
+        return {s: int(c) for s, c in zip(self.symbols, counts) if c}
+
+# ============================================================================
+# 3. 保存的筛选
+# ============================================================================
+
+def screens_file():
+    return os.environ.get(SCREENS_FILE_ENV) or DEFAULT_SCREENS_FILE
+
+def load_screens(path=None):
+    """{名称: 表达式}（保持保存顺序）；文件不存在时为空"""
+    path = path or screens_file()
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return {s['name']: s['expr'] for s in data.get('screens', [])}
+
+def save_screens(screens, path=None):
+    """原子写入，返回路径"""
+    path = path or screens_file()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = {'screens': [{'name': name, 'expr': expr} for name, expr in screens.items()]}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+def add_screen(name, expr, path=None):
+    """校验后保存（同名覆盖），返回编译好的 Screen"""
+    screen = Screen(name, expr)
+    screens = load_screens(path)
+    screens[name] = expr
+    save_screens(screens, path)
+    return screen
+
+def remove_screen(name, path=None):
+    screens = load_screens(path)
+    if screens.pop(name, None) is None:
+        return False
+    save_screens(screens, path)
+    return True
+
+def screen_hits(results, path=None):
+    """
+    对一组扫描结果评估全部保存的筛选，返回 ({名称: 命中股票列表}, 错误信息列表)
+    不合法或数据源缺列的筛选跳过并记入错误，不影响其他筛选
+    """
+    screens, errors = {}, []
+    for name, expr in load_screens(path).items():
+        try:
+            screens[name] = Screen(name, expr)
+        except ScreenError as e:
+            errors.append(str(e))
+    panel = ResultsPanel(results)
+    valid = {}
+    for name, screen in screens.items():
+        try:
+            screen.validate(panel)
+            valid[name] = screen
+        except ScreenError as e:
+            errors.append(str(e))
+    masks = evaluate_all(valid, panel)
+    return {name: panel.hits(mask) for name, mask in masks.items()}, errors
+
+def print_screen_hits(results, path=None):
+    """扫描报告末尾的自定义筛选命中（没有保存的筛选时不输出）"""
+    hits, errors = screen_hits(results, path)
+    if not hits and not errors:
+        return hits
+    saved = load_screens(path)
+    print("\n🔎 自定义筛选:")
+    for name, symbols in hits.items():
+        print(f"  {name} ({saved[name]}): {', '.join(symbols) if symbols else '无'}")
+    for error in errors:
+        print(f"  ⚠️ {error}")
+    return hits
+
+# ============================================================================
+# 4. 命令行
+# ============================================================================
+
+def _load_panel(args):
+    if args.matrix or args.cache:
+        if args.matrix:
+            from signal_matrix import SignalMatrix
+            matrix = SignalMatrix.load(args.matrix)
+        else:
+            from signal_matrix import compute_signal_matrix, iter_cache_frames
+            # 只保留最后一天（或 --date 当天）
+            matrix = compute_signal_matrix(iter_cache_frames(end=args.date), end=args.date)
+        date = None if args.history else (args.date or matrix.dates.max())
+        return MatrixPanel(matrix, date)
+
+    with open(args.results, encoding='utf-8') as f:
+        scan = json.load(f)
+    print(f"📂 {args.results}（扫描时间 {scan.get('scan_time', '?')}）")
+    # 保存时未计算的延迟字段（中性股票的 RSI/背离等）在表达式用到时从日线缓存重算
+    from bar_cache import BarCache
+    from scanner import restore_deferred
+
+    cache = BarCache()
+    return ResultsPanel([restore_deferred(r, cache) for r in scan.get('all', [])])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="自定义筛选表达式")
+    parser.add_argument("--file", help=f"筛选保存文件（默认 {SCREENS_FILE_ENV} 或 {DEFAULT_SCREENS_FILE}）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("add", help="校验并保存一个筛选（同名覆盖）")
+    p.add_argument("name")
+    p.add_argument("expr")
+
+    p = sub.add_parser("remove", help="删除一个筛选")
+    p.add_argument("name")
+
+    sub.add_parser("list", help="列出保存的筛选和可用列")
+
+    p = sub.add_parser("run", help="评估筛选（不访问网络）")
+    p.add_argument("--screen", action="append", help="只评估指定名称的筛选，可重复")
+    p.add_argument("--expr", action="append", help="临时表达式，可重复")
+    p.add_argument("--results", default=os.path.join("data", "latest_scan.json"), help="扫描结果文件")
+    p.add_argument("--matrix", help="改用信号矩阵 .npz")
+    p.add_argument("--cache", action="store_true", help="改用日线缓存现算信号矩阵")
+    p.add_argument("--date", help="矩阵面板的日期（默认最后一天）")
+    p.add_argument("--history", action="store_true", help="矩阵面板评估整段历史，输出每只股票的命中天数")
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        screen = add_screen(args.name, args.expr, args.file)
+        print(f"💾 已保存筛选 {screen.name}: {screen.expr}（列: {', '.join(sorted(screen.columns))}）")
+        return screen
+    if args.command == "remove":
+        removed = remove_screen(args.name, args.file)
+        print(f"🗑️ 已删除筛选 {args.name}" if removed else f"⚠️ 没有名为 {args.name} 的筛选")
+        return removed
+    if args.command == "list":
+        saved = load_screens(args.file)
+        for name, expr in saved.items():
+            print(f"  {name:20} {expr}")
+        print(f"📋 {len(saved)} 个筛选；可用列:")
+        for name, (kind, desc) in COLUMNS.items():
+            print(f"  {name:16} {'布尔' if kind == BOOL else '数值'}  {desc}")
+        return saved
+
+    saved = load_screens(args.file)
+    selected = {n: saved[n] for n in args.screen} if args.screen else dict(saved)
+    for i, expr in enumerate(args.expr or []):
+        selected[f"expr_{i + 1}"] = expr
+    if not selected:
+        parser.error("没有筛选可评估（先用 add 保存，或用 --expr 指定）")
+
+    screens = compile_screens(selected)
+    panel = _load_panel(args)
+    masks = evaluate_all(screens, panel)
+    hits = {}
+    for name, mask in masks.items():
+        hits[name] = panel.hits(mask)
+        shown = hits[name] if isinstance(hits[name], list) else \
+            [f"{s}×{c}" for s, c in sorted(hits[name].items(), key=lambda kv: -kv[1])]
+        print(f"\n🔎 {name} ({screens[name].expr}): {len(hits[name])} 只")
+        if shown:
+            print("   " + ", ".join(shown[:50]) + (" ..." if len(shown) > 50 else ""))
+    return hits
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+信号历史矩阵：一次计算所有股票在一段日期内每一天的信号
+- 基于完整序列的指标输出（calc_wavetrend 等本来就返回整条序列）
+- 金叉/死叉、WT1 方向、背离、评分全部按时间轴向量化，不再逐日截断重算
+- 输出为紧凑的 symbols × 交易日 矩阵（int8 / bool / float32），保存为 .npz
+
+与在线扫描的区别：在线扫描只用最近 3 个月数据做 EWM 预热，这里用缓存中的全部历史，
+EWM 收敛更充分。逐日截断全部历史再调用单股扫描，结果与本矩阵完全一致。
+
+用法:
+    python signal_matrix.py --panel data/panel --start 2025-01-01 --out data/signal_matrix.npz
+    python signal_matrix.py --start 2025-01-01            # 使用 data/bars 日线缓存
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import divergence
+import kernels
+from scanner import MIN_BARS, calc_rsi, calc_volume_ratio, calc_wavetrend
+
+# signal 矩阵中的编码，下标即编码；-1 表示当天无数据（未上市或历史不足）
+SIGNAL_TYPES = ('neutral', 'oversold', 'overbought', 'approaching_os', 'approaching_ob')
+NO_DATA = -1
+CROSS_NONE, CROSS_GOLDEN, CROSS_DEATH = 0, 1, 2
+
+# compute_signal_matrix 每批用 kernels 一次计算的股票数
+BATCH_SIZE = 1000
+
+CODE_FIELDS = ('signal', 'cross', 'direction', 'bullish_div', 'bearish_div', 'score')
+INDICATOR_FIELDS = ('close', 'wt1', 'wt2', 'rsi', 'vol_ratio')
+
+# ============================================================================
+# 1. 向量化背离
+# ============================================================================
+
+def swing_mask(values, window=5, kind='low'):
+    """
+    摆动点掩码：该点是前后 window 根K线中的最低（最高）点
+    与 find_swing_lows / find_swing_highs 的判断相同，但对整条序列一次完成
+    """
+    s = pd.Series(values)
+    rolling = s.rolling(2 * window + 1, center=True)
+    extreme = rolling.min() if kind == 'low' else rolling.max()
+    mask = (s == extreme).to_numpy(copy=True)
+    # 首尾 window 根没有完整的比较窗口
+    mask[:window] = False
+    if window:
+        mask[-window:] = False
+    return mask
+
+def divergence_series(price, wt1, mask, bullish, lookback=30, swing_window=5):
+    """
+    每一天的背离标志，等价于在每一天对截断数据调用 detect_divergence
+    一维（单只股票）或二维（symbols × 交易日，沿最后一维计算）均可
+
+    第 t 天 detect_divergence 只看 [t-lookback+1, t] 窗口，其中摆动点位置范围为
+    [start+w, t-w]。摆动点本身只依赖前后 w 根K线，与截断无关，所以只需对每一天
+    找出 ≤ t-w 的最近两个摆动点，检查较早的那个是否仍在窗口内。
+    """
+    latest, prev = last_two_swings(mask, swing_window)
+    t = np.arange(np.shape(price)[-1])
+    start = np.maximum(0, t - lookback + 1)
+    ok = (latest >= 0) & (prev >= 0) & (prev >= start + swing_window)
+
+    a = np.clip(latest, 0, None)
+    b = np.clip(prev, 0, None)
+    with np.errstate(invalid='ignore'):
+        if bullish:
+            fired = (_take(price, a) < _take(price, b)) & (_take(wt1, a) > _take(wt1, b))
+        else:
+            fired = (_take(price, a) > _take(price, b)) & (_take(wt1, a) < _take(wt1, b))
+    return ok & fired
+
+def last_two_swings(mask, swing_window=5):
+    """
+    每一天可见的最近两个摆动点位置 (latest, prev)，没有时为 -1
+    第 t 天只能看到 ≤ t-w 的摆动点（之后的点还没有完整的右侧窗口）
+    """
+    n = np.shape(mask)[-1]
+    idx = np.arange(n)
+    # last_le[j]: 位置 ≤ j 的最近一个摆动点（没有则为 -1）
+    last_le = np.maximum.accumulate(np.where(mask, idx, -1), axis=-1)
+
+    j = idx - swing_window
+    latest = np.where(j >= 0, _take(last_le, np.clip(j, 0, None)), -1)
+    prev = np.where(latest > 0, _take(last_le, np.clip(latest - 1, 0, None)), -1)
+    return latest, prev
+
+def _take(values, positions):
+    """沿最后一维按位置取值（positions 可以是一维，对每行相同）"""
+    values = np.asarray(values)
+    return np.take_along_axis(values, np.broadcast_to(positions, values.shape), axis=-1)
+
+# ============================================================================
+# 2. 单只股票的逐日信号
+# ============================================================================
+
+def _score_side(wt1, cross, direction, div, conf, rsi, vol_ratio, price_change, oversold):
+    """向量化的 calc_reversal_score（使用与结果字典相同的四舍五入值）"""
+    # 默认参数未触发背离、多参数置信度达标时 +1
+    multi = ~div & (conf >= divergence.CONFIDENCE_MIN)
+    with np.errstate(invalid='ignore'):
+        if oversold:
+            score = ((wt1 <= -60) * 1 + (cross == CROSS_GOLDEN) * 2 + (direction == 1) * 1
+                     + div * 2 + (rsi < 30) * 1)
+            vol = (vol_ratio < 0.8) | ((vol_ratio > 1.5) & (price_change > 0))
+        else:
+            score = ((wt1 >= 60) * 1 + (cross == CROSS_DEATH) * 2 + (direction == -1) * 1
+                     + div * 2 + (rsi > 70) * 1)
+            vol = (vol_ratio < 0.8) | ((vol_ratio > 1.5) & (price_change < 0))
+    return score + multi * 1 + vol * 1
+
+def _confidence(low, high, wt1):
+    """每一天的多参数背离置信度 (bullish, bearish)，一维或二维"""
+    bullish, bearish = divergence.divergence_grid(low, high, wt1)
+    return divergence.confidence(bullish), divergence.confidence(bearish)
+
+def symbol_signals(df, ob_level=60, os_level=-60, lookback=30, swing_window=5, precomputed=None):
+    """
+    单只股票每一天的信号（与 scan_symbol 对截断到当天的数据得到的结果一致）
+    precomputed: kernels 批量算好的 {'wt1', 'wt2', 'swing_low', 'swing_high', 'bullish_conf', 'bearish_conf'}
+                 （与 df 等长），省略时逐只计算
+    返回 dict: 字段名 -> 一维数组（长度 = len(df)）
+    """
+    if precomputed is not None:
+        wt1, wt2 = precomputed['wt1'], precomputed['wt2']
+    else:
+        wt1_s, wt2_s = calc_wavetrend(df)
+        wt1 = wt1_s.to_numpy(dtype=np.float64)
+        wt2 = wt2_s.to_numpy(dtype=np.float64)
+    rsi = calc_rsi(df).to_numpy(dtype=np.float64)
+    vol_ratio = calc_volume_ratio(df).to_numpy(dtype=np.float64)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    low = df['Low'].to_numpy(dtype=np.float64)
+    high = df['High'].to_numpy(dtype=np.float64)
+    n = len(df)
+
+    prev_wt1 = np.concatenate([wt1[:1], wt1[:-1]])
+    prev_wt2 = np.concatenate([wt2[:1], wt2[:-1]])
+    prev_close = np.concatenate([close[:1], close[:-1]])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cross = np.select([(wt1 > wt2) & (prev_wt1 <= prev_wt2),
+                           (wt1 < wt2) & (prev_wt1 >= prev_wt2)],
+                          [CROSS_GOLDEN, CROSS_DEATH], CROSS_NONE)
+        direction = np.select([wt1 > prev_wt1, wt1 < prev_wt1], [1, -1], 0)
+        signal = np.select([wt1 <= os_level, wt1 >= ob_level, wt1 <= -53, wt1 >= 53], [1, 2, 3, 4], 0)
+        price_change = (close / prev_close - 1) * 100
+
+    if precomputed is not None:
+        low_mask, high_mask = precomputed['swing_low'], precomputed['swing_high']
+    else:
+        low_mask, high_mask = swing_mask(low, swing_window, 'low'), swing_mask(high, swing_window, 'high')
+    bullish_div = divergence_series(low, wt1, low_mask, True, lookback, swing_window)
+    bearish_div = divergence_series(high, wt1, high_mask, False, lookback, swing_window)
+    if precomputed is not None:
+        bullish_conf, bearish_conf = precomputed['bullish_conf'], precomputed['bearish_conf']
+    else:
+        bullish_conf, bearish_conf = _confidence(low, high, wt1)
+
+    # 评分用结果字典里四舍五入后的值
+    wt1_r = np.round(wt1, 2)
+    rsi_r = np.round(rsi, 1)
+    vol_r = np.round(vol_ratio, 2)
+    pc_r = np.round(price_change, 2)
+    score_os = _score_side(wt1_r, cross, direction, bullish_div, np.round(bullish_conf, 2),
+                           rsi_r, vol_r, pc_r, True)
+    score_ob = _score_side(wt1_r, cross, direction, bearish_div, np.round(bearish_conf, 2),
+                           rsi_r, vol_r, pc_r, False)
+    score = np.select([(signal == 1) | (signal == 3), (signal == 2) | (signal == 4)], [score_os, score_ob], 0)
+
+    # 与 scan_symbol 相同的有效性判断：历史不足 MIN_BARS 或 WT1 为 NaN 时当天无结果
+    valid = (np.arange(n) + 1 >= MIN_BARS) & ~np.isnan(wt1)
+    signal = np.where(valid, signal, NO_DATA)
+
+    return {
+        'signal': signal,
+        'cross': np.where(valid, cross, 0),
+        'direction': np.where(valid, direction, 0),
+        'bullish_div': valid & bullish_div,
+        'bearish_div': valid & bearish_div,
+        'score': np.where(valid, score, 0),
+        'close': close,
+        'wt1': wt1,
+        'wt2': wt2,
+        'rsi': rsi,
+        'vol_ratio': vol_ratio,
+    }
+
+# ============================================================================
+# 3. 矩阵
+# ============================================================================
+
+class SignalMatrix:
+    """symbols × 交易日 的信号矩阵"""
+
+    DTYPES = {
+        'signal': np.int8, 'cross': np.int8, 'direction': np.int8,
+        'bullish_div': np.bool_, 'bearish_div': np.bool_, 'score': np.int8,
+        'close': np.float32, 'wt1': np.float32, 'wt2': np.float32,
+        'rsi': np.float32, 'vol_ratio': np.float32,
+    }
+
+    def __init__(self, symbols, dates, arrays):
+        self.symbols = list(symbols)
+        self.dates = pd.DatetimeIndex(dates)
+        self.arrays = arrays
+        self._symbol_index = {s: i for i, s in enumerate(self.symbols)}
+
+    @classmethod
+    def empty(cls, symbols, dates, fields=CODE_FIELDS + INDICATOR_FIELDS):
+        shape = (len(symbols), len(dates))
+        arrays = {}
+        for name in fields:
+            dtype = cls.DTYPES[name]
+            if name == 'signal':
+                arrays[name] = np.full(shape, NO_DATA, dtype=dtype)
+            elif np.issubdtype(dtype, np.floating):
+                arrays[name] = np.full(shape, np.nan, dtype=dtype)
+            else:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+        return cls(symbols, dates, arrays)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def set_row(self, symbol, dates, values):
+        """写入一只股票的逐日信号（按日期对齐）"""
+        i = self._symbol_index[symbol]
+        pos = self.dates.get_indexer(pd.DatetimeIndex(dates))
+        mask = pos >= 0
+        for name, arr in self.arrays.items():
+            arr[i, pos[mask]] = values[name][mask]
+
+    def frame(self, name, decode=False):
+        """单个字段的 DataFrame（行: 日期，列: 股票）；decode=True 时 signal 转为名称"""
+        values = self.arrays[name]
+        if decode and name == 'signal':
+            lookup = np.array(SIGNAL_TYPES + ('',), dtype=object)
+            values = lookup[values]
+        return pd.DataFrame(values.T, index=self.dates, columns=self.symbols)
+
+    def symbol_history(self, symbol):
+        """单只股票的信号历史（行: 日期）"""
+        i = self._symbol_index[symbol]
+        data = {name: arr[i] for name, arr in self.arrays.items()}
+        df = pd.DataFrame(data, index=self.dates)
+        df['signal_type'] = [SIGNAL_TYPES[c] if c >= 0 else None for c in df['signal']]
+        return df[df['signal'] != NO_DATA]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, symbols=np.array(self.symbols), dates=self.dates.to_numpy().astype('datetime64[D]'),
+                            **self.arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            arrays = {k: npz[k] for k in npz.files if k not in ('symbols', 'dates')}
+            return cls(npz['symbols'].tolist(), npz['dates'].astype('datetime64[ns]'), arrays)
+
+def padded_groups(batch, columns=('High', 'Low', 'Close')):
+    """
+    一批 (symbol, df) 按价格列精度分组，各列左侧补 NaN 对齐为二维数组
+    产出 (members, {列: 二维数组})，members 为该组在 batch 中的下标
+    """
+    groups = {}
+    for i, (_, df) in enumerate(batch):
+        groups.setdefault(np.result_type(df['High'].dtype, df['Low'].dtype, df['Close'].dtype), []).append(i)
+    for dtype, members in groups.items():
+        yield members, {c: kernels.left_pad([batch[i][1][c].to_numpy() for i in members], dtype)
+                        for c in columns}
+
+def batch_precompute(batch, swing_window=5):
+    """
+    一批 (symbol, df) 的 WT1/WT2 和摆动点掩码一次用 kernels 计算
+    长度不同的序列左侧补 NaN 对齐；按价格列精度分组（float32 缓存数据的 ap 按 float32 计算），
+    与逐只计算逐位一致。返回与 batch 对应的 precomputed 列表
+    """
+    out = [None] * len(batch)
+    for members, columns in padded_groups(batch):
+        wt1, wt2 = kernels.wavetrend_2d(columns['High'], columns['Low'], columns['Close'])
+        swing_low = kernels.swing_mask_2d(columns['Low'], swing_window, 'low')
+        swing_high = kernels.swing_mask_2d(columns['High'], swing_window, 'high')
+        bullish_conf, bearish_conf = _confidence(columns['Low'], columns['High'], wt1)
+
+        width = wt1.shape[1]
+        for row, i in enumerate(members):
+            cols = slice(width - len(batch[i][1]), width)
+            out[i] = {'wt1': wt1[row, cols], 'wt2': wt2[row, cols],
+                      'swing_low': swing_low[row, cols], 'swing_high': swing_high[row, cols],
+                      'bullish_conf': bullish_conf[row, cols], 'bearish_conf': bearish_conf[row, cols]}
+    return out
+
+def _batches(frames, size):
+    batch = []
+    for item in frames:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def compute_signal_matrix(frames, start=None, end=None, ob_level=60, os_level=-60,
+                          fields=CODE_FIELDS + INDICATOR_FIELDS, batch_size=BATCH_SIZE):
+    """
+    frames: 可迭代的 (symbol, df)，df 应包含 start 之前足够的历史用于预热
+            例如 PanelStore.iter_windows(end=end) 或 iter_cache_frames()
+    batch_size: 每批用 kernels 一次计算的股票数（限制补齐后二维数组的内存）
+    返回 SignalMatrix，日期为 [start, end] 内所有出现过的交易日
+    """
+    rows = []
+    all_dates = set()
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    for batch in _batches(frames, batch_size):
+        for (symbol, df), precomputed in zip(batch, batch_precompute(batch)):
+            rows.append(_matrix_row(symbol, df, precomputed, start, end, ob_level, os_level, fields))
+            all_dates.update(rows[-1][1])
+
+    matrix = SignalMatrix.empty([r[0] for r in rows], sorted(all_dates), fields)
+    for symbol, dates, values in rows:
+        matrix.set_row(symbol, dates, values)
+    return matrix
+
+def _matrix_row(symbol, df, precomputed, start, end, ob_level, os_level, fields):
+    """单只股票在 [start, end] 内的逐日信号 (symbol, dates, values)"""
+    values = symbol_signals(df, ob_level, os_level, precomputed=precomputed)
+    dates = pd.DatetimeIndex(df.index)
+    keep = np.ones(len(dates), dtype=bool)
+    if start is not None:
+        keep &= dates >= start
+    if end is not None:
+        keep &= dates <= end
+    return symbol, dates[keep], {name: values[name][keep] for name in fields}
+
+def iter_cache_frames(symbols=None, cache=None, end=None):
+    """从日线缓存逐只读取数据"""
+    from bar_cache import BarCache
+
+    cache = cache or BarCache()
+    for symbol in symbols or cache.symbols():
+        df, _ = cache.load(symbol)
+        if df is None:
+            continue
+        if end is not None:
+            df = df.loc[:pd.Timestamp(end)]
+        if len(df):
+            yield symbol, df
+
+def main(argv=None):
+    import universe
+
+    parser = argparse.ArgumentParser(description="计算信号历史矩阵")
+    parser.add_argument("--panel", help="PanelStore 目录（默认使用 data/bars 日线缓存）")
+    parser.add_argument("--universe", action="append", help="股票池名称或文件路径（默认: 数据源中的全部股票）")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--out", default=os.path.join("data", "signal_matrix.npz"))
+    args = parser.parse_args(argv)
+
+    symbols = universe.load_universe(args.universe) if args.universe else None
+    if args.panel:
+        from panel_store import PanelStore
+        frames = PanelStore.open(args.panel).iter_windows(symbols, end=args.end)
+    else:
+        frames = iter_cache_frames(symbols, end=args.end)
+
+    matrix = compute_signal_matrix(frames, args.start, args.end)
+    matrix.save(args.out)
+    print(f"💾 信号矩阵已保存到: {args.out} ({len(matrix.symbols)} 只 × {len(matrix.dates)} 天)")
+
+if __name__ == "__main__":
+    main()
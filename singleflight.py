@@ -0,0 +1,119 @@
+"""
+进程内的请求合并（single-flight）
+- 相同 key 的并发调用只执行一次，其余调用等待并共享同一结果（或同一异常）
+- Streamlit 下多个会话同时点击扫描时，Yahoo 请求量和 CPU 不随在线人数增加
+
+两层:
+    SingleFlight     同步合并，用于单只股票的数据获取
+    ScanCoordinator  后台线程执行整次扫描，会话轮询进度并取结果
+"""
+
+import threading
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """相同 key 的并发调用合并为一次"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.event.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+class Flight:
+    """一次进行中的扫描：进度 + 结果"""
+
+    def __init__(self, key):
+        self.key = key
+        self.done = 0
+        self.total = 0
+        self.label = ""
+        self.subscribers = 1
+        self._event = threading.Event()
+        self._result = None
+        self._error = None
+
+    def report(self, done, total, label=""):
+        """扫描函数回调：更新进度"""
+        self.done, self.total, self.label = done, total, label
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+    def finished(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """等待完成；超时返回 False"""
+        return self._event.wait(timeout)
+
+    def result(self):
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+class ScanCoordinator:
+    """
+    进程级扫描协调器
+    start(key, fn): 没有相同 key 的扫描在进行时，启动后台线程执行 fn(flight)；
+    否则加入进行中的扫描。返回 (flight, joined)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def start(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.subscribers += 1
+                return flight, True
+            flight = self._flights[key] = Flight(key)
+
+        def run():
+            try:
+                flight._result = fn(flight)
+            except BaseException as e:
+                flight._error = e
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight._event.set()
+
+        threading.Thread(target=run, name=f"scan-flight-{id(flight):x}", daemon=True).start()
+        return flight, False
+
+    def in_flight(self):
+        with self._lock:
+            return list(self._flights.values())
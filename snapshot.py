@@ -0,0 +1,153 @@
+"""
+网页冷启动快照
+- 每次网页扫描完成后把与阈值无关的原始结果（app.fetch_all_stocks 的输出）、
+  各股票最近 REQUIRED_BARS 根日线面板和元数据写入 data/snapshot/
+- 容器重启后启动时内存映射读取，立即按会话设置分类显示，同时后台增量刷新
+- 两个 Arrow IPC 文件（不压缩，pa.memory_map 零拷贝读取）:
+    results.arrow   每只股票一行原始结果；schema metadata 存扫描时间、股票池和快照 ID
+    panel.arrow     长表 symbol, date, Open, High, Low, Close, Volume
+  先写面板再写结果，两者快照 ID 不一致时（写入中途退出）忽略面板
+- 面板用于在本地日线缓存缺失时补种 BarCache，使后台刷新只请求缺少的K线
+"""
+
+import json
+import os
+import uuid
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import ingest
+from arrow_export import _write_ipc
+from bar_cache import BarCache
+from lookback_planner import REQUIRED_BARS
+
+SNAPSHOT_DIR = os.environ.get('WT_SNAPSHOT_DIR', os.path.join("data", "snapshot"))
+SNAPSHOT_VERSION = 1
+
+RESULTS_FILE = "results.arrow"
+PANEL_FILE = "panel.arrow"
+
+VERSION_KEY = b'wavetrend.snapshot_version'
+ID_KEY = b'wavetrend.snapshot_id'
+SCAN_TIME_KEY = b'wavetrend.scan_time'
+SYMBOLS_KEY = b'wavetrend.symbols'
+
+Snapshot = namedtuple('Snapshot', ['raw_results', 'scan_time', 'symbols', 'panel'])
+
+# ============================================================================
+# 1. 写入
+# ============================================================================
+
+def panel_to_table(frames):
+    """frames: {symbol: 紧凑 OHLCV DataFrame} -> 长表（symbol 列字典编码）"""
+    symbols = list(frames)
+    lengths = [len(frames[s]) for s in symbols]
+    codes = np.repeat(np.arange(len(symbols), dtype=np.int32), lengths)
+    columns = {
+        'symbol': pa.DictionaryArray.from_arrays(pa.array(codes, pa.int32()), pa.array(symbols, pa.string())),
+        'date': pa.array(np.concatenate([frames[s].index.to_numpy().astype('datetime64[D]') for s in symbols])
+                         if symbols else np.array([], dtype='datetime64[D]'), pa.date32()),
+    }
+    for col in ingest.KEEP_COLUMNS:
+        values = [frames[s][col].to_numpy() for s in symbols]
+        dtype = np.int64 if col == 'Volume' else ingest.PRICE_DTYPE
+        if col == 'Volume' and any(v.dtype.kind == 'f' for v in values):
+            dtype = np.float64       # 有缺失成交量（NaN）的股票
+        columns[col] = np.concatenate(values).astype(dtype) if values else np.array([], dtype=dtype)
+    return pa.table(columns)
+
+def save_snapshot(raw_results, symbols, scan_time, cache=None, snapshot_dir=SNAPSHOT_DIR,
+                  bars=REQUIRED_BARS):
+    """
+    raw_results: app.fetch_all_stocks 的输出（字典列表）
+    面板取自本地日线缓存（扫描时已写入），只保存有结果的股票
+    """
+    cache = cache or BarCache()
+    os.makedirs(snapshot_dir, exist_ok=True)
+    snapshot_id = uuid.uuid4().hex.encode()
+
+    frames = {}
+    for row in raw_results:
+        df, _ = cache.load(row['symbol'])
+        if df is not None:
+            frames[row['symbol']] = df.iloc[-bars:]
+    panel = panel_to_table(frames)
+    panel = panel.replace_schema_metadata({VERSION_KEY: str(SNAPSHOT_VERSION).encode(), ID_KEY: snapshot_id})
+    _write_ipc(panel, os.path.join(snapshot_dir, PANEL_FILE))
+
+    results = pa.Table.from_pylist([dict(row) for row in raw_results])
+    results = results.replace_schema_metadata({
+        VERSION_KEY: str(SNAPSHOT_VERSION).encode(),
+        ID_KEY: snapshot_id,
+        SCAN_TIME_KEY: scan_time.encode(),
+        SYMBOLS_KEY: json.dumps(list(symbols)).encode(),
+    })
+    path = os.path.join(snapshot_dir, RESULTS_FILE)
+    _write_ipc(results, path)
+    return path
+
+# ============================================================================
+# 2. 读取
+# ============================================================================
+
+def _open(path):
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+def load_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """没有快照或版本不兼容时返回 None；面板缺失或不匹配时 panel 为 None"""
+    path = os.path.join(snapshot_dir, RESULTS_FILE)
+    if not os.path.exists(path):
+        return None
+    results = _open(path)
+    meta = results.schema.metadata or {}
+    if int(meta.get(VERSION_KEY, b'0')) != SNAPSHOT_VERSION:
+        return None
+
+    panel = None
+    panel_path = os.path.join(snapshot_dir, PANEL_FILE)
+    if os.path.exists(panel_path):
+        panel = _open(panel_path)
+        if (panel.schema.metadata or {}).get(ID_KEY) != meta.get(ID_KEY):
+            panel = None
+
+    return Snapshot(
+        raw_results=results.to_pylist(),
+        scan_time=meta.get(SCAN_TIME_KEY, b'').decode(),
+        symbols=json.loads(meta.get(SYMBOLS_KEY, b'[]')),
+        panel=panel,
+    )
+
+def panel_frames(panel):
+    """长表 -> {symbol: 紧凑 OHLCV DataFrame}"""
+    symbols = panel.column('symbol').combine_chunks()
+    codes = symbols.indices.to_numpy(zero_copy_only=False)
+    names = symbols.dictionary.to_pylist()
+    dates = pd.DatetimeIndex(panel.column('date').to_numpy().astype('datetime64[ns]'))
+    data = {col: panel.column(col).to_numpy() for col in ingest.KEEP_COLUMNS}
+
+    frames = {}
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+    for i, name in enumerate(names):
+        rows = order[bounds[i]:bounds[i + 1]]
+        if len(rows):
+            frames[name] = ingest.compact_ohlcv(pd.DataFrame({c: v[rows] for c, v in data.items()},
+                                                             index=dates[rows]))
+    return frames
+
+def seed_cache(snapshot, cache=None):
+    """把快照面板写入本地日线缓存中缺少的股票，返回补种的股票数"""
+    if snapshot is None or snapshot.panel is None:
+        return 0
+    cache = cache or BarCache()
+    missing = set(snapshot.panel.column('symbol').combine_chunks().dictionary.to_pylist())
+    missing = {s for s in missing if s not in cache}
+    if not missing:
+        return 0
+    for symbol, df in panel_frames(snapshot.panel).items():
+        if symbol in missing:
+            cache.save(symbol, df)
+    return len(missing)
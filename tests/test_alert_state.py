@@ -0,0 +1,51 @@
+"""
+alert_state 增量对比的测试
+
+    python -m pytest tests/test_alert_state.py
+"""
+
+import unittest
+
+from alert_state import diff_signals, extract_signals, format_diff_message, scanned_symbols
+
+def _row(symbol, grade='B', cross=''):
+    return {'symbol': symbol, 'grade': grade, 'score': 3, 'cross': cross, 'wt1': -60.0, 'price': 10.0}
+
+def _scan(all_symbols=None, **signals):
+    scan = {k: [_row(s) for s in v] for k, v in signals.items()}
+    if all_symbols is not None:
+        scan['all'] = [_row(s) for s in all_symbols]
+    return scan
+
+class DiffTest(unittest.TestCase):
+
+    def test_unscanned_symbol_is_not_exit(self):
+        prev = extract_signals(_scan(oversold=['AAA', 'BBB']))
+        curr = _scan(['AAA'])           # BBB 获取失败/被过滤，本次没有扫描
+        diff = diff_signals(prev, extract_signals(curr), scanned_symbols(curr))
+        self.assertEqual([s['symbol'] for s in diff['exits']], ['AAA'])
+
+    def test_same_side_move_is_one_transition(self):
+        prev = extract_signals(_scan(oversold=['AAA'], overbought=['BBB']))
+        curr = _scan(['AAA', 'BBB'], approaching_os=['AAA'], approaching_ob=['BBB'])
+        diff = diff_signals(prev, extract_signals(curr), scanned_symbols(curr))
+        self.assertEqual(diff['new'], [])
+        self.assertEqual(diff['exits'], [])
+        moves = [(p['signal_type'], c['signal_type']) for p, c in diff['moved']]
+        self.assertEqual(moves, [('oversold', 'approaching_os'), ('overbought', 'approaching_ob')])
+        self.assertIn("变化: 2", format_diff_message(diff, "now"))
+
+    def test_opposite_side_is_exit_and_new(self):
+        prev = extract_signals(_scan(oversold=['AAA']))
+        curr = _scan(['AAA'], overbought=['AAA'])
+        diff = diff_signals(prev, extract_signals(curr), scanned_symbols(curr))
+        self.assertEqual([s['signal_type'] for s in diff['exits']], ['oversold'])
+        self.assertEqual([s['signal_type'] for s in diff['new']], ['overbought'])
+        self.assertEqual(diff['moved'], [])
+
+    def test_scanned_without_all_list(self):
+        scan = _scan(oversold=['AAA'], neutral=['BBB'])
+        self.assertEqual(scanned_symbols(scan), {'AAA', 'BBB'})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+distributed 共享目录任务队列的本机测试（多个 worker、过期/损坏租约的接手），不访问网络
+
+    python -m pytest tests/test_distributed.py
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import distributed
+
+SYMBOLS = [f"S{i:03d}" for i in range(20)]
+
+def fake_scan_symbol(symbol, *args, **kwargs):
+    """代替网络扫描: 每只股票一个中性结果"""
+    time.sleep(0.01)
+    return {'symbol': symbol, 'signal_type': 'neutral', 'score': 0, 'wt1': 0.0}
+
+class QueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.queue_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.queue_dir)
+        distributed.create_job(self.queue_dir, SYMBOLS, batch_size=5)
+        patcher = mock.patch('scanner.scan_symbol', side_effect=fake_scan_symbol)
+        self.scan = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _lease(self, batch_id, gen, content, age=0):
+        path = distributed._lease_path(self.queue_dir, batch_id, gen)
+        with open(path, 'w') as f:
+            f.write(content)
+        if age:
+            stamp = time.time() - age
+            os.utime(path, (stamp, stamp))
+        return path
+
+    def _run_workers(self, count, lease_seconds=60):
+        threads = [threading.Thread(target=distributed.run_worker,
+                                    args=(self.queue_dir, f"w{n}", lease_seconds, 0.05, True))
+                   for n in range(count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def test_workers_share_batches(self):
+        self._run_workers(3)
+        merged = distributed.merge_job(self.queue_dir)
+        self.assertEqual([r['symbol'] for r in merged['all']], SYMBOLS)
+        # 每个批次只被领取一次
+        scanned = [c.args[0] for c in self.scan.call_args_list]
+        self.assertEqual(sorted(scanned), SYMBOLS)
+
+    def test_claim_race_single_winner(self):
+        barrier = threading.Barrier(8)
+        gens = []
+
+        def claim(n):
+            barrier.wait()
+            gens.append(distributed.try_claim(self.queue_dir, "batch_00000", f"w{n}"))
+        threads = [threading.Thread(target=claim, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sorted(g for g in gens if g is not None), [0])
+        lease = json.load(open(distributed._lease_path(self.queue_dir, "batch_00000", 0)))
+        self.assertGreater(lease['expires'], time.time())
+
+    def test_stale_and_expired_leases_reclaimed(self):
+        # worker 在创建和写入之间崩溃留下的空租约；已过期的租约；仍有效的租约
+        self._lease("batch_00000", 0, "", age=120)
+        self._lease("batch_00001", 0, json.dumps({'worker': 'dead', 'expires': time.time() - 1}))
+        self._lease("batch_00002", 0, json.dumps({'worker': 'alive', 'expires': time.time() + 600}))
+        status = distributed.job_status(self.queue_dir, lease_seconds=60)
+        self.assertEqual(status, {'done': 0, 'leased': 1, 'expired': 2, 'pending': 1})
+
+        self._run_workers(2, lease_seconds=60)
+        status = distributed.job_status(self.queue_dir, lease_seconds=60)
+        self.assertEqual(status, {'done': 3, 'leased': 1, 'expired': 0, 'pending': 0})
+        for batch_id in ("batch_00000", "batch_00001"):
+            self.assertEqual(distributed._leases(self.queue_dir, batch_id)[-1][0], 1)
+
+    def test_fresh_empty_lease_not_stolen(self):
+        # 无法解析但刚创建的租约在 mtime + 租约时长 之前仍然有效
+        self._lease("batch_00000", 0, "")
+        self.assertIsNone(distributed.try_claim(self.queue_dir, "batch_00000", "w1", lease_seconds=60))
+        self.assertEqual(distributed.try_claim(self.queue_dir, "batch_00001", "w1", lease_seconds=60), 0)
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == 'fork', "需要 fork 启动方式继承替身扫描")
+    def test_local_processes(self):
+        merged = distributed.run_local(self.queue_dir, num_workers=3, lease_seconds=60)
+        self.assertEqual([r['symbol'] for r in merged['all']], SYMBOLS)
+
+if __name__ == "__main__":
+    unittest.main()
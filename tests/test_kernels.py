@@ -0,0 +1,63 @@
+"""
+kernels 二维内核与逐只股票参考实现的等价性（NumPy 后端和 numba 后端）
+
+    python -m pytest tests/test_kernels.py
+"""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import kernels
+from scanner import calc_wavetrend, find_swing_highs, find_swing_lows
+
+def _panel(n_symbols=40, n_days=200, seed=1):
+    """长度不同的股票左侧补 NaN 对齐，另有一段价格不变（d = 0）的区间"""
+    high, low, close = kernels._synthetic(n_symbols, n_days, seed)
+    rows = [(high[i, cut:], low[i, cut:], close[i, cut:])
+            for i, cut in enumerate((i * 37) % (n_days // 2) for i in range(n_symbols))]
+    rows[3][0][40:60] = rows[3][1][40:60] = rows[3][2][40:60] = 50.0
+    return tuple(kernels.left_pad([r[k] for r in rows]) for k in range(3)), rows
+
+class KernelEquivalenceMixin:
+    backend = None
+
+    def setUp(self):
+        patcher = mock.patch.object(kernels, 'BACKEND', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        (self.high, self.low, self.close), self.rows = _panel()
+
+    def test_wavetrend_matches_calc_wavetrend(self):
+        wt1, wt2 = kernels.wavetrend_2d(self.high, self.low, self.close)
+        width = self.close.shape[1]
+        for i, (h, l, c) in enumerate(self.rows):
+            ref1, ref2 = calc_wavetrend(pd.DataFrame({'High': h, 'Low': l, 'Close': c}))
+            pad = width - len(c)
+            self.assertTrue(np.isnan(wt1[i, :pad]).all())
+            np.testing.assert_array_equal(wt1[i, pad:], ref1.to_numpy(), err_msg=f"wt1 row {i}")
+            np.testing.assert_array_equal(wt2[i, pad:], ref2.to_numpy(), err_msg=f"wt2 row {i}")
+
+    def test_swing_mask_matches_scalar_detection(self):
+        for window in (3, 5):
+            lows = kernels.swing_mask_2d(self.low, window, 'low')
+            highs = kernels.swing_mask_2d(self.high, window, 'high')
+            width = self.close.shape[1]
+            for i, (h, l, c) in enumerate(self.rows):
+                df = pd.DataFrame({'High': h, 'Low': l, 'Close': c})
+                pad = width - len(c)
+                self.assertFalse(lows[i, :pad].any() or highs[i, :pad].any())
+                self.assertEqual(list(np.flatnonzero(lows[i, pad:])), find_swing_lows(df, window))
+                self.assertEqual(list(np.flatnonzero(highs[i, pad:])), find_swing_highs(df, window))
+
+class NumpyBackendTest(KernelEquivalenceMixin, unittest.TestCase):
+    backend = 'numpy'
+
+@unittest.skipIf(kernels.numba is None, "未安装 numba")
+class NumbaBackendTest(KernelEquivalenceMixin, unittest.TestCase):
+    backend = 'numba'
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+live.WaveTrendState 增量计算与 calc_wavetrend 全量计算的一致性
+
+    python -m pytest tests/test_live.py
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import kernels
+from ingest import compact_ohlcv, to_compute_dtype
+from live import WaveTrendState
+from scanner import calc_wavetrend
+
+def _history(n_days=200, seed=3):
+    high, low, close = (a[0] for a in kernels._synthetic(1, n_days, seed))
+    index = pd.bdate_range('2024-01-02', periods=n_days)
+    df = pd.DataFrame({'Open': close, 'High': high, 'Low': low, 'Close': close,
+                       'Volume': np.full(n_days, 1_000_000)}, index=index)
+    # 与日线缓存相同的紧凑类型（价格 float32）
+    return compact_ohlcv(df)
+
+class WaveTrendStateTest(unittest.TestCase):
+
+    def test_incremental_matches_full_history(self):
+        df = _history()
+        seed_bars = 120
+        ref1, ref2 = calc_wavetrend(to_compute_dtype(df))
+
+        state = WaveTrendState.from_history('TEST', df.iloc[:seed_bars])
+        full = to_compute_dtype(df)
+        for i in range(seed_bars, len(df)):
+            bar = full.iloc[i]
+            day = df.index[i].date()
+            # 盘中报价依次经过开盘、最高、最低，最后停在收盘价
+            for price in (bar['Open'], bar['High'], bar['Low'], bar['Close']):
+                wt1, wt2 = state.update(float(price), day=day)
+            self.assertAlmostEqual(wt1, ref1.iloc[i], places=9, msg=f"wt1 bar {i}")
+            self.assertAlmostEqual(wt2, ref2.iloc[i], places=9, msg=f"wt2 bar {i}")
+        state.roll()
+        self.assertAlmostEqual(state.wt1, ref1.iloc[-1], places=9)
+        self.assertAlmostEqual(state.prev_wt2, ref2.iloc[-1], places=9)
+
+    def test_seed_uses_float64_sum(self):
+        df = _history()
+        state = WaveTrendState.from_history('TEST', df)
+        ref1, _ = calc_wavetrend(to_compute_dtype(df))
+        self.assertEqual(state.wt1, ref1.iloc[-1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+"""
+notify_telegram 对本地替身 HTTP 服务器的测试（不访问 api.telegram.org）
+
+    python -m pytest tests/test_notify_telegram.py
+"""
+
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from notify_telegram import MESSAGE_LIMIT, TelegramSender, _open_tags, _tg_len, split_message
+
+class StubTelegram:
+    """
+    本地替身服务器: 记录每个 sendMessage 请求，按 chat_id 依次返回预设的响应
+    responses: {chat_id: [(状态码, JSON), ...]}，用完后返回 200
+    """
+
+    def __init__(self, responses=None):
+        self.responses = {k: list(v) for k, v in (responses or {}).items()}
+        self.requests = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with stub.lock:
+                    stub.requests.append((self.path, body, time.monotonic()))
+                    queue = stub.responses.get(str(body['chat_id']))
+                    status, payload = queue.pop(0) if queue else (200, {'ok': True, 'result': {}})
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def texts(self, chat_id):
+        return [body['text'] for _, body, _ in self.requests if str(body['chat_id']) == str(chat_id)]
+
+def _sender(stub, **kwargs):
+    kwargs.setdefault('backoff', 0.01)
+    return TelegramSender('TOKEN', api_base=stub.url, timeout=5, **kwargs)
+
+class RetryTest(unittest.TestCase):
+
+    def test_429_waits_retry_after(self):
+        # 退避为 10 秒，只有使用 retry_after（0.2 秒）才能很快完成
+        limited = (429, {'ok': False, 'error_code': 429, 'parameters': {'retry_after': 0.2}})
+        with StubTelegram({'1': [limited]}) as stub:
+            sender = _sender(stub, backoff=10)
+            start = time.monotonic()
+            self.assertTrue(sender.send('1', "hello"))
+            elapsed = time.monotonic() - start
+            sender.close()
+        self.assertEqual(len(stub.requests), 2)
+        self.assertEqual(stub.requests[0][0], "/botTOKEN/sendMessage")
+        self.assertGreaterEqual(stub.requests[1][2] - stub.requests[0][2], 0.2)
+        self.assertLess(elapsed, 5)
+
+    def test_5xx_backs_off_then_gives_up(self):
+        error = (502, {'ok': False})
+        with StubTelegram({'1': [error] * 10}) as stub:
+            sender = _sender(stub, max_retries=3, backoff=0.05)
+            self.assertFalse(sender.send('1', "hello"))
+            sender.close()
+        self.assertEqual(len(stub.requests), 4)
+        gaps = [b[2] - a[2] for a, b in zip(stub.requests, stub.requests[1:])]
+        # 0.05, 0.1, 0.2: 每次间隔翻倍
+        for gap, expected in zip(gaps, (0.05, 0.1, 0.2)):
+            self.assertGreaterEqual(gap, expected)
+        self.assertGreater(gaps[2], gaps[0])
+
+    def test_5xx_then_success(self):
+        with StubTelegram({'1': [(500, {'ok': False})] * 2}) as stub:
+            sender = _sender(stub)
+            self.assertTrue(sender.send('1', "hello"))
+            sender.close()
+        self.assertEqual(len(stub.requests), 3)
+
+    def test_4xx_not_retried(self):
+        with StubTelegram({'1': [(400, {'ok': False, 'description': 'chat not found'})]}) as stub:
+            sender = _sender(stub)
+            self.assertFalse(sender.send('1', "hello"))
+            sender.close()
+        self.assertEqual(len(stub.requests), 1)
+
+class SplitTest(unittest.TestCase):
+
+    def test_limit_counts_utf16_units(self):
+        # emoji 在 UTF-16 中占 2 个码元，按 Python 字符数会超限
+        lines = [f"🟢 <code>S{i:04d}</code> 超卖 📈" for i in range(600)]
+        text = "\n".join(lines)
+        chunks = split_message(text)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(_tg_len(c) <= MESSAGE_LIMIT for c in chunks))
+        self.assertEqual("\n".join(chunks), text)
+
+    def test_hard_cut_keeps_tags_and_entities(self):
+        line = "<b>" + "x" * 4090 + " &amp; " + "y" * 3000 + "</b> <code>" + "z" * 5000 + "</code>"
+        chunks = split_message(line)
+        self.assertGreater(len(chunks), 2)
+        for chunk in chunks:
+            self.assertLessEqual(_tg_len(chunk), MESSAGE_LIMIT)
+            self.assertEqual(_open_tags(chunk), [])
+            self.assertEqual(chunk.count('<'), chunk.count('>'))
+            # 实体不会被拆开
+            self.assertFalse(chunk.endswith(('&', '&a', '&am', '&amp')))
+        self.assertIn("&amp;", "".join(chunks))
+
+    def test_cut_never_inside_entity(self):
+        for offset in range(6):
+            line = "a" * (MESSAGE_LIMIT - 3 + offset) + "&amp;" + "b" * 10
+            first = split_message(line)[0]
+            self.assertTrue(first.endswith("a") or first.endswith("&amp;"), first[-8:])
+
+    def test_long_message_sent_in_order(self):
+        text = "\n".join(f"第 {i} 行 🔴 <b>S{i}</b>" for i in range(1500))
+        with StubTelegram() as stub:
+            sender = _sender(stub)
+            self.assertTrue(sender.send('1', text))
+            sender.close()
+        texts = stub.texts('1')
+        self.assertEqual(texts, split_message(text))
+        self.assertEqual("\n".join(texts), text)
+        self.assertTrue(all(_tg_len(t) <= MESSAGE_LIMIT for t in texts))
+
+class BroadcastTest(unittest.TestCase):
+
+    def test_fan_out_to_every_chat(self):
+        chats = ['1', '2', '3', '4']
+        with StubTelegram({'3': [(403, {'ok': False, 'description': 'bot was blocked'})]}) as stub:
+            sender = _sender(stub, pool_size=4)
+            results = sender.broadcast(chats, "hello")
+            sender.close()
+        self.assertEqual(results, {'1': True, '2': True, '3': False, '4': True})
+        for chat in chats:
+            self.assertEqual(stub.texts(chat), ["hello"])
+        self.assertTrue(all(body['parse_mode'] == 'HTML' for _, body, _ in stub.requests))
+
+    def test_api_base_trailing_slash(self):
+        with StubTelegram() as stub:
+            sender = TelegramSender('TOKEN', api_base=stub.url + '/')
+            self.assertTrue(sender.send('9', "hi"))
+            sender.close()
+        self.assertEqual(stub.requests[0][0], "/botTOKEN/sendMessage")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+"""
+screens 表达式求值的测试（三值逻辑）
+
+    python -m pytest tests/test_screens.py
+"""
+
+import unittest
+
+from screens import ResultsPanel, Screen
+
+ROWS = [
+    {'symbol': 'AAA', 'rsi': 60, 'price': 10.0},
+    {'symbol': 'BBB', 'rsi': None, 'price': 10.0},
+    {'symbol': 'CCC', 'rsi': 40, 'price': 10.0, 'bullish_div': True},
+]
+
+def _hits(expr):
+    panel = ResultsPanel(ROWS)
+    return panel.hits(Screen('t', expr).evaluate(panel))
+
+class ThreeValuedTest(unittest.TestCase):
+
+    def test_not_does_not_match_missing(self):
+        self.assertEqual(_hits("rsi > 50"), ['AAA'])
+        self.assertEqual(_hits("not (rsi > 50)"), ['CCC'])
+        self.assertEqual(_hits("not not (rsi > 50)"), ['AAA'])
+
+    def test_and_or_with_unknown(self):
+        # 未知 or 真 = 真；未知 and 假 = 假，取反后命中
+        self.assertEqual(_hits("rsi > 50 or price > 5"), ['AAA', 'BBB', 'CCC'])
+        self.assertEqual(_hits("not (rsi > 50 and price > 50)"), ['AAA', 'BBB', 'CCC'])
+        self.assertEqual(_hits("not (rsi > 50 or price > 50)"), ['CCC'])
+
+    def test_chain_and_boolean_columns(self):
+        self.assertEqual(_hits("not (30 < rsi < 50)"), ['AAA'])
+        self.assertEqual(_hits("not bullish_div"), ['AAA', 'BBB'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+"""
+多周期扫描：一次获取，本地重采样
+- 每只股票只按所需的最细周期请求一次 history()，较粗周期由本地重采样得到
+  （周线 = 日线按 W-FRI 聚合，4 小时 = 1 小时按 9:30 开盘对齐聚合）
+- 例外: 周线需要约 3 年历史，超过 yfinance 小时线约 730 天的上限（只够约 100 根周线，不足 MIN_BARS），
+  所以小时线和周线同时出现时另请求一次日线，周线由日线重采样
+- 每个周期分别计算 WaveTrend / RSI / 背离和评分（scanner.evaluate_symbol）
+- 结果以第一个周期为主（兼容原有结构），另附各周期的对齐字段和共振标记:
+    result['timeframes'] = {'1d': {...}, '1wk': {...}}
+    result['confluence'] = 'bullish'（所有周期超卖/接近超卖）/ 'bearish' / ''
+
+用法:
+    python scanner.py --timeframes 1d,1wk
+"""
+
+import pandas as pd
+
+import data_provider
+import ingest
+import lookback_planner
+import scanner
+
+# 周期 -> (重采样规则, 每个交易日的K线数)
+TIMEFRAMES = {
+    '1h': (None, 7),
+    '4h': ('4h', 2),
+    '1d': ('1D', 1),
+    '1wk': ('W-FRI', 0.2),
+}
+INTRADAY = ('1h', '4h')
+
+# yfinance 小时线最多提供约 730 天
+INTRADAY_MAX_DAYS = 729
+
+OHLCV_AGG = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+TF_FIELDS = ('signal_type', 'signal', 'wt1', 'wt2', 'cross', 'score', 'grade')
+
+BULLISH_TYPES = ('oversold', 'approaching_os')
+BEARISH_TYPES = ('overbought', 'approaching_ob')
+
+def parse_timeframes(text):
+    """'1d,1wk' -> ['1d', '1wk']"""
+    timeframes = [t.strip() for t in text.split(',') if t.strip()]
+    unknown = [t for t in timeframes if t not in TIMEFRAMES]
+    if unknown or not timeframes:
+        raise ValueError(f"不支持的周期: {unknown or text}，可选: {', '.join(TIMEFRAMES)}")
+    return timeframes
+
+def source_interval(timeframes):
+    """需要请求的最细周期"""
+    return '1h' if any(t in INTRADAY for t in timeframes) else '1d'
+
+def fetch_days(timeframes, bars=lookback_planner.REQUIRED_BARS):
+    """覆盖所有周期 bars 根K线所需的日历日数（小时线受 yfinance 上限限制）"""
+    trading_days = max(bars / TIMEFRAMES[t][1] for t in timeframes)
+    days = lookback_planner.calendar_days(int(trading_days) + 1)
+    if source_interval(timeframes) == '1h':
+        days = min(days, INTRADAY_MAX_DAYS)
+    return days
+
+def source_groups(timeframes, bars=lookback_planner.REQUIRED_BARS):
+    """
+    {请求周期: [由它重采样得到的周期]}
+    小时线在上限天数内不够 bars 根的周期（周线）改由单独请求的日线得到
+    """
+    interval = source_interval(timeframes)
+    groups = {}
+    for tf in timeframes:
+        src = interval
+        if interval == '1h' and fetch_days([tf], bars) > INTRADAY_MAX_DAYS:
+            src = '1d'
+        groups.setdefault(src, []).append(tf)
+    return groups
+
+def resample(df, timeframe, interval='1d'):
+    """把 interval 周期的 OHLCV 聚合成 timeframe 周期（相同周期直接返回）"""
+    rule = TIMEFRAMES[timeframe][0]
+    if timeframe == interval or rule is None:
+        return df
+    if timeframe == '4h':
+        # 与交易所开盘对齐: 9:30-13:30, 13:30-16:00
+        bars = df.resample(rule, origin='start_day', offset='9h30min').agg(OHLCV_AGG)
+    else:
+        bars = df.resample(rule).agg(OHLCV_AGG)
+    return bars.dropna(subset=['Close'])
+
+def confluence(tf_results):
+    """所有周期同向（超卖侧或超买侧）时返回 bullish / bearish"""
+    types = [r['signal_type'] if r else None for r in tf_results.values()]
+    if types and all(t in BULLISH_TYPES for t in types):
+        return 'bullish'
+    if types and all(t in BEARISH_TYPES for t in types):
+        return 'bearish'
+    return ''
+
+# ============================================================================
+# 扫描
+# ============================================================================
+
+def fetch_source(symbol, timeframes, cache=None):
+    """
+    按 source_groups 请求（通常只有一次），返回 ({请求周期: df}, market_cap)
+    任一请求失败时返回 (None, None)
+    """
+    frames = {}
+    now = pd.Timestamp.now().normalize()
+    try:
+        ticker = data_provider.Ticker(symbol)
+        for interval, group in source_groups(timeframes).items():
+            start = now - pd.Timedelta(days=fetch_days(group))
+            frames[interval] = ingest.compact_ohlcv(ticker.history(start=start.strftime('%Y-%m-%d'),
+                                                                   interval=interval))
+        market_cap = ticker.info.get('marketCap', 0)
+    except Exception as e:
+        print(f"  ⚠️ 获取 {symbol} 数据失败: {e}")
+        return None, None
+    daily = frames.get('1d')
+    if cache is not None and daily is not None and len(daily):
+        cache.save(symbol, daily, market_cap)
+    return frames, market_cap
+
+def scan_symbol_mtf(symbol, timeframes, min_market_cap=10e9, ob_level=60, os_level=-60,
+                    dtype=None, cache=None):
+    """
+    多周期扫描单只股票
+    主结果取第一个周期；某个周期K线不足 MIN_BARS 时该周期为 None
+    """
+    frames, market_cap = fetch_source(symbol, timeframes, cache)
+    if frames is None or not all(len(df) for df in frames.values()):
+        return None
+    if market_cap and market_cap < min_market_cap:
+        return None
+
+    source_of = {tf: interval for interval, group in source_groups(timeframes).items() for tf in group}
+    per_tf = {}
+    for tf in timeframes:
+        interval = source_of[tf]
+        bars = resample(frames[interval], tf, interval).iloc[-lookback_planner.REQUIRED_BARS:]
+        if len(bars) < lookback_planner.MIN_BARS:
+            per_tf[tf] = None
+            continue
+        per_tf[tf] = scanner.evaluate_symbol(symbol, bars, market_cap, ob_level, os_level, dtype)
+
+    result = per_tf[timeframes[0]]
+    if result is None:
+        return None
+    result['timeframes'] = {tf: {k: r[k] for k in TF_FIELDS} if r else None for tf, r in per_tf.items()}
+    result['confluence'] = confluence(per_tf)
+    return result
+
+def scan_stocks_mtf(symbols, timeframes, min_market_cap=10e9, ob_level=60, os_level=-60,
+                    dtype=None, cache=None):
+    """多周期扫描股票池，结构同 scanner.scan_stocks，另加 'timeframes' 和 'confluence' 列表"""
+    results = []
+    total = len(symbols)
+    for i, symbol in enumerate(symbols):
+        print(f"\r  扫描进度: {i+1}/{total} - {symbol}    ", end="", flush=True)
+        result = scan_symbol_mtf(symbol, timeframes, min_market_cap, ob_level, os_level, dtype, cache)
+        if result is not None:
+            results.append(result)
+    print("\r  扫描完成!                              ")
+
+    scan_results = scanner.classify_results(results)
+    scan_results['timeframes'] = list(timeframes)
+    scan_results['confluence'] = sorted((r for r in results if r['confluence']),
+                                        key=lambda r: r['score'], reverse=True)
+    return scan_results
+
+def print_confluence(scan_results):
+    """各周期对齐的信号表（只列出至少一个周期有信号的股票）"""
+    timeframes = scan_results['timeframes']
+    rows = [r for r in scan_results['all']
+            if any(t and t['signal_type'] != 'neutral' for t in r['timeframes'].values())]
+    print(f"\n🧭 多周期信号 ({' / '.join(timeframes)}) [{len(rows)}只]")
+    print("-"*100)
+    print(f"{'股票':8} | " + " | ".join(f"{tf:>18}" for tf in timeframes) + " | 共振")
+    print("-"*100)
+    rows.sort(key=lambda r: (r['confluence'] == '', -r['score']))
+    for r in rows:
+        cells = []
+        for tf in timeframes:
+            t = r['timeframes'][tf]
+            cells.append(f"{t['signal']} {t['wt1']:>7.2f}" if t else f"{'-':>18}")
+        mark = {'bullish': '🟢 做多共振', 'bearish': '🔴 做空共振'}.get(r['confluence'], '')
+        print(f"{r['symbol']:8} | " + " | ".join(f"{c:>18}" for c in cells) + f" | {mark}")
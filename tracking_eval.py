@@ -0,0 +1,192 @@
+"""
+追踪信号的路径评估（基于本地日线缓存，不额外下载）
+- 对全部追踪记录一次性向量化计算 D0 之后 30 个交易日内的价格路径:
+    最大有利/不利波动（MFE/MAE）、首次触及 ±5% 的交易日、5/10/20/30 日收益
+- 判定改为按路径先触及哪一侧: 先到 +5%（做空为 -5%）为正确，先到反向 5% 为错误；
+  同一天两侧都触及时按错误计（保守）
+- 缓存中没有该股票 D0 之后数据，或缓存已过期（最后一根K线早于上一个交易日）且 30 日窗口未走完的记录，
+  结果列为 NaN（covered=False），由调用方回退到原来的逐只取价
+- trading_days 与原来用 SPY 计数的含义相同: 从 D0（含）到最新一根K线的交易日数；
+  trading_days ≥ 30 时完成（与原来的规则相同）
+- 交易日按每只股票自己的K线计数（停牌等缺失的日期不算），价格缺失（NaN）的K线同样跳过:
+  第 h 日收益、当前价、触及天数都按有效K线的位置取
+- d0_price 缺失时与原来相同，以当前价作为基准（涨跌为 0）
+
+方向: 'bullish' 做多（超卖反转）, 'bearish' 做空（超买见顶）
+"""
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import BarCache
+
+TARGET_PCT = 5.0
+TRACK_DAYS = 30
+HORIZONS = (5, 10, 20, 30)
+
+RESULT_CORRECT = "✅ 正确"
+RESULT_WRONG = "❌ 错误"
+RESULT_PENDING = "⏳ 待定"
+
+def _panel(symbols, start, cache):
+    """
+    每只股票自己在 start 之后的K线，左对齐成 symbols × K线 数组（不足的位置日期为 NaT、价格为 NaN）
+    返回 (dates, counts, high, low, close)，counts 为每只股票的K线数
+    """
+    frames = {}
+    for symbol in symbols:
+        df, _ = cache.load(symbol)
+        if df is not None:
+            frames[symbol] = df.loc[start:, ['High', 'Low', 'Close']]
+    counts = np.array([len(frames[s]) if s in frames else 0 for s in symbols], dtype=np.int64)
+
+    shape = (len(symbols), int(counts.max(initial=0)))
+    dates = np.full(shape, np.datetime64('NaT'), dtype='datetime64[ns]')
+    high, low, close = (np.full(shape, np.nan) for _ in range(3))
+    for i, symbol in enumerate(symbols):
+        if symbol in frames:
+            f = frames[symbol]
+            dates[i, :len(f)] = f.index.to_numpy(dtype='datetime64[ns]')
+            high[i, :len(f)] = f['High'].to_numpy(dtype=np.float64)
+            low[i, :len(f)] = f['Low'].to_numpy(dtype=np.float64)
+            close[i, :len(f)] = f['Close'].to_numpy(dtype=np.float64)
+    return dates, counts, high, low, close
+
+def _first_true(mask, day_no):
+    """每行第一个 True 所在的交易日数（day_no: 每个位置是第几个有效交易日），没有时为 NaN"""
+    rows = np.arange(mask.shape[0])
+    first = day_no[rows, mask.argmax(axis=1)].astype(np.float64)
+    first[~mask.any(axis=1)] = np.nan
+    return first
+
+def last_session(today=None):
+    """最近一个已收盘的交易日（today 之前的最后一个工作日；不考虑节假日，节假日后按过期处理更保守）"""
+    today = pd.Timestamp(today or pd.Timestamp.now()).normalize()
+    return today - pd.offsets.BDay(1)
+
+def evaluate(items, direction, cache=None, target_pct=TARGET_PCT, track_days=TRACK_DAYS,
+             horizons=HORIZONS, today=None):
+    """
+    items: 追踪记录列表（需要 symbol / d0_date / d0_price）
+    today: 判断缓存是否过期的日期（默认今天）
+    返回 DataFrame（行与 items 一一对应）:
+        trading_days, current_price, change_pct, mfe_pct, mae_pct,
+        target_day, stop_day, ret_5d ... ret_30d, result, complete, covered
+    百分比均为方向调整后的值（做空时价格下跌为正）；
+    complete: 含 D0 的交易日数（trading_days）≥ track_days，与原来的完成规则相同
+    """
+    cache = cache or BarCache()
+    n = len(items)
+    columns = ['trading_days', 'current_price', 'change_pct', 'mfe_pct', 'mae_pct',
+               'target_day', 'stop_day'] + [f'ret_{h}d' for h in horizons] + ['result', 'complete', 'covered']
+    if n == 0:
+        return pd.DataFrame(columns=columns)
+
+    symbols = [str(item['symbol']) for item in items]
+    d0 = pd.to_datetime([item['d0_date'] for item in items]).normalize()
+    p0 = np.array([float(item['d0_price']) if item.get('d0_price') else np.nan for item in items])
+
+    unique = sorted(set(symbols))
+    row_of = {s: i for i, s in enumerate(unique)}
+    dates, counts, high, low, close = _panel(unique, d0.min(), cache)
+    s_idx = np.array([row_of[s] for s in symbols])
+    rows = np.arange(n)
+
+    # 该股票自己的K线中 D0 之后的第 1..track_days 根
+    with np.errstate(invalid='ignore'):
+        j0 = (dates[s_idx] <= d0.to_numpy(dtype='datetime64[ns]')[:, None]).sum(axis=1)
+    offsets = j0[:, None] + np.arange(track_days)[None, :]
+    in_range = offsets < counts[s_idx][:, None]
+    offsets = np.minimum(offsets, max(dates.shape[1] - 1, 0))
+
+    def path(values):
+        if not values.shape[1]:
+            return np.full((n, track_days), np.nan)
+        out = values[s_idx[:, None], offsets]
+        out[~in_range] = np.nan
+        return out
+
+    close_path = path(close)
+    valid_days = ~np.isnan(close_path)
+    trading_days = valid_days.sum(axis=1)
+    # 第 k 个有效交易日在路径中的位置（有效的排在前面，保持顺序）
+    order = np.argsort(~valid_days, axis=1, kind='stable')
+    day_no = np.cumsum(valid_days, axis=1)
+
+    def nth_valid(values, k):
+        """每行第 k 个（从 1 开始）有效交易日的值，不足 k 个时为 NaN"""
+        k = np.broadcast_to(k, (n,))
+        pos = order[rows, np.clip(k - 1, 0, track_days - 1)]
+        return np.where((k >= 1) & (trading_days >= k), values[rows, pos], np.nan)
+
+    last_close = nth_valid(close_path, trading_days)
+    # 与原来相同: 没有 D0 价格时以当前价为基准
+    p0 = np.where(np.isfinite(p0) & (p0 > 0), p0, last_close)
+
+    sign = 1.0 if direction == 'bullish' else -1.0
+    p0_col = p0[:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # 有利/不利方向的极值（做多看 High/Low，做空相反）
+        fav = (path(high) / p0_col - 1) * 100 if sign > 0 else (1 - path(low) / p0_col) * 100
+        adv = (path(low) / p0_col - 1) * 100 if sign > 0 else (1 - path(high) / p0_col) * 100
+        ret = (close_path / p0_col - 1) * 100 * sign
+
+    # 超过 track_days 的交易日也计入（与原来的交易日计数一致）
+    total_after = np.maximum(counts[s_idx] - j0, 0)
+    fresh = np.zeros(n, dtype=bool)
+    if dates.shape[1]:
+        # 每只股票缓存中最后一根K线的日期
+        last_bar = pd.DatetimeIndex(dates[s_idx, np.maximum(counts[s_idx] - 1, 0)])
+        fresh = np.asarray(last_bar >= last_session(today)) & (counts[s_idx] > 0)
+    # 与原来的规则相同: 含 D0 的交易日数达到 track_days 即完成
+    complete = total_after + 1 >= track_days
+
+    with np.errstate(invalid='ignore'):
+        mfe = np.nanmax(np.where(valid_days, fav, np.nan), axis=1, initial=-np.inf)
+        mae = np.nanmin(np.where(valid_days, adv, np.nan), axis=1, initial=np.inf)
+        target_day = _first_true(valid_days & (fav >= target_pct), day_no)
+        stop_day = _first_true(valid_days & (adv <= -target_pct), day_no)
+
+    last_ret = nth_valid(ret, trading_days)
+
+    result = np.full(n, RESULT_PENDING, dtype=object)
+    hit = ~np.isnan(target_day)
+    stopped = ~np.isnan(stop_day)
+    result[hit & (~stopped | (target_day < stop_day))] = RESULT_CORRECT
+    result[stopped & (~hit | (stop_day <= target_day))] = RESULT_WRONG
+
+    # 过期的缓存只能用于窗口已走完的记录（价格路径不会再变）
+    covered = (trading_days > 0) & (fresh | complete)
+    out = pd.DataFrame({
+        # 与原来的 SPY 计数一致，含 D0 当天
+        'trading_days': total_after + 1,
+        'current_price': np.round(last_close, 2),
+        'change_pct': np.round(last_ret * sign, 2),
+        'mfe_pct': np.round(np.where(covered, mfe, np.nan), 2),
+        'mae_pct': np.round(np.where(covered, mae, np.nan), 2),
+        'target_day': target_day,
+        'stop_day': stop_day,
+    })
+    for h in horizons:
+        out[f'ret_{h}d'] = np.round(nth_valid(ret, h), 2) if h <= track_days else np.nan
+    out['result'] = np.where(covered, result, None)
+    out['complete'] = complete
+    out['covered'] = covered
+    return out
+
+def summarize(outcomes, horizons=HORIZONS):
+    """路径统计: 正确率、平均 MFE/MAE、平均到达目标天数、各周期平均收益"""
+    done = outcomes[outcomes['covered'] & (outcomes['result'] != RESULT_PENDING)]
+    covered = outcomes[outcomes['covered']]
+    stats = {
+        'decided': len(done),
+        'correct': int((done['result'] == RESULT_CORRECT).sum()),
+        'accuracy': round(float((done['result'] == RESULT_CORRECT).mean()) * 100, 1) if len(done) else None,
+        'avg_mfe': round(float(covered['mfe_pct'].mean()), 2) if len(covered) else None,
+        'avg_mae': round(float(covered['mae_pct'].mean()), 2) if len(covered) else None,
+        'avg_target_day': round(float(covered['target_day'].mean()), 1) if covered['target_day'].notna().any() else None,
+    }
+    for h in horizons:
+        col = covered[f'ret_{h}d']
+        stats[f'avg_ret_{h}d'] = round(float(col.mean()), 2) if col.notna().any() else None
+    return stats
@@ -0,0 +1,198 @@
+"""
+股票池定义与分片
+- 内置股票池（纳斯达克100 / 标普500补充 / 主题观察名单）
+- 从文件加载股票池（S&P 1500、Russell 3000、自定义观察名单等）
+- 确定性去重（保留首次出现顺序）
+- 基于哈希的稳定分片，每个分片可独立扫描
+"""
+
+import csv
+import os
+import zlib
+
+# ============================================================================
+# 1. 内置股票池
+# ============================================================================
+
+# 纳斯达克100
+NASDAQ_100 = [
+    "AAPL", "MSFT", "AMZN", "NVDA", "GOOGL", "META", "GOOG", "TSLA", "AVGO", "COST",
+    "PEP", "CSCO", "NFLX", "AMD", "ADBE", "TMUS", "CMCSA", "INTC", "INTU", "QCOM",
+    "TXN", "AMGN", "HON", "AMAT", "BKNG", "ISRG", "SBUX", "VRTX", "LRCX", "GILD",
+    "ADI", "ADP", "MDLZ", "REGN", "PANW", "MU", "KLAC", "SNPS", "CDNS", "MELI",
+    "PYPL", "ASML", "MAR", "CRWD", "CTAS", "ORLY", "MRVL", "ABNB", "NXPI", "FTNT",
+    "WDAY", "CSX", "PCAR", "MNST", "ADSK", "DXCM", "AEP", "CPRT", "ODFL", "PAYX",
+    "AZN", "KDP", "CHTR", "ROST", "KHC", "EXC", "LULU", "IDXX", "VRSK", "MCHP",
+    "FAST", "EA", "XEL", "CTSH", "GEHC", "CSGP", "BKR", "FANG", "ON", "DDOG",
+    "ANSS", "BIIB", "TEAM", "ZS", "ILMN", "WBD", "ALGN", "MRNA", "DLTR", "ENPH",
+    "SIRI", "CEG", "TTWO", "GFS", "LCID", "RIVN", "WBA", "JD", "PDD", "BIDU"
+]
+
+# 标普500 (与纳斯达克100重复的部分由 dedupe_symbols 去除)
+SP500_EXTRA = [
+    # 金融
+    "JPM", "BAC", "WFC", "GS", "MS", "C", "BLK", "SCHW", "AXP", "USB",
+    "PNC", "TFC", "COF", "BK", "STT", "AIG", "MET", "PRU", "ALL", "TRV",
+    "AFL", "CB", "CME", "ICE", "MCO", "SPGI", "MMC", "AON", "MSCI",
+    # 医疗
+    "UNH", "JNJ", "PFE", "LLY", "ABBV", "MRK", "TMO", "ABT", "DHR", "BMY",
+    "AMGN", "CVS", "ELV", "CI", "HCA", "HUM", "MCK", "CAH", "ZTS", "SYK",
+    "BSX", "MDT", "EW", "DXCM", "IDXX", "IQV", "A", "BIO", "TECH",
+    # 消费
+    "WMT", "HD", "MCD", "NKE", "LOW", "TGT", "SBUX", "TJX", "ORLY", "AZO",
+    "ROST", "DG", "DLTR", "CMG", "YUM", "DPZ", "EBAY", "ETSY", "BBY",
+    "KMB", "CL", "PG", "KO", "MO", "PM", "EL", "CLX", "CHD", "SJM",
+    # 工业
+    "CAT", "BA", "HON", "UPS", "RTX", "DE", "LMT", "GE", "MMM", "EMR",
+    "ITW", "PH", "ROK", "ETN", "PCAR", "CMI", "WM", "RSG", "FDX", "NSC",
+    "UNP", "CSX", "DAL", "UAL", "LUV", "AAL",
+    # 能源
+    "XOM", "CVX", "COP", "SLB", "EOG", "MPC", "PSX", "VLO", "OXY", "PXD",
+    "DVN", "HES", "HAL", "KMI", "WMB", "OKE",
+    # 通信/媒体
+    "DIS", "CMCSA", "T", "VZ", "CHTR", "NFLX", "PARA", "FOX", "FOXA",
+    "OMC", "IPG",
+    # 公用事业
+    "NEE", "DUK", "SO", "D", "AEP", "EXC", "SRE", "XEL", "PEG", "ED",
+    "WEC", "ES", "AWK",
+    # 材料
+    "LIN", "APD", "SHW", "ECL", "DD", "NEM", "FCX", "NUE", "VMC", "MLM",
+    # 房地产
+    "AMT", "PLD", "CCI", "EQIX", "PSA", "SPG", "O", "WELL", "DLR", "AVB",
+    "EQR", "VTR", "ARE", "MAA", "UDR",
+    # 其他大盘
+    "BRK-B", "V", "MA", "ACN", "CRM", "ORCL", "IBM", "NOW", "UBER", "ABNB",
+    "SQ", "SHOP", "SNOW", "DDOG", "NET", "ZM", "DOCU", "OKTA", "TWLO"
+]
+
+# 高波动/主题股票
+EXTRA_WATCHLIST = [
+    # 加密相关
+    "MSTR", "COIN", "HOOD", "MARA", "RIOT", "CLSK",
+    # 量子计算
+    "IONQ", "RGTI", "QUBT",
+    # AI/成长
+    "PLTR", "SOFI", "RKLB", "PATH", "AI",
+    # 中概股
+    "BABA", "NIO", "XPEV", "LI"
+]
+
+BUILTIN_UNIVERSES = {
+    "nasdaq100": NASDAQ_100,
+    "sp500_extra": SP500_EXTRA,
+    "watchlist": EXTRA_WATCHLIST,
+}
+
+# 股票池文件目录，例如 universes/sp1500.txt、universes/russell3000.csv
+UNIVERSE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "universes")
+
+# ============================================================================
+# 2. 去重与加载
+# ============================================================================
+
+def normalize_symbol(symbol):
+    """统一代码格式：去空白、大写、BRK.B -> BRK-B (Yahoo 格式)"""
+    return symbol.strip().upper().replace(".", "-")
+
+def dedupe_symbols(symbols):
+    """
+    确定性去重：保留每个代码首次出现的位置
+    （替代 list(set(...))，后者的顺序每次运行都可能不同）
+    """
+    seen = set()
+    result = []
+    for symbol in symbols:
+        symbol = normalize_symbol(symbol)
+        if symbol and symbol not in seen:
+            seen.add(symbol)
+            result.append(symbol)
+    return result
+
+def load_universe_file(path):
+    """
+    从文件加载股票池
+    - .csv: 读取 Symbol / symbol / Ticker / ticker 列（没有则取第一列）
+    - 其他: 每行一个代码，# 之后为注释，也支持逗号/空白分隔
+    """
+    symbols = []
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            column = None
+            for name in ("Symbol", "symbol", "Ticker", "ticker"):
+                if reader.fieldnames and name in reader.fieldnames:
+                    column = name
+                    break
+            if column is None and reader.fieldnames:
+                column = reader.fieldnames[0]
+            for row in reader:
+                value = row.get(column) or ""
+                if value.strip():
+                    symbols.append(value)
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0]
+                symbols.extend(line.replace(",", " ").split())
+    return dedupe_symbols(symbols)
+
+def resolve_universe(name):
+    """
+    按名称解析单个股票池
+    - 内置名称: nasdaq100 / sp500_extra / watchlist / default
+    - 文件路径: 直接加载
+    - 其他名称: 在 universes/ 目录下查找 <name>.txt 或 <name>.csv
+    """
+    if name == "default":
+        return list(ALL_STOCKS)
+    if name in BUILTIN_UNIVERSES:
+        return dedupe_symbols(BUILTIN_UNIVERSES[name])
+    if os.path.isfile(name):
+        return load_universe_file(name)
+    for ext in (".txt", ".csv"):
+        path = os.path.join(UNIVERSE_DIR, name + ext)
+        if os.path.isfile(path):
+            return load_universe_file(path)
+    raise ValueError(f"未知股票池: {name}")
+
+def load_universe(names):
+    """合并多个股票池（按给定顺序去重）"""
+    if isinstance(names, str):
+        names = [names]
+    symbols = []
+    for name in names:
+        symbols.extend(resolve_universe(name))
+    return dedupe_symbols(symbols)
+
+# ============================================================================
+# 3. 分片
+# ============================================================================
+
+def symbol_shard(symbol, num_shards):
+    """
+    代码所属分片编号
+    使用 crc32 而不是内置 hash()，后者每个进程随机化，无法跨机器复现
+    """
+    return zlib.crc32(normalize_symbol(symbol).encode("utf-8")) % num_shards
+
+def shard_symbols(symbols, num_shards, shard_index):
+    """返回属于第 shard_index 个分片的代码（保持原顺序）"""
+    if num_shards < 1:
+        raise ValueError("num_shards 必须 ≥ 1")
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"shard_index 必须在 0..{num_shards - 1} 之间")
+    return [s for s in symbols if symbol_shard(s, num_shards) == shard_index]
+
+def parse_shard(spec):
+    """解析 'i/n' 形式的分片参数，返回 (shard_index, num_shards)"""
+    try:
+        index, total = spec.split("/")
+        index, total = int(index), int(total)
+    except ValueError:
+        raise ValueError(f"分片格式应为 i/n，例如 0/4: {spec}")
+    if total < 1 or not 0 <= index < total:
+        raise ValueError(f"无效分片: {spec}")
+    return index, total
+
+# 合并所有股票池
+ALL_STOCKS = dedupe_symbols(NASDAQ_100 + SP500_EXTRA + EXTRA_WATCHLIST)